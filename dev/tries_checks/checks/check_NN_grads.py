@@ -0,0 +1,58 @@
+#Here we check the gradients of the NN models (model_0), for both the numpy and the tensorflow backend.
+#The gradients of the reduced PCA coefficients are compared between the two backends and with finite differences (the networks are in single precision, hence finite differences are accurate only to ~1e-3).
+#We then compare the gradients of the modes given by GW_generator.get_mode_grads w.r.t. (M,q,s1,s2) with finite differences of the modes and we measure the time for a batch of gradients.
+#The comparison is done only where the mode is defined (i.e. where the amplitude is non zero).
+#The gradient w.r.t. M comes from the time derivative of the mode, which is piecewise linear: close to a node of the grid of the model (e.g. at the end of the ringdown), it may differ from finite differences.
+
+import numpy as np
+import time
+import mlgw
+
+N_grads = 100
+times = np.linspace(-2, 0.01, 5000)
+mode = (2,2)
+
+np.random.seed(0)
+M, q = np.random.uniform(30., 80., N_grads), np.random.uniform(1.2, 4., N_grads)
+s1, s2 = np.random.uniform(-0.5, 0.5, N_grads), np.random.uniform(-0.5, 0.5, N_grads)
+get_theta = lambda M, q, s1, s2: np.column_stack([M*q/(1+q), M/(1+q), s1, s2])
+
+	#gradients of the reduced coefficients
+gen_np = mlgw.GW_generator(0, backend = 'numpy')
+gen_tf = mlgw.GW_generator(0, backend = 'tensorflow')
+theta_std = np.column_stack([q, s1, s2])
+grad_amp_np, grad_ph_np = gen_np.get_mode_obj(mode).get_red_grads(theta_std)
+grad_amp_tf, grad_ph_tf = gen_tf.get_mode_obj(mode).get_red_grads(theta_std)
+print("Reduced coefficients: relative difference between numpy and tensorflow {:.2e} (amp) | {:.2e} (ph)".format(
+	np.max(np.abs(grad_amp_np-grad_amp_tf))/np.max(np.abs(grad_amp_tf)), np.max(np.abs(grad_ph_np-grad_ph_tf))/np.max(np.abs(grad_ph_tf))))
+
+eps = 1e-2
+for j, var in enumerate(['q', 's1', 's2']):
+	theta_p, theta_m = theta_std.copy(), theta_std.copy()
+	theta_p[:,j] += eps
+	theta_m[:,j] -= eps
+	amp_p, ph_p = gen_np.get_mode_obj(mode).get_red_coefficients(theta_p)
+	amp_m, ph_m = gen_np.get_mode_obj(mode).get_red_coefficients(theta_m)
+	print("\t{}: relative difference with finite differences {:.2e} (amp) | {:.2e} (ph)".format(var,
+		np.max(np.abs((amp_p-amp_m)/(2*eps)-grad_amp_np[:,:,j]))/np.max(np.abs(grad_amp_np[:,:,j])),
+		np.max(np.abs((ph_p-ph_m)/(2*eps)-grad_ph_np[:,:,j]))/np.max(np.abs(grad_ph_np[:,:,j]))))
+
+	#gradients of the modes
+for backend, gen in [('numpy', gen_np), ('tensorflow', gen_tf)]:
+	start = time.time()
+	grad_amp, grad_ph = gen.get_mode_grads(get_theta(M, q, s1, s2), times, mode)
+	t_grads = time.time()-start
+	print("Backend {}: time per gradient {:.2e} s".format(backend, t_grads/N_grads))
+
+	params, steps = [M, q, s1, s2], [1e-3*M, 1e-3*q, 1e-3, 1e-3]
+	for j, var in enumerate(['M', 'q', 's1', 's2']):
+		params_p, params_m = list(params), list(params)
+		params_p[j], params_m[j] = params[j]+steps[j], params[j]-steps[j]
+		amp_p, ph_p = gen.get_modes(get_theta(*params_p), times, mode)
+		amp_m, ph_m = gen.get_modes(get_theta(*params_m), times, mode)
+		step = np.reshape(steps[j], (-1,1))
+		fd_amp, fd_ph = (amp_p-amp_m)/(2*step), (ph_p-ph_m)/(2*step)
+		mask = (amp_p > 0) & (amp_m > 0)
+		fd_amp, fd_ph, grad_amp_j, grad_ph_j = fd_amp[mask], fd_ph[mask], grad_amp[:,:,j][mask], grad_ph[:,:,j][mask]
+		print("\t{}: relative difference with finite differences {:.2e} (amp) | {:.2e} (ph)".format(var,
+			np.max(np.abs(fd_amp-grad_amp_j))/np.max(np.abs(fd_amp)), np.max(np.abs(fd_ph-grad_ph_j))/np.max(np.abs(fd_ph))))
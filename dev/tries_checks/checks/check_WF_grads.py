@@ -0,0 +1,48 @@
+#Here we check the gradients of the polarizations given by GW_generator.get_WF_grads, against central finite differences of GW_generator.get_WF.
+#For t_c, the finite differences are computed by shifting the time grid, while keeping the first point (where the phase is set) fixed.
+#We also measure the time for the gradients, compared to the time to generate the WF.
+
+import numpy as np
+import time
+import mlgw
+
+N = 50
+times = np.linspace(-1., 0.005, 6000)
+names = ['M', 'q', 's1', 's2', 'D_L', 'iota', 'phi_0', 't_c']
+
+np.random.seed(0)
+M, q = np.random.uniform(30., 80., N), np.random.uniform(1.2, 4., N)
+params = [M, q, np.random.uniform(-0.5, 0.5, N), np.random.uniform(-0.5, 0.5, N), np.random.uniform(100., 1000., N), np.random.uniform(0.1, 3., N), np.random.uniform(0., 2*np.pi, N)]
+eps = [1e-3*M, 1e-3*q, 1e-3, 1e-3, 1e-3*params[4], 1e-4, 1e-4, 1e-6]
+
+def get_theta(M, q, s1, s2, D_L, iota, phi_0):
+	return np.column_stack([M*q/(1+q), M/(1+q), s1, s2, D_L, iota, phi_0])
+
+gen = mlgw.GW_generator(0, backend = 'numpy')
+theta = get_theta(*params)
+
+for modes in [(2,2), None]:
+	start = time.time()
+	h_p, h_c, grad_h_p, grad_h_c = gen.get_WF_grads(theta, times, modes, return_WF = True)
+	t_grads = time.time() - start
+	start = time.time()
+	h_p_WF, h_c_WF = gen.get_WF(theta, times, modes)
+	t_WF = time.time() - start
+
+	print("Modes {}: time per gradient {:.2e} s | time per WF {:.2e} s".format('22' if modes == (2,2) else 'all', t_grads/N, t_WF/N))
+	print("\tRelative difference of the WF: {:.2e}".format(np.max(np.abs(h_p-h_p_WF))/np.max(np.abs(h_p_WF))))
+
+	for j, name in enumerate(names):
+		if j < 7:
+			params_p, params_m = list(params), list(params)
+			params_p[j], params_m[j] = params[j] + eps[j], params[j] - eps[j]
+			h_p_p, h_c_p = gen.get_WF(get_theta(*params_p), times, modes)
+			h_p_m, h_c_m = gen.get_WF(get_theta(*params_m), times, modes)
+		else:
+			h_p_p, h_c_p = gen.get_WF(theta, np.concatenate([times[:1], times - eps[j]]), modes)
+			h_p_m, h_c_m = gen.get_WF(theta, np.concatenate([times[:1], times + eps[j]]), modes)
+			h_p_p, h_c_p, h_p_m, h_c_m = h_p_p[:,1:], h_c_p[:,1:], h_p_m[:,1:], h_c_m[:,1:]
+		h = np.reshape(2*eps[j], (-1,1))
+		FD_p, FD_c = (h_p_p-h_p_m)/h, (h_c_p-h_c_m)/h
+		print("\t{}: relative difference with finite differences {:.2e} (h_plus) | {:.2e} (h_cross)".format(name,
+			np.max(np.abs(FD_p-grad_h_p[:,:,j]))/np.max(np.abs(FD_p)), np.max(np.abs(FD_c-grad_h_c[:,:,j]))/np.max(np.abs(FD_c))))
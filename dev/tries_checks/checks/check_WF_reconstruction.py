@@ -86,14 +86,16 @@ while tmp_mode:# is not None:
 		nu = m1*m2/(m1+m2)**2
 		amp_lm_mlgw *= amp_prefactor*nu
 		
-		h_lm_mlgw_real, h_lm_mlgw_imag = model._GW_generator__set_spherical_harmonics((l,m), amp_lm_mlgw, ph_lm_mlgw, np.array(iota), np.pi/2.- np.array(phi))
+		c_plus, c_cross = model.get_polarization_coefficients([(l,m)], iota)
+		phi_0 = np.pi/2.- np.array(phi)
+		h_lm_mlgw_real, h_lm_mlgw_imag = c_plus[0,0]*amp_lm_mlgw*np.cos(ph_lm_mlgw+m*phi_0), c_cross[0,0]*amp_lm_mlgw*np.sin(ph_lm_mlgw+m*phi_0)
 		h_plus_mlgw = h_plus_mlgw + h_lm_mlgw_real
 		h_cross_mlgw = h_cross_mlgw + h_lm_mlgw_imag
 		
 		print('\t', ph_lm[0]-ph_lm_mlgw[0])
 
 			# setting spherical harmonics: amp, ph, D_L,iota, phi_0
-		h_lm_real, h_lm_imag = model._GW_generator__set_spherical_harmonics((l,m), amp_lm, ph_lm, np.array(iota), np.pi/2.- np.array(phi))
+		h_lm_real, h_lm_imag = c_plus[0,0]*amp_lm*np.cos(ph_lm+m*phi_0), c_cross[0,0]*amp_lm*np.sin(ph_lm+m*phi_0)
 		h_plus = h_plus + h_lm_real
 		h_cross = h_cross + h_lm_imag
 
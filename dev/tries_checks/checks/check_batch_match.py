@@ -0,0 +1,42 @@
+#Here we check the batched match of GW_helper.batch_match, maximised over time and phase.
+#A set of WFs is compared with a copy shifted by an integer number of samples and rotated by a constant phase: the match must be 1 and the shift and phase must be recovered.
+#We then compare the phase-only mismatch of compute_optimal_mismatch with the time and phase maximised mismatch with a PSD and we measure the time per pair.
+
+import numpy as np
+import time
+import mlgw
+from mlgw.GW_helper import batch_match, compute_optimal_mismatch
+
+N_WFs = 500
+srate = 4096.
+shift, phase = 37, 0.7
+PSD = lambda f: 1e-46*(1+np.power(30./np.maximum(f, 1e-3), 8)+np.square(f/200.)) #toy PSD, similar to the one of a ground based detector
+
+gen = mlgw.GW_generator(0)
+times = np.arange(-4, 0.05, 1/srate)
+
+np.random.seed(0)
+theta = np.column_stack([np.random.uniform(20., 60., N_WFs), np.random.uniform(10., 20., N_WFs),
+	np.random.uniform(-0.8, 0.8, (N_WFs,2)), np.full(N_WFs, 400.), np.zeros(N_WFs), np.random.uniform(0., 2*np.pi, N_WFs)])
+h_p, h_c = gen.get_WF(theta, times, (2,2))
+h = h_p+1j*h_c
+h_shifted = np.roll(h, shift, axis = 1)*np.exp(1j*phase)
+h_shifted[:,:shift] = 0.
+
+match = batch_match(len(times), 1/srate, complex_WF = True)
+M, t_shift, phi = match(h, h_shifted)
+print("Shifted WFs: min match {:.2e} | max error on the shift {:.2e} s | max error on the phase {:.2e}".format(np.min(M),
+	np.max(np.abs(t_shift-shift/srate)), np.max(np.abs(np.angle(np.exp(1j*(phi+phase)))))))
+
+	#the same WFs with a small change in the masses, with different scalar products
+theta_2 = theta.copy()
+theta_2[:,0] *= 1.001
+h_p_2, h_c_2 = gen.get_WF(theta_2, times, (2,2))
+F_phase, _ = compute_optimal_mismatch(h, h_p_2+1j*h_c_2)
+
+match = batch_match(len(times), 1/srate, PSD = PSD, f_min = 20., f_max = 1000.)
+start = time.time()
+F, _, _ = match(h_p, h_p_2, return_F = True)
+t_match = (time.time()-start)/N_WFs
+print("Median mismatch: phase only (white noise) {:.2e} | time and phase (PSD) {:.2e}".format(np.median(F_phase), np.median(F)))
+print("Time per pair: {:.2e} s".format(t_match))
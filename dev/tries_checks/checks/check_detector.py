@@ -0,0 +1,58 @@
+#Here we check the detector projection of mlgw.detector.
+#Antenna patterns and time delays are compared with the ones computed by lal (if installed).
+#The strain of each detector is compared with the polarizations given by the extrinsic projector, shifted by the time delay of the detector, and we measure the time to generate the signals of a whole injection set.
+
+import numpy as np
+import time
+import mlgw
+from mlgw.detector import detector_network
+
+N_sources = 200
+srate = 4096.
+detectors = ['H1', 'L1', 'V1']
+
+np.random.seed(0)
+theta = np.column_stack([np.random.uniform(20., 80., N_sources), np.random.uniform(10., 20., N_sources),
+	np.random.uniform(-0.8, 0.8, (N_sources,2)), np.random.uniform(100., 1000., N_sources),
+	np.random.uniform(0., np.pi, N_sources), np.random.uniform(0., 2*np.pi, N_sources)])
+ra = np.random.uniform(0., 2*np.pi, N_sources)
+dec = np.arcsin(np.random.uniform(-1., 1., N_sources))
+psi = np.random.uniform(0., np.pi, N_sources)
+t_gps = np.random.uniform(1.2e9, 1.4e9, N_sources)
+times = np.arange(-8, 0.05, 1/srate)
+
+net = detector_network(detectors)
+F_p, F_c = net.antenna_patterns(ra, dec, psi, t_gps)
+tau = net.time_delays(ra, dec, t_gps)
+
+try:
+	import lal
+	F_p_lal, F_c_lal, tau_lal = np.zeros(F_p.shape), np.zeros(F_c.shape), np.zeros(tau.shape)
+	for j, det in enumerate(detectors):
+		lal_det = lal.cached_detector_by_prefix[det]
+		for i in range(N_sources):
+			gmst = lal.GreenwichMeanSiderealTime(t_gps[i])
+			F_p_lal[i,j], F_c_lal[i,j] = lal.ComputeDetAMResponse(lal_det.response, ra[i], dec[i], psi[i], gmst)
+			tau_lal[i,j] = lal.TimeDelayFromEarthCenter(lal_det.location, ra[i], dec[i], t_gps[i])
+	print("Max difference with lal: F_p {:.2e} | F_c {:.2e} | time delay {:.2e} s".format(np.max(np.abs(F_p-F_p_lal)), np.max(np.abs(F_c-F_c_lal)), np.max(np.abs(tau-tau_lal))))
+except ImportError:
+	print("lal is not installed: skipping the comparison of antenna patterns and time delays")
+
+for backend in ['numpy', 'tensorflow']:
+	gen = mlgw.GW_generator(0, backend = backend)
+	for modes in [(2,2), None]:
+		start = time.time()
+		strain = net.get_strain(gen, theta, times, ra, dec, psi, t_gps, modes)
+		t_strain = time.time()-start
+
+			#reference, one source at the time (the numpy networks are slightly batch-size dependent: differences ~1e-5 are expected with the numpy backend)
+		err = []
+		for i in range(0, N_sources, 20):
+			projector = gen.get_extrinsic_projector(theta[i,:4], times, None if modes is None else [modes])
+			h_p, h_c = projector(theta[i,4], theta[i,5], theta[i,6], tau[i])
+			h_ref = (F_p[i,:,None]*h_p + F_c[i,:,None]*h_c).T
+			err.append(np.max(np.abs(h_ref-strain[i]))/np.max(np.abs(h_ref)))
+
+		print("Backend {} | modes {}".format(backend, '22' if modes == (2,2) else 'all'))
+		print("\tMax relative difference with the extrinsic projector: {:.2e}".format(np.max(err)))
+		print("\tTime per source ({} detectors): {:.2e} s".format(len(detectors), t_strain/N_sources))
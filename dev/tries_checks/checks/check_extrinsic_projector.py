@@ -0,0 +1,46 @@
+#Here we check the extrinsic projector (GW_generator.get_extrinsic_projector) against get_WF and we measure its speed.
+#For a single intrinsic point, many extrinsic points (D_L, iota, phi_0) are generated: the projector evaluates the ML models only once.
+#We also check that a time shift by an integer number of samples amounts to shifting the WF on the grid.
+
+import numpy as np
+import time
+import mlgw
+
+N_extrinsic = 1000
+srate = 4096.
+
+gen = mlgw.GW_generator(0, backend = 'numpy')
+times = np.arange(-8, 0.02, 1/srate)
+
+np.random.seed(0)
+theta_intrinsic = np.array([35., 20., 0.4, -0.3])
+D_L = np.random.uniform(100., 1000., N_extrinsic)
+iota = np.random.uniform(0., np.pi, N_extrinsic)
+phi_0 = np.random.uniform(0., 2*np.pi, N_extrinsic)
+t_shift = np.random.uniform(-0.01, 0.01, N_extrinsic)
+
+for modes in [[(2,2)], None]:
+	start = time.time()
+	projector = gen.get_extrinsic_projector(theta_intrinsic, times, modes)
+	h_p, h_c = projector(D_L, iota, phi_0)
+	t_proj = time.time()-start
+
+	start = time.time()
+	h_p_shift, h_c_shift = projector(D_L, iota, phi_0, t_shift)
+	t_shift_proj = time.time()-start
+
+		#get_WF, one WF at the time (the numpy networks are slightly batch-size dependent)
+	err = []
+	start = time.time()
+	for i in range(0, N_extrinsic, 50):
+		theta = np.concatenate([theta_intrinsic, [D_L[i], iota[i], phi_0[i]]])
+		h_p_WF, h_c_WF = gen.get_WF(theta, times, (2,2) if modes == [(2,2)] else modes)
+		err.append(np.max(np.abs(h_p_WF-h_p[i]))/np.max(np.abs(h_p_WF)))
+	t_WF = (time.time()-start)/len(err)
+
+	h_p_int, _ = projector(D_L[0], iota[0], phi_0[0], 5/srate)
+
+	print("Modes: {}".format('22' if modes == [(2,2)] else 'all'))
+	print("\tMax relative difference with get_WF: {:.2e}".format(np.max(err)))
+	print("\tMax relative difference for a shift of 5 samples: {:.2e}".format(np.max(np.abs(h_p_int[5:]-h_p[0,:-5]))/np.max(np.abs(h_p[0]))))
+	print("\tTime per WF: get_WF {:.2e} s | projector {:.2e} s | projector with time shifts {:.2e} s".format(t_WF, t_proj/N_extrinsic, t_shift_proj/N_extrinsic))
@@ -0,0 +1,54 @@
+#Here we check the Fisher matrices and the SNRs computed by mlgw.fisher, for a catalogue of sources.
+#The SNR is compared with the one computed directly from the FFT of the WF and the Fisher matrices with analytic gradients are compared with the ones computed with finite differences.
+#The differences of the Fisher matrices are normalized by the square root of the diagonal elements. We also measure the time per source.
+#With grad_var = "mchirp_eta", large differences are expected for nearly equal masses, where the derivative w.r.t. eta is singular.
+
+import numpy as np
+import time
+import mlgw
+from mlgw.fisher import fisher_forecast
+from scipy.signal.windows import tukey
+
+N_sources = 50
+srate = 4096.
+times = np.arange(-4., 0.02, 1/srate)
+
+def PSD(f):
+	#analytic fit of the aLIGO design sensitivity
+	x = np.maximum(f, 1.)/215.
+	return 1e-49*(np.power(x, -4.14) - 5*np.power(x, -2) + 111*(1-np.square(x)+0.5*np.power(x,4))/(1+0.5*np.square(x)))
+
+np.random.seed(0)
+theta = np.column_stack([np.random.uniform(20., 60., N_sources), np.random.uniform(10., 30., N_sources),
+	np.random.uniform(-0.5, 0.5, (N_sources,2)), np.random.uniform(200., 800., N_sources),
+	np.random.uniform(0.2, 2.9, N_sources), np.random.uniform(0., 2*np.pi, N_sources)])
+F_p, F_c = np.random.uniform(-1., 1., N_sources), np.random.uniform(-1., 1., N_sources)
+
+gen = mlgw.GW_generator(0, backend = 'numpy')
+forecast = fisher_forecast(gen, times, PSD, f_min = 20., modes = None, window = tukey(len(times), 0.1))
+
+	#SNR
+snr = forecast.snr(theta, F_p, F_c)
+h_p, h_c = gen.get_WF(theta, times, None)
+H = np.fft.rfft((F_p[:,None]*h_p + F_c[:,None]*h_c)*forecast.window, n = forecast.n_fft)*forecast.dt
+df = forecast.freqs[1] - forecast.freqs[0]
+weights = np.where(forecast.freqs >= 20., 1./PSD(forecast.freqs), 0.)
+snr_ref = np.sqrt(4*df*np.sum(np.square(np.abs(H))*weights, axis = 1))
+print("SNR: max relative difference with the direct computation {:.2e}".format(np.max(np.abs(snr/snr_ref-1))))
+
+	#Fisher
+for grad_var in ['M_q', 'mchirp_eta', 'm1_m2']:
+	start = time.time()
+	F_an = forecast.fisher(theta, F_p, F_c, grad_var = grad_var, method = 'analytic')
+	t_an = time.time() - start
+	start = time.time()
+	F_FD = forecast.fisher(theta, F_p, F_c, grad_var = grad_var, method = 'finite_differences')
+	t_FD = time.time() - start
+
+	norm = np.sqrt(np.diagonal(F_an, axis1 = 1, axis2 = 2))
+	diff = np.max(np.abs(F_an-F_FD)/(norm[:,:,None]*norm[:,None,:]), axis = (1,2))
+	params = [0, 1, 2, 3, 4, 5, 7] #phi_0 is degenerate with t_c and it is kept fixed
+	err_diff = np.median(np.abs(forecast.get_errors(F_FD, params)/forecast.get_errors(F_an, params)-1), axis = 0)
+	print("grad_var {}: time per source {:.2e} s (analytic) | {:.2e} s (finite differences)".format(grad_var, t_an/N_sources, t_FD/N_sources))
+	print("\tNormalized difference of the Fisher matrices: median {:.2e} | max {:.2e}".format(np.median(diff), np.max(diff)))
+	print("\tMedian relative difference of the errors: {}".format(np.array2string(err_diff, precision = 3)))
@@ -0,0 +1,52 @@
+#Here we compare the WFs generated in single precision (dtype = np.float32) with the ones in double precision.
+#For each WF, we compute the mismatch (white noise, no optimization over time and phase) between h = h_plus + i h_cross in the two precisions, both for the 22 mode only and for all the modes.
+#We also compare timing and memory footprint of the two precisions.
+#The results are reported in docs/usage/float32.md
+
+import numpy as np
+import time
+import mlgw
+from mlgw.GW_helper import compute_optimal_mismatch
+
+N_waves = 200
+N_batch = 20
+srate = 4096.
+
+#getting random theta
+m1_range = (5.,100.)
+m2_range = (5.,100.)
+s1_range = (-0.8,0.8)
+s2_range = (-0.8,0.8)
+d_range = (100.,1000.)
+i_range = (0,np.pi)
+phi_0_range = (0,2*np.pi)
+
+low_list = [m1_range[0],m2_range[0], s1_range[0], s2_range[0], d_range[0], i_range[0], phi_0_range[0]]
+high_list = [m1_range[1],m2_range[1], s1_range[1], s2_range[1], d_range[1], i_range[1], phi_0_range[1]]
+
+np.random.seed(0)
+theta = np.random.uniform(low = low_list, high = high_list, size = (N_waves, 7))
+times = np.arange(-8, 0.02, 1/srate)
+
+gen_64 = mlgw.GW_generator(0, backend = 'numpy', fuse_networks = True)
+gen_32 = mlgw.GW_generator(0, backend = 'numpy', fuse_networks = True, dtype = np.float32)
+
+for modes in [(2,2), None]:
+	F_list, t_64, t_32 = [], 0., 0.
+	for i in range(0, N_waves, N_batch):
+		theta_ = theta[i:i+N_batch]
+		start = time.time()
+		h_p_64, h_c_64 = gen_64.get_WF(theta_, times, modes)
+		t_64 += time.time()-start
+		start = time.time()
+		h_p_32, h_c_32 = gen_32.get_WF(theta_, times, modes)
+		t_32 += time.time()-start
+
+		F, _ = compute_optimal_mismatch(h_p_64+1j*h_c_64, (h_p_32+1j*h_c_32).astype(np.complex128), optimal = False)
+		F_list.append(F)
+	F = np.concatenate(F_list)
+
+	print("Modes: {}".format('22' if modes == (2,2) else 'all'))
+	print("\tMismatch float32 vs float64: median {:.2e} | 90th percentile {:.2e} | max {:.2e}".format(np.median(F), np.percentile(F, 90), np.max(F)))
+	print("\tTime per WF: float64 {:.2e} s | float32 {:.2e} s".format(t_64/N_waves, t_32/N_waves))
+	print("\tSize of the polarizations per WF: float64 {} kB | float32 {} kB".format(2*h_p_64[0].nbytes//1024, 2*h_p_32[0].nbytes//1024))
@@ -0,0 +1,41 @@
+#Here we measure the time and the memory (maximum resident set size) needed to import mlgw and to load a model.
+#Each measure is taken in a fresh interpreter, so that nothing is cached by previous imports.
+#We also list the heavy dependencies that are loaded: only the ones required by the chosen backend should appear.
+
+import subprocess
+import sys
+import numpy as np
+
+N_runs = 5
+
+heavy_modules = ['tensorflow', 'keras_tuner', 'scipy', 'scipy.stats', 'scipy.signal', 'matplotlib', 'precession', 'joblib', 'tqdm']
+
+snippets = {
+	'import mlgw': "import mlgw",
+	'load numpy backend': "import mlgw; g = mlgw.GW_generator(0, backend = 'numpy')",
+	'generate with numpy backend': "import mlgw, numpy as np; g = mlgw.GW_generator(0, backend = 'numpy'); g.get_WF([20., 10., 0.1, 0.2, 400., 0., 0.], np.linspace(-1., 0.01, 1000), modes = None)",
+	'load tensorflow backend': "import mlgw; g = mlgw.GW_generator(0, backend = 'tensorflow')",
+}
+
+template = """
+import time, sys, resource
+start = time.perf_counter()
+{}
+t = time.perf_counter()-start
+print(t)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+print(','.join([m for m in {} if m in sys.modules]))
+"""
+
+for name, snippet in snippets.items():
+	times, mem = [], []
+	for i in range(N_runs):
+		res = subprocess.run([sys.executable, '-c', template.format(snippet, heavy_modules)], capture_output = True, text = True, check = True)
+		t, rss, loaded = res.stdout.split('\n')[-4:-1]
+		times.append(float(t))
+		mem.append(int(rss)/1024.)
+
+	print("{}".format(name))
+	print("\tTime: median {:.3f} s | min {:.3f} s".format(np.median(times), np.min(times)))
+	print("\tMax RSS: {:.1f} MB".format(np.median(mem)))
+	print("\tHeavy modules loaded: {}".format(loaded if loaded else 'none'))
@@ -0,0 +1,48 @@
+#Here we check the relative binning likelihood of mlgw.likelihood against the exact likelihood, computed on the full WF.
+#The data are a WF (projected onto a detector) plus white noise, with SNR ~30. The templates are scattered around the injected parameters.
+#We report the maximum error on the log-likelihood for different numbers of bins and the time per template.
+
+import numpy as np
+import time
+import mlgw
+from mlgw.likelihood import relative_binning_likelihood
+
+N_templates = 40
+srate = 2048.
+F_p, F_c = 0.6, -0.4
+t_inj = 0.003
+
+gen = mlgw.GW_generator(0, backend = 'tensorflow')
+times = np.arange(-6, 0.05, 1/srate)
+theta_inj = np.array([40., 25., 0.3, -0.2, 400., 0.8, 1.0])
+
+np.random.seed(0)
+projector = gen.get_extrinsic_projector(theta_inj[:4], times)
+h_p, h_c = projector(*theta_inj[4:], t_inj)
+h_inj = F_p*h_p + F_c*h_c
+sigma = np.sqrt(np.sum(np.square(h_inj)))/30.
+data = h_inj + np.random.normal(0., sigma, len(times))
+weights = 1/sigma**2
+
+theta = theta_inj + np.column_stack([np.random.normal(0, 0.3, N_templates), np.random.normal(0, 0.2, N_templates),
+	np.random.normal(0, 0.02, (N_templates,2)), np.random.normal(0, 20., N_templates),
+	np.random.normal(0, 0.05, N_templates), np.random.normal(0, 0.1, N_templates)])
+t_shift = t_inj + np.random.normal(0, 2e-4, N_templates)
+
+	#exact likelihood, on the full WF
+start = time.time()
+log_L_exact = np.zeros(N_templates)
+for i in range(N_templates):
+	h_p, h_c = gen.get_extrinsic_projector(theta[i,:4], times)(*theta[i,4:], t_shift[i])
+	log_L_exact[i] = -0.5*weights*np.sum(np.square(data - F_p*h_p - F_c*h_c))
+t_exact = (time.time()-start)/N_templates
+print("Range of the log-likelihood: {:.1f}".format(np.ptp(log_L_exact)))
+
+for n_bins in [128, 256, 512, 1024]:
+	likelihood = relative_binning_likelihood(gen, data, times, theta_inj[:4], weights = weights, n_bins = n_bins)
+	start = time.time()
+	log_L = likelihood.loglikelihood(theta, t_shift, F_p, F_c)
+	t_rb = (time.time()-start)/N_templates
+	print("Bins {}".format(len(likelihood.t_edges)-1))
+	print("\tMax error on the log-likelihood: {:.2e}".format(np.max(np.abs(log_L-log_L_exact))))
+	print("\tTime per template: relative binning {:.2e} s | exact {:.2e} s".format(t_rb, t_exact))
@@ -0,0 +1,50 @@
+#Here we check the WFs generated by parallel_GW_generator against the ones of GW_generator, for a single source (1D theta) and for a batch (2D theta), with and without the output buffers.
+#The sources of a batch are split in shards among the workers: as the networks work in single precision, small differences (~1e-5) are expected, depending on the size of the shards.
+#We also measure the speed up of the parallel generation.
+
+import numpy as np
+import time
+import mlgw
+from mlgw.GW_generator import parallel_GW_generator
+
+N_sources = 2000
+times = np.linspace(-8., 0.02, 10000)
+modes = None
+
+def rel_diff(h, h_ref):
+	return np.max(np.abs(h-h_ref))/np.max(np.abs(h_ref))
+
+if __name__ == '__main__':
+	np.random.seed(0)
+	theta = np.column_stack([np.random.uniform(10., 60., N_sources), np.random.uniform(5., 30., N_sources),
+		np.random.uniform(-0.8, 0.8, (N_sources,2)), np.random.uniform(200., 800., N_sources),
+		np.random.uniform(0., np.pi, N_sources), np.random.uniform(0., 2*np.pi, N_sources)])
+
+	gen = mlgw.GW_generator(0, backend = 'numpy')
+	start = time.time()
+	h_p_ref, h_c_ref = gen.get_WF(theta, times, modes)
+	t_serial = time.time() - start
+
+	with parallel_GW_generator(0, n_jobs = 4, backend = 'numpy') as par_gen:
+		for name, theta_, h_p_ref_, h_c_ref_ in [('1D theta', theta[0], h_p_ref[0], h_c_ref[0]), ('2D theta', theta, h_p_ref, h_c_ref)]:
+			start = time.time()
+			h_p, h_c = par_gen.get_WF(theta_, times, modes)
+			t_parallel = time.time() - start
+			assert h_p.shape == h_p_ref_.shape and h_c.shape == h_c_ref_.shape, "Wrong shape of the output for {}: {}".format(name, h_p.shape)
+			print("{}: relative difference {:.2e} {:.2e} | time {:.3f} s (parallel) ".format(name, rel_diff(h_p, h_p_ref_), rel_diff(h_c, h_c_ref_), t_parallel))
+
+			out = (np.zeros(h_p_ref_.shape), np.zeros(h_c_ref_.shape))
+			res = par_gen.get_WF(theta_, times, modes, out = out)
+			assert res[0] is out[0] and res[1] is out[1], "The output buffers are not returned for {}".format(name)
+			print("{} with out: relative difference {:.2e} {:.2e}".format(name, rel_diff(out[0], h_p_ref_), rel_diff(out[1], h_c_ref_)))
+			del h_p, h_c #the outputs are views of the shared memory: they are deleted before the pool is closed
+
+		#modes, with amplitude and/or phase
+		amp_ref, ph_ref = gen.get_modes(theta[:,:4], times, [(2,2), (3,3)])
+		for outputs in [('amp', 'ph'), 'amp', 'ph']:
+			amp, ph = par_gen.get_modes(theta[:,:4], times, [(2,2), (3,3)], outputs = outputs)
+			diffs = ["{} {:.2e}".format(o, rel_diff(res, res_ref)) for o, res, res_ref in zip(['amp', 'ph'], [amp, ph], [amp_ref, ph_ref]) if res is not None]
+			print("Modes with outputs = {}: relative difference {}".format(outputs, ' | '.join(diffs)))
+			del amp, ph
+
+	print("Serial generation of {} WFs: {:.3f} s".format(N_sources, t_serial))
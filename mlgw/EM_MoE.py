@@ -9,8 +9,6 @@ Module EM_MoE.py
 """
 #################
 
-import scipy.stats
-import scipy.optimize
 import numpy as np
 import sys
 import os
@@ -85,11 +83,11 @@ MoE_model
 	====
 		Load the model from file. It changes parameters D and K if required.
 		Input:
-			exp_file		file to load the expert model from
-			gat_file		file to load the model for gating function from (using function load_function)
+			exp_file		file to load the expert model from (or array with its content)
+			gat_file		file to load the model for gating function from (using function load_function), or array with its content
 			gating_function	function for loading the gating function model from file
 		"""
-		weights = np.loadtxt(exp_file)
+		weights = exp_file if isinstance(exp_file, np.ndarray) else np.loadtxt(exp_file)
 		self.W = weights[:weights.shape[0]-2,:]
 		self.b = weights[weights.shape[0]-2,:]
 		self.sigma = weights[weights.shape[0]-1,:]
@@ -175,6 +173,7 @@ MoE_model
 		y = np.repeat( np.reshape(y, (len(y),1)), self.K, axis = 1) #(N,K)
 
 		#print('sigma: ', self.sigma)
+		import scipy.stats
 		res = scipy.stats.norm.pdf( np.divide((y - gaussians_mean), self.sigma) ) #(N,K)
 		return np.divide(res, self.sigma) #normalizing result
 
@@ -482,9 +481,9 @@ softmax_regression
 	====
 		Load the model from file.
 		Input:
-			filename	name of the file to load the model from
+			filename	name of the file to load the model from (or array with its content)
 		"""
-		self.V = np.loadtxt(filename)
+		self.V = filename if isinstance(filename, np.ndarray) else np.loadtxt(filename)
 		self.D = self.V.shape[0]-1
 		self.K = self.V.shape[1]
 		return self
@@ -713,6 +712,7 @@ softmax_regression
 		loss = lambda V, a,b,c: self.loss(V,(a,b,c))
 		grad = lambda V, a,b,c: self.grad(V,(a,b,c))
 
+		import scipy.optimize
 		res = scipy.optimize.fmin_bfgs(loss, self.V.reshape(((self.D+1)*self.K,)), grad, args , disp = verbose)
 		self.V = res.reshape((self.D+1,self.K))
 
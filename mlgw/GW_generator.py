@@ -21,32 +21,30 @@ It makes use of modules EM_MoE.py and ML_routines.py for an implementation of a
 #FIXME: make the MoE model compatible also with 1D vectors (i.e. one single expert)
 
 import os
-import glob
 import sys
 import warnings
 import numpy as np
 import ast
-import tensorflow as tf
-from tensorflow.keras import models as keras_models
-from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
 import inspect
+import hashlib
+import json
+import concurrent.futures
+import threading
+import contextlib
 sys.path.insert(1, os.path.dirname(__file__)) 	#adding to path folder where mlgw package is installed (ugly?)
 from .EM_MoE import MoE_model #WARNING commented out 
-from .ML_routines import PCA_model, add_extra_features, jac_extra_features, augment_features
-from .NN_model import mlgw_NN
+from . import bundle
+from .ML_routines import add_extra_features, jac_extra_features, augment_features, jac_augment_features, numpy_NN, numpy_NN_stack
 #from .precession_helper import angle_manager, get_alpha0_beta0_gamma0, angle_params_keeper, CosinesLayer, augment_for_angles, to_polar, get_beta_trend_fast, get_fref_at_time_IMR
-from scipy.special import factorial as fact
 from pathlib import Path
-import scipy
-import precession
-
-
-import matplotlib.pyplot as plt #DEBUG
 import re
-import joblib
+
+	#Only the dependencies needed for inference are imported here: the others (tensorflow, scipy, joblib, precession...) are imported where they are used
 
 warnings.simplefilter("always", UserWarning) #always print a UserWarning message ??
 
+AMP_PREFACTOR = 4.7864188273360336e-20 #G/c^2*(M_sun/Mpc): amplitude of a WF of total mass 1 M_sun at a distance of 1 Mpc
+
 #############DEBUG PROFILING
 try:
 	from line_profiler import LineProfiler
@@ -106,6 +104,175 @@ def list_models(print_out = True):
 
 	return to_return
 
+def get_cache_folder(folder, tag = ''):
+	"""
+	Returns the folder where the objects derived from a model folder (e.g. the frozen TF graphs of the networks) are cached.
+	The cache folder is named after a hash of the content of the model folder and of the source code of mlgw: any change in the model or in the code invalidates the cache.
+	The root of the cache is set by the environment variable ``MLGW_CACHE_DIR`` (default ``~/.cache/mlgw``). If ``MLGW_CACHE_DIR`` is set to an empty string, the cache is disabled.
+
+	Input:
+		folder: str
+			folder of the model (or folder within a bundle, see :mod:`bundle`)
+		tag: str
+			string to further identify the cache (e.g. the tensorflow version)
+
+	Output:
+		cache_folder: str
+			folder of the cache (None if the cache is disabled)
+	"""
+	cache_dir = os.environ.get('MLGW_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'mlgw'))
+	if not cache_dir:
+		return None
+
+	code_folder = Path(os.path.dirname(inspect.getfile(list_models)))
+	file_hash = hashlib.sha256(tag.encode())
+	bundle.hash_content(str(folder), file_hash)
+	for f in sorted(code_folder.glob('*.py')):
+		file_hash.update(f.name.encode())
+		file_hash.update(f.read_bytes())
+	return os.path.join(cache_dir, file_hash.hexdigest())
+
+def save_frozen_graph(function, filename, features = None):
+	"""
+	Saves to file a frozen TF function (as returned by ``convert_variables_to_constants_v2``), so that it can be loaded by :func:`load_frozen_graph` without rebuilding the keras model and tracing the function.
+	Two files are written: filename.pb with the graph and filename.json with the names of inputs and outputs. Files are first written to a temporary file and then moved, so that concurrent processes never read an incomplete file.
+
+	Input:
+		function: ConcreteFunction
+			frozen function to save
+		filename: str
+			name of the file (without extension)
+		features: list
+			features of the network (if any), to be attached to the loaded function
+	"""
+	os.makedirs(os.path.dirname(filename), exist_ok = True)
+	metadata = {'inputs': [(t.name, t.shape.as_list(), t.dtype.name) for t in function.inputs],
+		'outputs': [t.name for t in function.outputs], 'features': features}
+	for ext, content in [('.pb', function.graph.as_graph_def().SerializeToString()), ('.json', json.dumps(metadata).encode())]:
+		tmp_filename = '{}{}.{}.tmp'.format(filename, ext, os.getpid())
+		with open(tmp_filename, 'wb') as f:
+			f.write(content)
+		os.replace(tmp_filename, filename+ext)
+
+def load_frozen_graph(filename):
+	"""
+	Loads a frozen TF function saved by :func:`save_frozen_graph`.
+	The function returns a list of tensors, as the function it was saved from.
+
+	Input:
+		filename: str
+			name of the file (without extension)
+
+	Output:
+		function: ConcreteFunction
+			the frozen function (None if the files are not found)
+	"""
+	if not (os.path.isfile(filename+'.json') and os.path.isfile(filename+'.pb')):
+		return None
+	import tensorflow as tf
+
+	with open(filename+'.json') as f:
+		metadata = json.load(f)
+	graph_def = tf.compat.v1.GraphDef()
+	with open(filename+'.pb', 'rb') as f:
+		graph_def.ParseFromString(f.read())
+
+		#the inputs of the graph are mapped to the arguments of the function
+	def imported_graph(*inputs):
+		input_map = {name: input_ for (name, _, _), input_ in zip(metadata['inputs'], inputs)}
+		return tf.compat.v1.import_graph_def(graph_def, input_map = input_map, return_elements = metadata['outputs'], name = '')
+	function = tf.compat.v1.wrap_function(imported_graph, [tf.TensorSpec(shape, dtype) for _, shape, dtype in metadata['inputs']])
+	function.features = metadata['features']
+	return function
+
+
+class call_cache(contextlib.ContextDecorator):
+	"""
+	Memo of the intermediate quantities computed during a single call of the generator (raw modes, orbital angular momentum, polar spins...), keyed by the name of the quantity, by the object computing it and by the value of the parameters.
+	The memo is open only inside a ``with call_cache():`` block (or a function decorated with ``@call_cache()``): in this way the different stages of a call (e.g. the angles and the twist of :func:`GW_generator.get_twisted_modes`) share the quantities they have in common and nothing is kept in memory after the call. Outside the block, every quantity is computed each time it is requested.
+	A block can memoize only some quantities (e.g. the functions generating many modes memoize only the quantities shared by the modes, listed in ``modes_quantities``, and not the raw modes). In nested blocks, a quantity is memoized if any of the open blocks memoizes it.
+	Each thread has its own memo. The memoized arrays are shared by all the callers: they must not be modified in place.
+	"""
+	_local = threading.local()
+	modes_quantities = ('fused_red_coefficients', 'interpolator') #quantities shared by all the modes generated in a call
+
+	def __init__(self, names = None):
+		"""
+		Input:
+			names: tuple
+				names of the quantities memoized inside the block (if None, all the quantities are memoized)
+		"""
+		self.names = None if names is None else tuple(names)
+
+	def __enter__(self):
+		stack = getattr(self._local, 'stack', [])
+		if len(stack) == 0: self._local.memo = {}
+		self._local.stack = stack + [self.names]
+		return self
+
+	def __exit__(self, *exc):
+		self._local.stack = self._local.stack[:-1]
+		if len(self._local.stack) == 0: self._local.memo = None
+		return False
+
+	@classmethod
+	def __get_memo(cls, name):
+		"""
+		Returns the memo, if the quantity is memoized by one of the open blocks, None otherwise.
+		"""
+		stack = getattr(cls._local, 'stack', [])
+		if any([names is None or name in names for names in stack]):
+			return cls._local.memo
+		return None
+
+	@classmethod
+	def get(cls, name, owner, theta, function):
+		"""
+		Returns the value of a quantity, computing it with ``function()`` only if it is not already in the memo.
+		
+		Input:
+			name: str
+				name of the quantity
+			owner: object
+				object that computes the quantity (e.g. the mode generator of a raw mode)
+			theta: :class:`~numpy:numpy.ndarray`
+				parameters the quantity depends on
+			function: callable
+				function with no arguments that computes the quantity
+
+		Output:
+			value: object
+				value of the quantity
+		"""
+		value = cls.lookup(name, owner, theta)
+		if value is None:
+			value = cls.store(name, owner, theta, function())
+		return value
+
+	@classmethod
+	def lookup(cls, name, owner, theta):
+		"""
+		Returns the value of a quantity if it is in the memo, None otherwise (see :func:`get` for the inputs).
+		"""
+		memo = cls.__get_memo(name)
+		if memo is None:
+			return None
+		return memo.get(cls.__get_key(name, owner, theta), None)
+
+	@classmethod
+	def store(cls, name, owner, theta, value):
+		"""
+		Stores the value of a quantity in the memo (if the memo is open) and returns it (see :func:`get` for the inputs).
+		"""
+		memo = cls.__get_memo(name)
+		if memo is not None:
+			memo[cls.__get_key(name, owner, theta)] = value
+		return value
+
+	@staticmethod
+	def __get_key(name, owner, theta):
+		theta = np.asarray(theta)
+		return (name, id(owner), theta.dtype.str, theta.shape, theta.tobytes())
 
 class GW_generator:
 	"""
@@ -119,8 +286,10 @@ class GW_generator:
 	The model shall be saved in a single folder, which collects a different subfolder "lm" for each mode to generate. Each mode is independent from the others and modes can be added at will.
 	Some default models are already included in the package.
 	"""
+	_twist_max_step = 1024 #maximum number of points of the time grid between two nodes of the decimated twist (see get_twisted_modes)
+	_twist_min_interval = 400 #minimum size (number of points times number of rows) of the intervals interpolated by the decimated twist: on smaller intervals, the overhead of the interpolation is larger than the cost of the exact D matrix (see __get_decimated_twist)
 
-	def __init__(self, folder = 0, verbose = False):
+	def __init__(self, folder = 0, verbose = False, fuse_networks = False, backend = 'tensorflow', dtype = np.float64, modes = None, lazy = False):
 		"""
 		Initialise class by loading the modes from file.
 		A number of pre-fitted models for the modes are released: they can be loaded with folder argument by specifying an integer index (default 0. They are all saved in "__dir__/TD_models/model_(index_given)". A list of the available models can be listed with list models().
@@ -128,12 +297,31 @@ class GW_generator:
 		
 		Inputs:
 			folder: str
-				Folder in which everything is kept (if None, models must be loaded manually with load())
+				Folder in which everything is kept, or a single file bundle ".mlgw" exported by :func:`bundle.export_bundle` (if None, models must be loaded manually with load())
 			verbose: str
 				Whether to be verbose when loading the model
+			fuse_networks: bool
+				Whether to compile the neural networks of all the modes into a single TF graph (see :class:`fused_NN_graph`). This reduces the overhead of the TF calls for small batches.
+			backend: str
+				Backend for the inference of the neural networks: 'tensorflow' (default) or 'numpy'. The numpy backend evaluates the networks with plain matrix multiplications and does not import tensorflow
+			dtype: type
+				Precision of the generated WFs: np.float64 (default) or np.float32. In single precision, amplitude PCA, interpolation and polarizations are in single precision; the phase is kept accurate by wrapping it modulo 2pi before interpolation (see :func:`mode_generator_base.set_dtype`).
+			modes: list
+				List of (l,m) modes to load (if None, all the modes in the folder are loaded). If modes are given, the angles model is loaded only when it is first required
+			lazy: bool
+				Whether to load each mode (and the angles model) only when it is first required
 		"""
-		self.modes = [] #list of modes (classes mode_generator)
+		self.modes = [] #list of modes (classes mode_generator): an entry is None if the mode is not loaded yet
 		self.mode_dict = {}
+		self.mode_folders = {} #folders (and backend) of the modes not loaded yet
+		self.angles_folder = None
+		self.lazy_lock = threading.Lock()
+		self.fused_graph = None
+		self.FD_cache = {} #windows and phase shifts for get_FD_WF
+		self.Wigner_d_tables = {} #coefficients of the Wigner d functions for each l (see __get_Wigner_d_table)
+		if dtype not in [np.float32, np.float64]:
+			raise ValueError("Wrong dtype chosen. Expected np.float32 or np.float64, given {}".format(dtype))
+		self.dtype = dtype
 
 		if folder is not None:
 			if type(folder) is int:
@@ -141,7 +329,7 @@ class GW_generator:
 				folder = os.path.dirname(inspect.getfile(GW_generator))+"/TD_models/model_"+str(folder)
 				if not os.path.isdir(folder):
 					raise RuntimeError("Given value {0} for pre-fitted model is not valid. Available models are:\n{1}".format(str(int_folder), list_models(False)))
-			self.load(folder, verbose)
+			self.load(folder, verbose, fuse_networks, backend, modes = modes, lazy = lazy)
 		return
 
 	def __extract_mode(self, folder):
@@ -167,29 +355,39 @@ class GW_generator:
 			return None
 		return lm
 
-	def load(self, folder, verbose = False):
+	def load(self, folder, verbose = False, fuse_networks = False, backend = 'tensorflow', n_threads = None, modes = None, lazy = False):
 		"""
 		Loads the GW generator by loading the different mode_generator classes.
 		Each mode is loaded from a dedicated folder in the given folder of the model.
 		An optional README files holds some information about the model.
+		If `lazy` is True, the modes are only listed: each of them is loaded the first time it is required (see :func:`get_mode_obj`), so that startup time and memory scale with the modes actually used.
 		
 		Inputs:
 			folder: str
 				Folder in which everything is kept
 			verbose: bool
 				Whether to be verbose
+			fuse_networks: bool
+				Whether to compile the neural networks of all the modes into a single TF graph
+			backend: str
+				Backend for the inference of the neural networks: 'tensorflow' or 'numpy'
+			n_threads: int
+				Number of threads to load the modes concurrently (if None, one for each mode, up to the number of CPUs)
+			modes: list
+				List of (l,m) modes to load (if None, all the modes in the folder are loaded). If modes are given, the angles model is loaded only when it is first required
+			lazy: bool
+				Whether to load each mode (and the angles model) only when it is first required. If fuse_networks is True, all the modes are loaded anyway
 		"""
-		if not os.path.isdir(folder):
+		if not bundle.isdir(folder):
 			raise RuntimeError("Unable to load folder "+folder+": no such directory!")
 
 		if not folder.endswith('/'):
 			folder = folder + "/"
 		if verbose: print("Loading model from: ", folder)
-		file_list = os.listdir(folder)
+		file_list = bundle.listdir(folder)
 		
 		if 'README' in file_list:
-			with open(folder+"README") as f:
-				contents = f.read()
+			contents = bundle.read_bytes(folder+"README").decode()
 			self.readme = ast.literal_eval(contents) #dictionary holding some relevant information about the model loaded
 			try:
 				self.readme = ast.literal_eval(contents) #dictionary holding some relevant information about the model loaded
@@ -202,34 +400,133 @@ class GW_generator:
 			self.readme = None
 
 		#Loading angles (if any)
+		self.angle_trend_generator = None
+		self.angle_trend_scaler = None
 		if 'angles' in file_list:
-			with tf.keras.utils.custom_object_scope({'CosinesLayer': CosinesLayer}):
-				self.angle_trend_generator = tf.keras.saving.load_model(folder+'angles/model.keras')
-			self.angle_trend_scaler = joblib.load(folder+'angles/scaler.gz')
+			self.angles_folder = folder+'angles/'
 			file_list.remove('angles')
-			if verbose: print('\tLoaded angles modes')
-		else:
-			self.angle_trend_generator = None
-			self.angle_trend_scaler = None
-
+			if not lazy and modes is None: #a caller asking only for some modes may never need the angles
+				self.__load_angles()
+				if verbose: print('\tLoaded angles modes')
 
 		#loading modes
-		for mode in file_list:
-			lm = self.__extract_mode(folder+mode)
-			if lm is None:
-				continue
-			else:
+		lm_list = [(self.__extract_mode(folder+mode), folder+mode) for mode in file_list]
+		lm_list = [(lm, mode_folder) for lm, mode_folder in lm_list if lm is not None]
+
+		if modes is not None:
+			modes = [tuple(mode) for mode in modes]
+			for mode in modes:
+				if mode not in [lm for lm, _ in lm_list]:
+					warnings.warn("Unable to find mode {} in folder {}: skipping it".format(mode, folder))
+			lm_list = [(lm, mode_folder) for lm, mode_folder in lm_list if lm in modes]
+
+			#the coefficients of the Wigner d functions are computed once for all the l of the model
+		for l in set([lm[0] for lm, _ in lm_list]):
+			self.__get_Wigner_d_table(l)
+
+		if lazy:
+			for lm, mode_folder in lm_list:
+				self.mode_dict[lm] = len(self.modes)
+				self.modes.append(None)
+				self.mode_folders[lm] = (mode_folder, backend)
+		else:
+				#the modes are independent and they are loaded concurrently
+			if n_threads is None: n_threads = min(len(lm_list), os.cpu_count() or 1)
+			with concurrent.futures.ThreadPoolExecutor(max(n_threads, 1)) as executor:
+				mode_generators = list(executor.map(lambda args: self.__load_mode(*args, backend), lm_list))
+
+			for (lm, _), mode_generator in zip(lm_list, mode_generators):
 				self.mode_dict[lm] = len(self.modes)
+				self.modes.append(mode_generator)
+				if verbose: print('\tLoaded mode {}'.format(lm))
 
-					#Checking for the type of mode generator (FIXME: make this better! How to know which generator to use?)
-				isNN = len(glob.glob(folder+mode+'/*keras'))
-				if isNN:
-					self.modes.append(mode_generator_NN(lm, folder+mode)) #loads mode_generator
-				else:
-					self.modes.append(mode_generator_MoE(lm, folder+mode)) #loads mode_generator
+		if fuse_networks:
+			self.fuse_networks(verbose)
+
+		return
+
+	def __load_mode(self, lm, mode_folder, backend):
+		"""
+		Loads the mode generator of a single mode from its folder.
+
+		Input:
+			lm: tuple
+				(l,m) of the mode
+			mode_folder: str
+				folder holding the mode
+			backend: str
+				backend for the inference of the neural networks
+
+		Output:
+			mode_generator: :class:`mode_generator_base`
+				mode generator for the mode (:class:`mode_generator_NN` or :class:`mode_generator_MoE`)
+		"""
+			#Checking for the type of mode generator (FIXME: make this better! How to know which generator to use?)
+		isNN = len(bundle.glob(mode_folder+'/*keras'))
+		if isNN:
+			mode_generator = mode_generator_NN(lm, mode_folder, backend) #loads mode_generator
+		else:
+			mode_generator = mode_generator_MoE(lm, mode_folder) #loads mode_generator
+		mode_generator.set_dtype(self.dtype)
+		return mode_generator
+
+	def __load_angles(self):
+		"""
+		Loads the ML model for the reduced Euler angles (and its scaler) from the folder `angles` of the model.
+		"""
+		import tensorflow as tf
+		import joblib
+		with tf.keras.utils.custom_object_scope({'CosinesLayer': CosinesLayer}):
+			self.angle_trend_generator = tf.keras.saving.load_model(bundle.get_file(self.angles_folder+'model.keras'))
+		self.angle_trend_scaler = joblib.load(bundle.get_file(self.angles_folder+'scaler.gz'))
+		return
+
+	def __get_mode_generator(self, mode):
+		"""
+		Returns the mode generator of a given mode, loading it if it was not loaded yet.
+		It raises a KeyError if the mode is not available.
 
-			if verbose: print('\tLoaded mode {}'.format(lm))
+		Input:
+			mode: tuple
+				(l,m) of the required mode
 
+		Output:
+			mode_obj: :class:`mode_generator_base`
+				mode generator for the mode
+		"""
+		mode_id = self.mode_dict[mode]
+		if self.modes[mode_id] is None:
+			with self.lazy_lock:
+				if self.modes[mode_id] is None:
+					mode_folder, backend = self.mode_folders[mode]
+					self.modes[mode_id] = self.__load_mode(mode, mode_folder, backend)
+					if self.fused_graph is not None:
+						warnings.warn("Mode {} was loaded after fusing the networks: it is not part of the fused graph".format(mode))
+					del self.mode_folders[mode]
+		return self.modes[mode_id]
+
+	def fuse_networks(self, verbose = False):
+		"""
+		Compiles the neural networks of all the loaded :class:`mode_generator_NN` into a single frozen TF graph (see :class:`fused_NN_graph`).
+		After the call, the reduced coefficients of all the modes are computed with a single graph call for each batch of parameters.
+		The modes not loaded yet (see `lazy` in :func:`load`) are loaded before fusing.
+		
+		Inputs:
+			verbose: bool
+				Whether to be verbose
+		"""
+		NN_modes = [self.__get_mode_generator(lm) for lm in self.mode_dict]
+		NN_modes = [mode for mode in NN_modes if isinstance(mode, mode_generator_NN)]
+		if not NN_modes:
+			warnings.warn("No neural network mode is loaded: there is nothing to fuse")
+			return
+		if NN_modes[0].backend == 'numpy':
+			self.fused_graph = fused_NN_numpy(NN_modes)
+		else:
+			self.fused_graph = fused_NN_graph(NN_modes)
+		for mode in NN_modes:
+			mode.fused_graph = self.fused_graph
+		if verbose: print('\tFused the networks of modes {}'.format(self.fused_graph.modes))
 		return
 
 	def get_precessing_params(self, m1, m2, s1, s2):
@@ -325,9 +622,7 @@ class GW_generator:
 			mode_list: list
 				List with the available modes
 		"""
-		mode_list = []
-		for mode in self.modes:
-			mode_list.append(mode.lm())
+		mode_list = list(self.mode_dict.keys())
 		if print_screen: print(mode_list)
 		return mode_list
 
@@ -371,7 +666,7 @@ class GW_generator:
 		return self.get_WF(theta, t_grid= t_grid, modes = (2,2))
 
 	#@do_profile(follow=[])
-	def get_WF(self, theta, t_grid, modes = (2,2) ):
+	def get_WF(self, theta, t_grid, modes = (2,2), out = None):
 		"""
 		Generates a WF according to the model. It makes all the required preprocessing to include wave dependance on the full 14 parameters space of the GW forms. It outputs the plus cross polarization of the WF.
 		All the available modes are employed to build the WF.
@@ -402,6 +697,7 @@ class GW_generator:
 			[spin] = adimensional
 		
 		User might choose which modes are to be included in the WF.
+		The polarizations can be written in arrays given by the user (e.g. to reuse the same memory across many calls): in this case, the modes are accumulated in place.
 
 		Input:
 			theta: :class:`~numpy:numpy.ndarray`
@@ -410,6 +706,8 @@ class GW_generator:
 				shape (D',) - a grid in (reduced) time to evaluate the wave at (uses np.interp)
 			modes: list
 				list of modes employed for building the WF (if None, every mode available is employed)
+			out: tuple
+				two arrays (h_plus, h_cross) of shape (D',)/(N,D') and precision of the generator, to store the output in (if None, new arrays are allocated)
 
 		Ouput:
 			h_plus, h_cross (D,)/(N,D)		desidered polarizations (if it applies)
@@ -418,7 +716,7 @@ class GW_generator:
 		
 		if isinstance(modes,tuple) and modes != (2,2):
 			modes = [modes]
-		theta = np.array(theta) #to ensure user theta is copied into new array
+		theta = np.asarray(theta) #theta is never modified: a new array is built only if the layout is not standard
 		if theta.ndim == 1:
 			to_reshape = True #whether return a one dimensional array
 			theta = theta[np.newaxis,:] #(1,D)
@@ -458,12 +756,147 @@ class GW_generator:
 		if np.any(np.logical_and(theta[:,[2,3]]>=1,theta[:,[2,3]]<=-1)):
 			raise ValueError("Wrong value for spins, please set a value in range [-1,1]")
 
+		if out is not None:
+			check_out_buffers(out, (len(t_grid),) if to_reshape else (theta.shape[0], len(t_grid)), self.dtype)
+			if to_reshape: out = tuple([out_[None,:] for out_ in out]) #(1,D)
+
 			#generating waves and returning to user
-		h_plus, h_cross = self.__get_WF(theta, t_grid, modes) #(N,D)
+		h_plus, h_cross = self.__get_WF(theta, t_grid, modes, out) #(N,D)
 		if to_reshape:
 			return h_plus[0,:], h_cross[0,:] #(D,)
 		return h_plus, h_cross #(N,D)
 
+	def get_FD_WF(self, theta, f_grid = None, df = None, f_min = None, srate = 4096., modes = (2,2), taper_duration = 0.2):
+		"""
+		Generates the WF in frequency domain, as the Fourier transform of the time domain WF given by :func:`get_WF`:
+
+		.. math::
+
+			\tilde{h}(f) = \int dt \, h(t) e^{-2\pi i f t}
+
+		The time of the peak of the 22 mode is t = 0. The phase of each mode is set to its value at the beginning of the model, as in :func:`get_WF` with a time grid starting before the model.
+		The WFs are sampled with sampling rate ``srate`` on a common time grid, which is long enough to hold all of them. Each WF starts either at the start of the model or at the time at which the 22 mode has frequency 2*f_min/m_max (m_max being the largest m among the modes), whichever comes later. The beginning of each WF is tapered with a Hann window.
+		The grid is zero-padded to a fast FFT length, which is a multiple of srate/df, so that the frequencies of the FFT include all the multiples of df. The FFT is batched over all the WFs.
+		The windows and the phase shifts are cached for each combination of length and sampling rate.
+
+		It accepts theta in the same layouts of :func:`get_WF`.
+		Either a frequency grid or a frequency spacing must be given. If only df is given, the output is evaluated on the grid ``np.arange(0, srate/2+df/2, df)``.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (D,)/(N,D) - source parameters to make prediction at
+			f_grid: :class:`~numpy:numpy.ndarray`
+				shape (F,) - frequency grid (in Hz) to evaluate the WF at. It must be a subset of the multiples of df (if df is None, it is set to the smallest spacing of the grid)
+			df: float
+				frequency spacing (in Hz)
+			f_min: float
+				minimum frequency (in Hz): the WF is set to zero below f_min (if None, the WF starts at the beginning of the model)
+			srate: float
+				sampling rate (in Hz) of the time domain WF
+			modes: list
+				list of modes employed for building the WF (if None, every mode available is employed)
+			taper_duration: float
+				duration (in s) of the window that tapers the beginning of each WF
+
+		Output:
+			h_plus_f, h_cross_f: :class:`~numpy:numpy.ndarray`
+				shape (F,)/(N,F) - complex polarizations in frequency domain
+		"""
+		import scipy.fft
+
+		if f_grid is None and df is None:
+			raise ValueError("Either a frequency grid or a frequency spacing must be given")
+
+		theta = np.array(theta)
+		squeeze = (theta.ndim == 1)
+		theta = np.atleast_2d(theta)
+		if theta.shape[1] == 3:
+			m_tot = 20.*np.ones((theta.shape[0],))
+			theta_4 = np.column_stack([theta[:,0]*20./(1+theta[:,0]), 20./(1+theta[:,0]), theta[:,1:]])
+		else:
+			m_tot = theta[:,0]+theta[:,1]
+			theta_4 = theta[:,[0,1,4,7]] if theta.shape[1] == 14 else theta[:,:4]
+
+			#checking the frequency grid
+		if f_grid is not None:
+			f_grid = np.asarray(f_grid, dtype = np.float64)
+			if df is None:
+				df = np.min(np.diff(np.unique(f_grid))) if len(f_grid)>1 else f_grid[0]
+			ids_f = np.rint(f_grid/df).astype(int)
+			if np.any(np.abs(ids_f*df - f_grid) > 1e-6*df) or np.any(ids_f<0):
+				raise ValueError("The frequency grid must be a subset of the multiples of df = {} Hz".format(df))
+		if np.abs(srate/df - np.rint(srate/df)) > 1e-6*srate/df:
+			raise ValueError("The sampling rate must be a multiple of df: given srate = {} Hz and df = {} Hz".format(srate, df))
+		if f_grid is None:
+			ids_f = np.arange(int(np.rint(srate/df))//2+1)
+		if np.any(ids_f*df > srate/2.):
+			raise ValueError("The frequency grid goes beyond the Nyquist frequency {} Hz".format(srate/2.))
+
+			#start and end time of each WF
+		mode_list = self.list_modes() if modes is None else ([modes] if isinstance(modes, tuple) else modes)
+		times = self.get_mode_obj((2,2)).times
+		t_start = times[0]*m_tot #(N,)
+		if f_min is not None:
+			m_max = max([np.abs(lm[1]) for lm in mode_list])
+			tau = self.get_merger_time(2.*f_min/m_max, theta_4) #(N,)
+			t_start = np.maximum(t_start, -tau)
+		t_end = times[-1]*np.max(m_tot)
+
+			#setting the time grid: the length is a multiple of srate/df and it is a fast length for the FFT
+		n_df = int(np.rint(srate/df))
+		n_post = int(np.ceil(t_end*srate))+1
+		n_WF = n_post + int(np.ceil(-np.min(t_start)*srate))
+		k = max(1, int(np.ceil(n_WF/n_df)))
+		for k_ in range(k, 2*k+1):
+			if scipy.fft.next_fast_len(k_*n_df, real = True) == k_*n_df:
+				k = k_
+				break
+		n_fft = k*n_df
+		t0 = -(n_fft-n_post)/srate
+		t_grid = t0 + np.arange(n_fft)/srate
+
+			#An extra point before the beginning of the model sets the phase reference (see get_WF) at the beginning of the model, regardless of the time grid
+		t_grid_WF = np.concatenate([[min(t0, times[0]*np.max(m_tot))], t_grid])
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore') #the time grid is longer than the model, on purpose
+			h_p, h_c = self.get_WF(theta, t_grid_WF, modes) #(N,n_fft+1)
+		h_p, h_c = np.atleast_2d(h_p)[:,1:], np.atleast_2d(h_c)[:,1:]
+
+			#tapering the beginning of each WF
+		n_taper = max(1, int(np.rint(taper_duration*srate)))
+		window_key = ('window', n_taper)
+		if window_key not in self.FD_cache:
+			self.FD_cache[window_key] = 0.5*(1.-np.cos(np.pi*np.arange(n_taper)/n_taper)) #rising half of a Hann window
+		window = self.FD_cache[window_key]
+		ids_start = np.maximum(np.ceil((t_start-t0)*srate).astype(int), 0)
+			#the mask is 0 before the start of each WF, follows the window in the taper and is 1 after: the window is padded with a 0 and a 1, which are selected by clipping the index relative to the start
+		window = np.concatenate([[0.], window, [1.]]).astype(h_p.dtype)
+		rel = np.arange(n_fft)[None,:] - ids_start[:,None] #(N,n_fft)
+		np.clip(rel+1, 0, n_taper+1, out = rel)
+		mask = window[rel] #(N,n_fft)
+		h_p *= mask
+		h_c *= mask
+
+			#FFT: the phase shift moves the origin of time from the beginning of the grid to t = 0
+		shift_key = ('shift', n_fft, srate, n_post, k, ids_f.tobytes())
+		if shift_key not in self.FD_cache:
+			self.FD_cache = {key: val for key, val in self.FD_cache.items() if key[0] != 'shift'} #only one shift is kept
+			self.FD_cache[shift_key] = np.exp(-2j*np.pi*ids_f*df*t0)/srate
+		shift = self.FD_cache[shift_key]
+
+		h_p_f = scipy.fft.rfft(h_p, axis = 1)[:,k*ids_f]
+		h_c_f = scipy.fft.rfft(h_c, axis = 1)[:,k*ids_f]
+		h_p_f *= shift
+		h_c_f *= shift
+
+		if f_min is not None:
+			h_p_f[:, ids_f*df < f_min] = 0.
+			h_c_f[:, ids_f*df < f_min] = 0.
+
+		if squeeze:
+			return h_p_f[0], h_c_f[0]
+		return h_p_f, h_c_f
+
 	def __check_modes_input(self, theta, modes):
 		"""
 		Checks that all the inputs of get_modes and get_twisted_modes are fine and makes them ready for processing. It also states whether the output shall be squeezes over some axis.
@@ -521,19 +954,20 @@ class GW_generator:
 		if theta.ndim == 1: theta = theta[None,:]
 		dt = 0.001
 		t_grid = np.linspace(-dt,dt, 2)
-		amp, ph = self.get_modes(theta, t_grid, (2,2), out_type = "ampph")#(N,2)
+		_, ph = self.get_modes(theta, t_grid, (2,2), out_type = "ampph", outputs = ('ph',))#(N,2)
 		f_merger = 0.5* (ph[:,1]-ph[:,0])/(2*dt) #(N,)
 		return np.abs(f_merger)/(2*np.pi)
 	
 	def get_orbital_frequency(self, theta, t, dt = 1e-3):
 		"""
 		Returns the (approximate) orbital frequency in Hz, computed as half the 22 mode frequency at a given time t.
+		The phase of all the BBHs is generated with a single call to the 22 mode model and it is interpolated at the time of each BBH.
 		
 		Input:
 			theta: :class:`~numpy:numpy.ndarray`
 				shape (N,4)/(4,) - Values of the intrinsic parameters
-			t: float
-				Time at which the orbital frequency shall be evaluated (the 0 is the time of the merger)		
+			t: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - Time at which the orbital frequency shall be evaluated (the 0 is the time of the merger). If an array is given, the i-th time refers to the i-th BBH
 
 		Output:
 			f_merger: :class:`~numpy:numpy.ndarray`
@@ -543,9 +977,12 @@ class GW_generator:
 		squeeze = (theta.ndim == 1)
 
 		theta = np.atleast_2d(theta)
-		t = np.abs(t)
-		t_grid = np.array([-t-dt, -t + dt, 0.])
-		amp, ph = self.get_modes(theta, t_grid, (2,2), out_type = "ampph")#(N,2)
+		t = np.broadcast_to(np.abs(t), (theta.shape[0],))
+		t_grid = np.column_stack([-t-dt, -t + dt]) #(N,2)
+
+		mode = self.__get_mode_generator((2,2))
+		_, ph, m_tot = mode.get_scaled_raw_mode(theta, outputs = ('ph',))
+		ph = batch_interpolator(mode.times, t_grid/m_tot[:,None])(ph) #(N,2)
 		f_t = 0.5* np.abs(ph[:,1]-ph[:,0])/(2*dt)/(2*np.pi) #(N,)
 
 		if squeeze: return np.squeeze(f_t)
@@ -571,17 +1008,13 @@ class GW_generator:
 		theta = np.atleast_2d(theta)
 		
 		assert theta.shape[1] in [4,8]
+		if theta.shape[1] == 8: theta = theta[:,[0,1,4,7]]
 		
-		frefs, trefs = [], []
-		for theta_ in theta:
-			m1, m2, s1z, s2z = theta_[[0,1,4,7]] if theta_.shape == (8,) else theta_
-			tref_ = self.get_mode_obj((2,2)).times[0]*(m1+m2)+1e-3
-			fref_ = 2*self.get_orbital_frequency([m1, m2, s1z, s2z], tref_, 1e-3)
-			frefs.append(fref_) 
-			trefs.append(tref_)
+		trefs = self.get_mode_obj((2,2)).times[0]*(theta[:,0]+theta[:,1])+1e-3 #(N,)
+		frefs = 2*self.get_orbital_frequency(theta, trefs, 1e-3) #(N,)
 			
 		if squeeze: return frefs[0], trefs[0]
-		else: return np.array(frefs), np.array(trefs)
+		else: return frefs, trefs
 
 
 	def get_merger_time(self, f, theta):
@@ -602,7 +1035,7 @@ class GW_generator:
 		if theta.ndim == 1: theta = theta[None,:]
 		t_grid = np.linspace(-100,0.,1000)
 		warnings.filterwarnings('ignore')
-		_, ph = self.get_modes(theta, t_grid, (2,2), out_type = "ampph")#(N,D)
+		_, ph = self.get_modes(theta, t_grid, (2,2), out_type = "ampph", outputs = ('ph',))#(N,D)
 		warnings.filterwarnings('default')
 			#computing frequency as a function of time
 		f_t = -(1./(2*np.pi)) * np.gradient(ph, t_grid , axis = 1) #(N,D)
@@ -654,10 +1087,10 @@ class GW_generator:
 		
 		if ph is None:
 			if t_grid is not None:
-				_, ph = self.modes[self.mode_dict[(2,2)]].get_mode(theta, t_grid, out_type = 'ampph') #returns amplitude and phase of the wave
+				_, ph = self.__get_mode_generator((2,2)).get_mode(theta, t_grid, out_type = 'ampph', outputs = ('ph',)) #returns the phase of the wave
 			else:
-				_, ph = self.modes[self.mode_dict[(2,2)]].get_raw_mode(theta)
-				t_grid = self.modes[self.mode_dict[(2,2)]].times*20 #custom total mass of 20
+				_, ph = self.__get_mode_generator((2,2)).get_shared_raw_mode(theta, outputs = ('ph',))
+				t_grid = self.__get_mode_generator((2,2)).times*20 #custom total mass of 20
 		else:
 			assert t_grid is not None, "If phase is given also a time grid must be provided"
 			t_grid = np.asarray(t_grid)
@@ -703,6 +1136,21 @@ class GW_generator:
 			return theta_new[0,:]
 		return theta_new
 
+	def get_polar_spins(self, theta):
+		"""
+		Returns the spins in polar coordinates. Within a :class:`call_cache` block, they are computed only once for each theta.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,8) - source parameters (m1, m2, s1 (3,), s2 (3,))
+
+		Output:
+			s1, t1, phi1, s2, t2, phi2: :class:`~numpy:numpy.ndarray`
+				shape (N,) - magnitude, polar angle and azimuthal angle of the two spins
+		"""
+		return call_cache.get('polar_spins', self, theta,
+			lambda: (*to_polar(theta[:,[2,3,4]]).T, *to_polar(theta[:,[5,6,7]]).T))
+
 	def get_reduced_angles(self, theta, polar_spins = None):
 		"""
 		Return the reduced Euler angles as returned by the ML model. They refer to a set of angles generated at M = 20
@@ -728,7 +1176,7 @@ class GW_generator:
 		if polar_spins is not None:
 			s1, t1, phi1, s2, t2, phi2 = polar_spins
 		else:
-			s1, t1, phi1, s2, t2, phi2 = *to_polar(theta[:,[2,3,4]]).T, *to_polar(theta[:,[5,6,7]]).T
+			s1, t1, phi1, s2, t2, phi2 = self.get_polar_spins(theta)
 		#fstart = np.zeros((theta.shape[0],))
 		q = theta[:,0]/theta[:,1]
 		
@@ -740,6 +1188,9 @@ class GW_generator:
 		
 		theta_angles = augment_for_angles(theta_angles)
 		
+		if self.angle_trend_generator is None and self.angles_folder is not None:
+			with self.lazy_lock:
+				if self.angle_trend_generator is None: self.__load_angles()
 		Psi = self.angle_trend_scaler.inverse_transform(self.angle_trend_generator(theta_angles))
 		
 		if squeeze: Psi = Psi[0]
@@ -774,12 +1225,12 @@ class GW_generator:
 		
 		M_us, q = theta[:,0]+theta[:,1], theta[:,0]/theta[:,1]
 		M_std = 20.
-		s1, t1, phi1, s2, t2, phi2 = *to_polar(theta[:,[2,3,4]]).T, *to_polar(theta[:,[5,6,7]]).T
+		s1, t1, phi1, s2, t2, phi2 = self.get_polar_spins(theta)
 
 			#Generating angles on the *reduced* time grid
 		#L, omega_orb = self.get_L(theta[:,[0,1,4,7]], t_grid, ph = ph)
-		L, omega_orb = self.get_L(theta)
-		t_grid_mlgw = self.modes[self.mode_dict[(2,2)]].times*20 #Grid at which L is evaluated: goes all the way to the beginning
+		L, omega_orb = call_cache.get('L', self, theta, lambda: self.get_L(theta))
+		t_grid_mlgw = self.__get_mode_generator((2,2)).times*20 #Grid at which L is evaluated: goes all the way to the beginning
 		
 		Psi = self.get_reduced_angles(theta, (s1, t1, phi1, s2, t2, phi2) )
 		
@@ -804,6 +1255,7 @@ class GW_generator:
 		beta_ = get_beta_trend_fast(q, s1, s2, t1, t2, phi2-phi1, sqrt_r_of_t)
 		
 		if False:
+			import precession
 			r_of_t = np.square((L.T+Psi[:,2])/eta).T
 			deltachi = precession.eval_deltachi(theta1=t1, theta2=t2, q=1/q, chi1=s1, chi2=s2)
 			chieff = precession.eval_chieff(theta1=t1, theta2=t2, q=1/q, chi1=s1, chi2=s2)
@@ -817,12 +1269,9 @@ class GW_generator:
 		
 		
 			#Interpolation of the angles on the user time grid (with mass scaling)
-		alpha, beta, gamma = np.zeros((theta.shape[0], len(t_grid))), np.zeros((theta.shape[0], len(t_grid))), np.zeros((theta.shape[0], len(t_grid)))
-		for i in range(theta.shape[0]):
-			interp_grid = np.divide(t_grid, M_us[i])
-			alpha[i,:] = np.interp(interp_grid, t_grid_mlgw/M_std, alpha_[i,:])
-			beta[i,:] = np.interp(interp_grid, t_grid_mlgw/M_std, beta_[i,:])
-			gamma[i,:] = np.interp(interp_grid, t_grid_mlgw/M_std, gamma_[i,:])
+			#t_grid_mlgw/M_std is the grid of the 22 mode: the interpolator is shared with the modes
+		interpolator = batch_interpolator.get_mass_rescaled(self.__get_mode_generator((2,2)).times, t_grid, M_us)
+		alpha, beta, gamma = interpolator(alpha_), interpolator(beta_), interpolator(gamma_)
 		
 		
 		if squeeze:
@@ -891,7 +1340,7 @@ class GW_generator:
 		return alpha, beta, gamma
 		
 	#@do_profile()
-	def get_twisted_modes(self, theta, t_grid, modes, f_ref = 20., alpha0 = None, gamma0 = None, L0_frame = False, extra_stuff = None):
+	def get_twisted_modes(self, theta, t_grid, modes, f_ref = 20., alpha0 = None, gamma0 = None, L0_frame = False, extra_stuff = None, twist_tolerance = None, max_memory = None):
 		"""
 		Return the twisted modes of the model, evaluated in the given time grid.
 		The twisted mode depends on angles alpha, beta, gamma and it is performed as in eqs. (17-20) in https://arxiv.org/abs/2005.05338
@@ -909,6 +1358,10 @@ class GW_generator:
 				reference frequency (in Hz) of the 22 mode at which the theta parameters refers to
 			L0_frame: bool
 				whether to output the modes in the inertial L0_frame
+			twist_tolerance: float
+				if given, the Wigner D matrix is evaluated only on a decimated time grid, adapted to the smoothness of the Euler angles, and it is linearly interpolated within the given (absolute) tolerance on its elements (see __get_decimated_twist). If None, the D matrix is evaluated on every point of the time grid
+			max_memory: int
+				approximate budget (in bytes) for the temporary arrays of the twist: the angles and the twist are computed in chunks of rows and the D matrix is built in chunks of time, which are written in place in the output (see __get_twist_chunks). If None, all the sources are twisted at once
 		
 		Output:
 			real, imag:: :class:`~numpy:numpy.ndarray`
@@ -926,13 +1379,104 @@ class GW_generator:
 			raise ValueError("Wrong number of orbital parameters to make predictions at. Expected 8 but {} given".format(theta.shape[1]))
 
 			####
-			# Computing the angles
+			# Performing the twist
+			#the sources are processed in chunks of rows and the dense D matrix in chunks of time, to keep the memory within max_memory: each chunk is written in place in the output
+			#the quantities shared by the angles and the twist (e.g. the raw modes) are memoized for a single chunk of rows
+		l_list = sorted(set([m[0] for m in modes])) #computing the set of l to take care of
+		N, D = theta.shape[0], t_grid.shape[0]
+		h_P = np.zeros((N, D, len(modes)), dtype = np.complex64) #(N,D,K) #output matrix of precessing modes
+		alpha, beta, gamma = np.empty((N, D)), np.empty((N, D)), np.empty((N, D)) #(N,D)
+		rows_step, time_step = self.__get_twist_chunks(N, D, modes, max_memory)
+		
+		for start in range(0, N, rows_step):
+			rows = slice(start, start + rows_step)
+			with call_cache():
+				self.__get_twist_angles(theta[rows], t_grid, extra_stuff, out = (alpha[rows], beta[rows], gamma[rows]))
+				if alpha0 is not None:
+					alpha[rows] = alpha[rows] - alpha[rows,:1] + np.broadcast_to(alpha0, (N,))[rows,None]
+				if gamma0 is not None:
+					gamma[rows] = gamma[rows] - gamma[rows,:1] + np.broadcast_to(gamma0, (N,))[rows,None]
+
+					#huge loop over l_list
+				for l in l_list:
+					m_modes_list = [lm for lm in modes if lm[0] == l] #len = M #list of the twisted lm modes (with constant l) required by the user
+					ids_l = [i for i, lm in enumerate(modes) if lm[0] == l]
+					
+						#genereting the non-precessing l-modes available
+					mprime_modes_list = [lm  for lm in self.list_modes() if lm[0] == l] #NP modes generated by mlgw #len = M'
+					l_modes_p, l_modes_c = self.get_modes(theta_modes[rows], t_grid, mprime_modes_list, out_type = "realimag") #(N,D,M')
+					h_NP_l = l_modes_p +1j* l_modes_c #(N,D,M') #awful using complex numbers but necessary
+					del l_modes_p, l_modes_c
+					
+						#adding negative m modes
+					ids = np.where(np.array([m[1] for m in mprime_modes_list])>0)[0]
+					h_NP_l = np.concatenate([h_NP_l, np.conj(h_NP_l[:,:,ids])*(-1)**(l)], axis =2) #(N,D,M'')
+					mprime_modes_list = mprime_modes_list + [(m[0],-m[1]) for m in mprime_modes_list if m[1]> 0] #len = M''
+					
+						#OLD way: with TEOB conventions
+					#D_mprimem = self.__get_Wigner_D_matrix(l,[lm[1] for lm in mprime_modes_list], [lm[1] for lm in m_modes_list], -gamma, -beta, -alpha) #(N,D,M'',M)
+					#D_mprimem = np.conj(D_mprimem) #(N,D,M'',M) #complex conjugate
+					#h_P_l = np.einsum('ijkl,ijk->ijl', D_mprimem, h_NP_l) #(N,D,M)
+					
+						#twist the system to the L0 frame (if it is the case)
+					if L0_frame:
+						#See https://arxiv.org/pdf/2105.05872.pdf for the global rotation from J-frame to L-frame
+						alpha_ref = alpha[rows,0]
+						beta_ref = beta[rows,0]
+						gamma_ref = gamma[rows,0]
+						D_mmprime_L0 = self.__get_Wigner_D_matrix(l,[lm[1] for lm in m_modes_list], [lm[1] for lm in m_modes_list],  -gamma_ref, np.cos(0.5*beta_ref), -np.sin(0.5*beta_ref), -alpha_ref) #(N,M,M')
+					
+					if twist_tolerance is None:
+						time_chunks = [slice(t_start, t_start + time_step) for t_start in range(0, D, time_step)]
+					else:
+						time_chunks = [slice(None)] #the decimated twist splits the D matrix in chunks of time_step points by itself
+					for t_chunk in time_chunks:
+						if twist_tolerance is None:
+								#computing Wigner D matrix Dmm'(alpha, beta, gamma)
+							D_mmprime = self.__get_Wigner_D_matrix(l, [lm[1] for lm in m_modes_list], [lm[1] for lm in mprime_modes_list],
+								alpha[rows,t_chunk], np.cos(0.5*beta[rows,t_chunk]), np.sin(0.5*beta[rows,t_chunk]), gamma[rows,t_chunk]) #(N,D,M, M'')
+							
+								#putting everything together
+								#h_lm(t) = D_mm'(t) h_lm'
+							h_P_l = np.matmul(D_mmprime, h_NP_l[:,t_chunk,:,None])[...,0] #(N,D,M)
+							del D_mmprime
+						else:
+							h_P_l = self.__get_decimated_twist(l, [lm[1] for lm in m_modes_list], [lm[1] for lm in mprime_modes_list],
+								alpha[rows], beta[rows], gamma[rows], t_grid, h_NP_l, twist_tolerance, time_step) #(N,D,M)
+						
+						if L0_frame:
+							h_P_l = np.einsum('ilk,ijk -> ijl', D_mmprime_L0, h_P_l)
+						
+							#saving the results in the output matrix
+						h_P[rows,t_chunk][:,:,ids_l] = h_P_l
+			
+		if remove_last_dim:
+			h_P = h_P[...,0] #(N,D)
+		if remove_first_dim:
+			h_P = h_P[0,...] #(D,)/(D,K)
+		return h_P.real, h_P.imag, alpha, beta, gamma
+
+	def __get_twist_angles(self, theta, t_grid, extra_stuff, out):
+		"""
+		Computes the Euler angles used by get_twisted_modes for a chunk of rows and writes them in the given output arrays.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,8) - source parameters (m1, m2, s1x, s1y, s1z, s2x, s2y, s2z)
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - time grid
+			extra_stuff: angle_manager/str
+				how to compute the angles, as in get_twisted_modes: an angle_manager, 'IMR_angles' or None (ML angles)
+			out: tuple
+				three arrays (alpha, beta, gamma) of shape (N,D) to store the angles in
+		"""
+		if isinstance(extra_stuff, angle_manager) or extra_stuff == 'IMR_angles':
+			f_refs, _ = self.get_fref_angles(theta) #(N,)
+			t_refs = self.get_mode_obj((2,2)).times[0]*(theta[:,0]+theta[:,1]) #(N,)
+
 		if isinstance(extra_stuff, angle_manager):
-			angles = []
-			for theta_ in theta:
+			for i, (theta_, t_ref, f_ref) in enumerate(zip(theta, t_refs, f_refs)):
 
-				t_ref = self.get_mode_obj((2,2)).times[0]*(theta_[0]+theta_[1])			
-				f_ref, _ = self.get_fref_angles(theta_)
 				f_ref = get_fref_at_time_IMR(t_ref, *theta_, 0, 0, 0.999*f_ref)
 				extra_stuff.fref, extra_stuff.fstart = f_ref, f_ref
 			
@@ -945,86 +1489,152 @@ class GW_generator:
 				#alpha_+= alpha_res
 				#gamma_ += -np.cumsum(np.gradient(alpha_res, extra_stuff.times)*np.cos(beta_))*extra_stuff.dt+gamma0
 					
-				angles.append( [alpha_, beta_, gamma_])
-
-			alpha, beta, gamma = np.swapaxes(angles, 0, 1)
+				for out_, angle_ in zip(out, [alpha_, beta_, gamma_]):
+					out_[i] = angle_
 		elif extra_stuff == 'IMR_angles':
-			angles = []
-			for theta_ in theta:
-				t_ref = self.get_mode_obj((2,2)).times[0]*(theta_[0]+theta_[1])			
-				f_ref,_ = self.get_fref_angles(theta_)
+			for i, (theta_, t_ref, f_ref) in enumerate(zip(theta, t_refs, f_refs)):
 				f_ref = get_fref_at_time_IMR(t_ref, *theta_, 0, 0, 0.999*f_ref)
 
-				L, _ = self.get_L(theta_)
 				alpha_, beta_, gamma_ = self.get_alpha_beta_gamma_IMRPhenomTPHM(theta_, t_grid, f_ref, f_ref)
-				angles.append( [alpha_, beta_, gamma_])
-
-			alpha, beta, gamma = np.swapaxes(angles, 0, 1)
+				for out_, angle_ in zip(out, [alpha_, beta_, gamma_]):
+					out_[i] = angle_
 		else:
-			alpha, beta, gamma = self.get_alpha_beta_gamma(theta, t_grid)
+			for out_, angle_ in zip(out, self.get_alpha_beta_gamma(theta, t_grid)):
+				out_[...] = angle_
 
-		if alpha0 is not None:
-			alpha = alpha - alpha[:,0] + alpha0 
-		if gamma0 is not None:
-			gamma = gamma - gamma[:,0] + gamma0
-		
-		c_beta, s_beta = np.cos(beta*0.5), np.sin(beta*0.5)
+	def __get_twist_chunks(self, N, D, modes, max_memory):
+		"""
+		Returns the number of rows and of time points twisted at once by get_twisted_modes, so that the temporary arrays take roughly at most max_memory bytes.
+		For each row and each point of the time grid, the non precessing modes of a given l (real and imaginary parts and complex modes with the negative m) and the twisted modes take ~ 16 M' + 32 M'' + 32 M bytes. The Euler angles of the chunk and their temporaries take ~ 48 bytes and the interpolators memoized for the chunk ~ 32 bytes for each time grid of the modes. The rest of the budget is used for the chunks of the D matrix (dense, or on the nodes and on the short intervals of the decimated twist), which take ~ 32 M M'' bytes for each point.
 
-			####
-			# Performing the twist
-			
-		l_list = set([m[0] for m in modes]) #computing the set of l to take care of
-		h_P = np.zeros((theta.shape[0], t_grid.shape[0], len(modes)), dtype = np.complex64) #(N,D,K) #output matrix of precessing modes
-		
-			#huge loop over l_list
+		Input:
+			N: int
+				number of sources
+			D: int
+				number of points of the time grid
+			modes: list
+				modes to twist
+			max_memory: int
+				memory budget (bytes). If None, all the rows and points are processed at once
+
+		Output:
+			rows_step, time_step: int
+				number of rows and of time points of each chunk
+		"""
+		if max_memory is None:
+			return max(N, 1), max(D, 1)
+		point_bytes, D_bytes = 1, 1
+		l_list = set([lm[0] for lm in modes])
 		for l in l_list:
-			m_modes_list = [lm for lm in modes if lm[0] == l] #len = M #list of the twisted lm modes (with constant l) required by the user
-			
-				#genereting the non-precessing l-modes available
-			mprime_modes_list = [lm  for lm in self.list_modes() if lm[0] == l] #NP modes generated by mlgw #len = M'
-			l_modes_p, l_modes_c = self.get_modes(theta_modes, t_grid, mprime_modes_list, out_type = "realimag") #(N,D,M')
-			h_NP_l = l_modes_p +1j* l_modes_c #(N,D,M') #awful using complex numbers but necessary
-			
-				#adding negative m modes
-			ids = np.where(np.array([m[1] for m in mprime_modes_list])>0)[0]
-			h_NP_l = np.concatenate([h_NP_l, np.conj(h_NP_l[:,:,ids])*(-1)**(l)], axis =2) #(N,D,M'')
-			mprime_modes_list = mprime_modes_list + [(m[0],-m[1]) for m in mprime_modes_list if m[1]> 0] #len = M''
-			
-				#OLD way: with TEOB conventions
-			#D_mprimem = self.__get_Wigner_D_matrix(l,[lm[1] for lm in mprime_modes_list], [lm[1] for lm in m_modes_list], -gamma, -beta, -alpha) #(N,D,M'',M)
-			#D_mprimem = np.conj(D_mprimem) #(N,D,M'',M) #complex conjugate
-			#h_P_l = np.einsum('ijkl,ijk->ijl', D_mprimem, h_NP_l) #(N,D,M)
-			
-				#computing Wigner D matrix Dmm'(alpha, beta, gamma)
-				#FIXME: __get_Wigner_D_matrix (and __get_Wigner_d_function inside) is the bottleneck of the computation: you must heavily optimize this shit
-			D_mmprime = self.__get_Wigner_D_matrix(l, [lm[1] for lm in m_modes_list], [lm[1] for lm in mprime_modes_list],
-				alpha, c_beta, s_beta, gamma) #(N,D,M, M'')
-			
-				#putting everything together
-				#h_lm(t) = D_mm'(t) h_lm'
-			h_P_l = np.einsum('ijlk,ijk->ijl', D_mmprime, h_NP_l) #(N,D,M)
-			
-				#twist the system to the L0 frame (if it is the case)
-			if L0_frame:
-				#See https://arxiv.org/pdf/2105.05872.pdf for the global rotation from J-frame to L-frame
-				alpha_ref = alpha[:,0]
-				beta_ref = beta[:,0]
-				gamma_ref = gamma[:,0]
-				D_mmprime_L0 = self.__get_Wigner_D_matrix(l,[lm[1] for lm in m_modes_list], [lm[1] for lm in m_modes_list],  -gamma_ref, -beta_ref, -alpha_ref) #(N,M,M')
-				h_P_l = np.einsum('ilk,ijk -> ijl', D_mmprime_L0, h_P_l)
-			
-				#saving the results in the output matrix
-			ids_l = [i for i, lm in enumerate(modes) if lm[0] == l]
-			h_P[:,:,ids_l] = h_P_l
-			
-		if remove_last_dim:
-			h_P = h_P[...,0] #(N,D)
-		if remove_first_dim:
-			h_P = h_P[0,...] #(D,)/(D,K)
-		return h_P.real, h_P.imag, alpha, beta, gamma
+			M = len([lm for lm in modes if lm[0] == l])
+			M_prime = [lm[1] for lm in self.list_modes() if lm[0] == l]
+			M_second = len(M_prime) + len([m for m in M_prime if m > 0])
+			point_bytes = max(point_bytes, 16*len(M_prime) + 32*M_second + 32*M)
+			D_bytes = max(D_bytes, 32*M*M_second)
+		grids = set([self.__get_mode_generator(lm).times.tobytes() for lm in self.list_modes() if lm[0] in l_list] + [self.__get_mode_generator((2,2)).times.tobytes()])
+		point_bytes += 48 + 32*len(grids)
+		rows_step = int(min(max(N, 1), max(1, 0.5*max_memory//(point_bytes*D))))
+		time_step = int(min(max(D, 1), max(1, 0.5*max_memory//(D_bytes*rows_step))))
+		if point_bytes*D > 0.5*max_memory:
+			warnings.warn("The memory budget max_memory = {} bytes is too small to twist a single WF: the memory used will be larger".format(max_memory))
+		return rows_step, time_step
+
+	def __get_twist_nodes(self, angles, t_grid, l, tolerance):
+		"""
+		Returns the indices of the points of the time grid where the Wigner D matrix is evaluated by the decimated twist (see __get_decimated_twist).
+		Starting from a uniform decimation, each interval between two nodes is bisected until the D matrix of every WF is reproduced by linear interpolation within the tolerance. The error on the elements of D is estimated from the angles, as l times the error of the linear interpolation of the angles (checked at a quarter, half and three quarters of each interval) plus the chord error (l*Delta)^2/8, due to the change Delta of the angles within the interval.
+
+		Input:
+			angles: :class:`~numpy:numpy.ndarray`
+				shape (3,N,D) - Euler angles alpha, beta, gamma on the time grid
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - time grid
+			l: int
+				l parameter of the modes to twist
+			tolerance: float
+				tolerance on the interpolation error of the elements of the D matrix
+
+		Output:
+			nodes: :class:`~numpy:numpy.ndarray`
+				shape (D_nodes,) - increasing indices of the nodes (the first and the last point of the grid are always included)
+		"""
+		D = len(t_grid)
+		nodes = np.union1d(np.arange(0, D, self._twist_max_step), [D-1])
+		while True:
+			left, right = nodes[:-1], nodes[1:] #(D_nodes-1,)
+			f_left, f_right = angles[...,left], angles[...,right] #(3,N,D_nodes-1)
+			err_interp = np.zeros(left.shape)
+			for check in [(3*left + right)//4, (left + right)//2, (left + 3*right)//4]:
+				w = (t_grid[check] - t_grid[left])/(t_grid[right] - t_grid[left])
+				np.maximum(err_interp, np.max(np.abs(f_left + w*(f_right - f_left) - angles[...,check]), axis = (0,1)), out = err_interp)
+			err = l*err_interp + np.square(l*np.max(np.abs(f_right - f_left), axis = (0,1)))/8.
+			to_split = (err > tolerance) & (right - left > 1)
+			if not np.any(to_split):
+				return nodes
+			nodes = np.union1d(nodes, (left[to_split] + right[to_split])//2)
+
+	def __get_decimated_twist(self, l, m, m_prime, alpha, beta, gamma, t_grid, h_NP_l, tolerance, time_step = None):
+		"""
+		Twists the non precessing modes with a given l, evaluating the Wigner D matrix only on the nodes of a decimated time grid (see __get_twist_nodes) and interpolating it linearly in time.
+		The interpolated D matrix is never built on the full grid: on the interval between the nodes k and k+1, the twisted modes are D_k h + w (D_k+1 - D_k) h, computed with two matrix products for all the points of the interval.
+		On the short intervals (where the angles change quickly), the overhead of the interpolation is larger than the cost of the exact D matrix: there, the D matrix is evaluated on each point, for many short intervals at once.
+		To bound the memory, the D matrix is built on at most time_step points at a time (both on the points of the short intervals and on the nodes of the long ones).
+
+		Input:
+			l: int
+				l parameter of the modes
+			m, m_prime: list
+				m of the twisted modes (of length M) and of the non precessing modes (of length M'')
+			alpha, beta, gamma: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - Euler angles on the time grid
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - time grid
+			h_NP_l: :class:`~numpy:numpy.ndarray`
+				shape (N,D,M'') - non precessing modes
+			tolerance: float
+				tolerance on the interpolation error of the elements of the D matrix
+			time_step: int
+				maximum number of points on which the D matrix is built at once (if None, no limit)
+
+		Output:
+			h_P_l: :class:`~numpy:numpy.ndarray`
+				shape (N,D,M) - twisted modes
+		"""
+		nodes = self.__get_twist_nodes(np.stack([alpha, beta, gamma]), t_grid, l, tolerance)
+		time_step = len(t_grid) if time_step is None else max(time_step, 2)
+
+		h_P_l = np.empty(h_NP_l.shape[:2]+(len(m),), dtype = np.complex128) #(N,D,M)
+
+			#short intervals: exact D matrix on each point
+		lengths = np.diff(nodes)
+		lengths[-1] += 1 #the last node belongs to the last interval
+		is_long = lengths*h_NP_l.shape[0] >= max(self._twist_min_interval, 2*h_NP_l.shape[0])
+		ids_short = np.where(np.repeat(~is_long, lengths))[0] #(D_short,)
+		for i in range(0, len(ids_short), time_step):
+			ids = ids_short[i:i+time_step]
+			D_short = self.__get_Wigner_D_matrix(l, m, m_prime, alpha[:,ids], np.cos(0.5*beta[:,ids]), np.sin(0.5*beta[:,ids]), gamma[:,ids]) #(N,time_step,M,M'')
+			h_P_l[:,ids] = np.matmul(D_short, h_NP_l[:,ids,:,None])[...,0]
+			del D_short
+
+			#long intervals: interpolated D matrix, evaluated on the nodes of time_step//2 intervals at once
+		ids_long = np.where(is_long)[0]
+		for i in range(0, len(ids_long), time_step//2):
+			ks = ids_long[i:i+time_step//2]
+			nodes_ = np.union1d(nodes[ks], nodes[ks+1]) #nodes at the boundaries of the intervals
+			D_nodes = self.__get_Wigner_D_matrix(l, m, m_prime, alpha[:,nodes_], np.cos(0.5*beta[:,nodes_]), np.sin(0.5*beta[:,nodes_]), gamma[:,nodes_]) #(N,D_nodes,M,M'')
+			D_nodes = np.swapaxes(D_nodes, 2, 3) #(N,D_nodes,M'',M)
+			for k, left, right in zip(ks, np.searchsorted(nodes_, nodes[ks]), np.searchsorted(nodes_, nodes[ks+1])):
+				start, stop = nodes[k], (nodes[k+1] if k < len(nodes)-2 else len(t_grid)) #the last node belongs to the last interval
+				w = (t_grid[start:stop] - t_grid[start])/(t_grid[nodes[k+1]] - t_grid[start]) #(L,)
+				h_k = h_NP_l[:,start:stop] #(N,L,M'')
+				h_P_l[:,start:stop] = np.matmul(h_k, D_nodes[:,left])
+				h_P_l[:,start:stop] += np.matmul(h_k*w[None,:,None], D_nodes[:,right] - D_nodes[:,left])
+			del D_nodes
+		return h_P_l
 
 	#@do_profile()
-	def __get_WF(self, theta, t_grid, modes):
+	@call_cache(call_cache.modes_quantities)
+	def __get_WF(self, theta, t_grid, modes, out = None):
 		"""
 		Generates the waves in time domain, building it as a sum of modes weighted by spherical harmonics. Called by get_WF.
 		Accepts only input features as [q,s1,s2] or [m1, m2, spin1_z , spin2_z, D_L, inclination, phi_0].
@@ -1036,6 +1646,8 @@ class GW_generator:
 				shape (D',) - a grid in (reduced) time to evaluate the wave at (uses np.interp)
 			modes: list
 				list of modes employed for building the WF (if None, every mode available is employed)
+			out: tuple
+				two arrays of shape (N,D') to store the polarizations in (if None, new arrays are allocated)
 		Ouput:
 			h_plus, h_cross: :class:`~numpy:numpy.ndarray`
 				shape (D,)/(N,D) - desidered polarizations (if it applies)
@@ -1044,46 +1656,60 @@ class GW_generator:
 		assert D == 7
 
 			#computing amplitude prefactor
-		prefactor = 4.7864188273360336e-20 # G/c^2*(M_sun/Mpc)
 		m_tot_us = theta[:,0] + theta[:,1]	#total mass in solar masses for the user  (N,)
-		amp_prefactor = prefactor*m_tot_us/theta[:,4] # G/c^2 (M / d_L) 
-
-		h_plus = np.zeros((theta.shape[0],t_grid.shape[0]))
-		h_cross = np.zeros((theta.shape[0],t_grid.shape[0]))
+		amp_prefactor = AMP_PREFACTOR*m_tot_us/theta[:,4] # G/c^2 (M / d_L) 
 
 			#if only mode 22 is required, it is treated separately for speed up	
 		if modes == (2,2):# or modes == [(2,2)]:
-			amp_22, ph_22 = self.modes[self.mode_dict[(2,2)]].get_mode(theta[:,:4], t_grid, out_type = "ampph")
-			amp_22 =  np.sqrt(5/(4.*np.pi))*np.multiply(amp_22.T, amp_prefactor).T #G/c^2*(M_sun/Mpc) nu *(M/M_sun)/(d_L/Mpc)
+				#prefactor G/c^2*(M_sun/Mpc) nu *(M/M_sun)/(d_L/Mpc) and phase 2*phi_0 are applied on the model grid
+				#amplitude and phase are written in the output arrays (h_plus, h_cross)
+			amp_22, ph_22 = self.__get_mode_generator((2,2)).get_mode(theta[:,:4], t_grid, out_type = "ampph",
+				amp_factor = np.sqrt(5/(4.*np.pi))*amp_prefactor, ph_offset = 2.*theta[:,6], wrap_phase = True, out = out)
 				#setting spherical harmonics by hand
 			c_i = np.cos(theta[:,5]) #(N,)
-			h_p = np.multiply(np.multiply(amp_22.T,np.cos(ph_22.T+2.*theta[:,6])), 0.5*(1+np.square(c_i)) ).T
-			h_c = np.multiply(np.multiply(amp_22.T,np.sin(ph_22.T+2.*theta[:,6])), c_i ).T
+			cos_ph = np.cos(ph_22)
+			h_c = np.sin(ph_22, out = ph_22)
+			h_c *= amp_22
+			h_c *= c_i[:,None]
+			h_p = amp_22
+			h_p *= cos_ph
+			h_p *= 0.5*(1+np.square(c_i))[:,None]
 			return h_p, h_c
 
+		if out is None:
+			h_plus = np.zeros((theta.shape[0],t_grid.shape[0]), dtype = self.dtype)
+			h_cross = np.zeros((theta.shape[0],t_grid.shape[0]), dtype = self.dtype)
+		else:
+			h_plus, h_cross = out
+			h_plus.fill(0.)
+			h_cross.fill(0.)
+			#the memory for amplitude, phase and spherical harmonics is allocated once and shared by all the modes
+		buff = np.empty((3, theta.shape[0],t_grid.shape[0]), dtype = self.dtype)
+
 		if modes is None:
 			modes = self.list_modes()
 
 		for mode in modes:
 			try:	
-				mode_id = self.mode_dict[mode]
+				mode_gen = self.__get_mode_generator(mode)
 			except KeyError:
 				warnings.warn("Unable to find mode {}: mode might be non existing or in the wrong format. Skipping it".format(mode))
 				continue
 				
-			amp_lm, ph_lm = self.modes[mode_id].get_mode(theta[:,:4], t_grid, out_type = "ampph")
-			amp_lm =  np.multiply(amp_lm.T, amp_prefactor).T #G/c^2*(M_sun/Mpc) nu *(M/M_sun)/(d_L/Mpc)
-				# setting spherical harmonics: amp, ph, D_L,iota, phi_0
-			h_lm_real, h_lm_imag = self.__set_spherical_harmonics(mode, amp_lm, ph_lm, theta[:,5], theta[:,6])
-			h_plus = h_plus + h_lm_real
-			h_cross = h_cross + h_lm_imag
+				#prefactor G/c^2*(M_sun/Mpc) nu *(M/M_sun)/(d_L/Mpc) and phase m*phi_0 are applied on the model grid, before interpolation
+			amp_lm, ph_lm = mode_gen.get_mode(theta[:,:4], t_grid, out_type = "ampph",
+				amp_factor = amp_prefactor, ph_offset = mode[1]*theta[:,6], wrap_phase = True, out = (buff[0], buff[1]))
+				# setting spherical harmonics and adding the mode to the WF (in place)
+			self.__add_spherical_harmonics(mode, amp_lm, ph_lm, theta[:,5], h_plus, h_cross, buff[2])
 
 		return h_plus, h_cross
 
-	def get_modes(self, theta, t_grid, modes = (2,2), out_type = "ampph"):
+	@call_cache(call_cache.modes_quantities)
+	def get_modes(self, theta, t_grid, modes = (2,2), out_type = "ampph", out = None, outputs = ('amp', 'ph')):
 		"""
 		Return the modes in the model, evaluated in the given time grid.
 		It can return amplitude and phase (out_type = "ampph") or the real and imaginary part (out_type = "realimag").
+		If only the amplitude or only the phase is needed, it can be selected with `outputs`: the networks, the PCA reconstruction and the interpolation of the other one are skipped.
 		Each mode is aligned s.t. the peak of the 22 mode is at t=0
 	
 		Input:
@@ -1095,25 +1721,42 @@ class GW_generator:
 				list of modes to be returned (if None, every mode available is employed)
 			out_type: bool
 				whether amplitude and phase ("ampph") or real and imaginary part ("realimag") shall be returned
+			out: tuple
+				two arrays with the same shape of the output and the precision of the generator, to store the output in (if None, new arrays are allocated). The array of an output not computed is ignored (and it can be None)
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph' (both are needed for out_type = "realimag")
 	
 		Output:
 			amp, ph: :class:`~numpy:numpy.ndarray`
-				shape (N, D', K) - amplitude and phase of the K modes required by the user (if K =1, no third dimension)
+				shape (N, D', K) - amplitude and phase of the K modes required by the user (if K =1, no third dimension). An output not computed is None
 			real, imag: :class:`~numpy:numpy.ndarray`
 				shape (N, D', K) - real and imaginary part of the K modes required by the user (if K =1, no third dimension)
 		"""
 		if out_type not in ["realimag", "ampph"]:
 			raise ValueError("Wrong output type chosen. Expected \"realimag\", \"ampph\", given \""+out_type+"\"")
 
-		theta = np.array(theta)
+		outputs = check_outputs(outputs)
+		if out_type == "realimag" and outputs != ('amp', 'ph'):
+			raise ValueError("Both amplitude and phase are needed for out_type = \"realimag\", given outputs = {}".format(outputs))
+
+		theta = np.asarray(theta)
 		theta, modes, remove_first_dim, remove_last_dim = self.__check_modes_input(theta, modes)
 
 		if theta.shape[1] == 7:
 			theta = theta[:,:4]
 		K = len(modes)
 
-		res1 = np.zeros((theta.shape[0],t_grid.shape[0],K))
-		res2 = np.zeros((theta.shape[0],t_grid.shape[0],K))
+		if out is None:
+				#each mode is stored in a contiguous block of memory: the output is a (N,D',K) view
+			res1, res2 = [np.moveaxis(np.zeros((K, theta.shape[0],t_grid.shape[0]), dtype = self.dtype), 0, -1) if o in outputs else None for o in ('amp', 'ph')]
+		else:
+			out_shape = (theta.shape[0],t_grid.shape[0],K)
+			if remove_last_dim: out_shape = out_shape[:-1]
+			if remove_first_dim: out_shape = out_shape[1:]
+			res1, res2 = [out_ if o in outputs else None for out_, o in zip(out, ('amp', 'ph'))]
+			check_out_buffers([res for res in (res1, res2) if res is not None], out_shape, self.dtype)
+			if remove_first_dim: res1, res2 = [res[None,...] if res is not None else None for res in (res1, res2)]
+			if remove_last_dim: res1, res2 = [res[...,None] if res is not None else None for res in (res1, res2)] #(N,D',K)
 
 			#old version (worse)
 		#for mode in self.modes:	
@@ -1125,26 +1768,30 @@ class GW_generator:
 
 		for i, mode in enumerate(modes):
 			try:
-				mode_id = self.mode_dict[mode]
+				mode_gen = self.__get_mode_generator(mode)
 			except KeyError:
 				warnings.warn("Unable to find mode {}: mode might be non existing or in the wrong format. Skipping it".format(mode))
+				for res in (res1, res2):
+					if res is not None: res[:,:,i] = 0.
 				continue
-			res1[:,:,i], res2[:,:,i] = self.modes[mode_id].get_mode(theta, t_grid, out_type = out_type)
+			out_i = tuple([res[:,:,i] if res is not None else None for res in (res1, res2)])
+			mode_gen.get_mode(theta, t_grid, out_type = out_type, out = out_i, outputs = outputs)
 
 		if remove_last_dim:
-			res1, res2 = res1[...,0], res2[...,0] #(N,D)
+			res1, res2 = [res[...,0] if res is not None else None for res in (res1, res2)] #(N,D)
 		if remove_first_dim:
-			res1, res2 = res1[0,...], res2[0,...] #(D,)/(D,K)
+			res1, res2 = [res[0,...] if res is not None else None for res in (res1, res2)] #(D,)/(D,K)
 		return res1, res2
 		
 	def get_spherical_harmonics(self, mode, iota, phi_0):
 		"""
 		Computes the sperical harmonics.
 		We parametrize: Y_lm(iota, phi_0) = d_lm(iota) * exp(i*m*phi_0)
+		If a list of modes is given, the harmonics of all the modes are computed at once.
 		
 		Input:
 			mode: tuple
-				(l,m) of the current mode
+				(l,m) of the current mode (or list of K modes)
 			iota: :class:`~numpy:numpy.ndarray`
 				shape (N,) - inclination for each wave
 			phi_0: :class:`~numpy:numpy.ndarray`
@@ -1152,9 +1799,12 @@ class GW_generator:
 
 		Output:
 			Y_lm_real, Y_lm_imag: :class:`~numpy:numpy.ndarray`
-				shape (N,D) - real and imaginary part of the spherical harmonics
+				shape (N,)/(N,K) - real and imaginary part of the spherical harmonics
 		"""
 		iota, phi_0 = np.asarray(iota), np.asarray(phi_0)
+		if isinstance(mode, list):
+			Y_lm = [self.get_spherical_harmonics(mode_, iota, phi_0) for mode_ in mode]
+			return np.stack([Y[0] for Y in Y_lm], axis = -1), np.stack([Y[1] for Y in Y_lm], axis = -1)
 		l,m = mode
 			#computing the iota dependence of the WF
 		d_lm = self.__get_Wigner_d_function(l,-m,-2,np.cos(iota*0.5), np.sin(iota*0.5)) #(N,)
@@ -1162,111 +1812,192 @@ class GW_generator:
 		Y_lm = const*d_lm*np.exp(1j*m*phi_0)
 		return Y_lm.real, Y_lm.imag
 	
-	#@do_profile(follow=[])
-	def __set_spherical_harmonics(self, mode, amp, ph, iota, phi_0):
+	def __get_spherical_harmonics_coefficients(self, mode, iota, derivative = False):
 		"""
-		Given amplitude and phase of a mode, it returns the quantity [Y_lm*A*e^(i*ph)+ Y_l-m*A*e^(-i*ph)]. This amounts to the contribution to the WF given by the mode.
-		We parametrize: math:`Y_{lm}(iota, phi_0) = d_lm(iota) * exp(i*m*phi_0)`
-		It also include negative m modes with: :math:`h_{lm} = (-1)**l h*_{l-m}` (`1501.00918 <https://arxiv.org/abs/1501.00918>`_ eq. (5))
+		Returns the coefficients multiplying A*cos(ph + m*phi_0) and A*sin(ph + m*phi_0) in the contribution of the mode (and of its negative m counterpart) to h_plus and h_cross, i.e. in the quantity [Y_lm*A*e^(i*ph)+ Y_l-m*A*e^(-i*ph)].
+		We parametrize: :math:`Y_{lm}(iota, phi_0) = d_lm(iota) * exp(i*m*phi_0)`
+		The negative m modes are included with: :math:`h_{lm} = (-1)**l h*_{l-m}` (`1501.00918 <https://arxiv.org/abs/1501.00918>`_ eq. (5))
 
 		Input:
 			mode: tuple
 				(l,m) of the current mode
-			amp, ph: :class:`~numpy:numpy.ndarray`
-				shape (D,)/(N,D) - amplitude and phase of the WFs (as generated by the ML)
 			iota: :class:`~numpy:numpy.ndarray`
 				shape (,)/(N,) - inclination for each wave
-			phi_0: :class:`~numpy:numpy.ndarray`
-				shape (,)/(N,) - reference phase for each wave
+			derivative: bool
+				whether to return the derivatives of the coefficients w.r.t. iota
+		
 		Output:
-			h_lm_real, h_lm_imag (N,D)	processed strain, with d, iota, phi_0 dependence included.
+			c_plus, c_cross: :class:`~numpy:numpy.ndarray`
+				shape (,)/(N,) - coefficients for h_plus and h_cross (or their derivatives)
 		"""
-		#FIXME: check if this is correct!
-		#To generate the modes as TPHM:
-		#	https://git.ligo.org/lscsoft/lalsuite/-/blob/master/lalsimulation/lib/LALSimIMRPhenomTPHM.c#L248
-		#Add mode in lal:
-		#	https://git.ligo.org/lscsoft/lalsuite/-/blob/master/lalsimulation/lib/LALSimSphHarmMode.c#L44
-		
 		l,m = mode
 			#computing the iota dependence of the WF
 		c_i, s_i = np.cos(iota*0.5), np.sin(iota*0.5)
-		d_lm = self.__get_Wigner_d_function(l,-m,-2,c_i, s_i) #(N,)
-		d_lmm = self.__get_Wigner_d_function(l,m,-2,c_i, s_i) #(N,)
+		d_lm = self.__get_Wigner_d_function(l,-m,-2,c_i, s_i, derivative = derivative) #(N,)
+		d_lmm = self.__get_Wigner_d_function(l,m,-2,c_i, s_i, derivative = derivative) #(N,)
 		const = np.sqrt( (2.*l+1.)/(4.*np.pi) ) * (-1)**m
 		parity = np.power(-1,l) #are you sure of that? apparently yes...
+		return const*(d_lm + parity * d_lmm), const*(d_lm - parity * d_lmm)
+
+	def get_polarization_coefficients(self, modes, iota, derivative = False):
+		"""
+		Returns, for each mode, the coefficients c_plus, c_cross such that the mode (together with its negative m counterpart) contributes to the polarizations as:
+		
+			h_plus += c_plus * A*cos(ph + m*phi_0) ; h_cross += c_cross * A*sin(ph + m*phi_0)
+		
+		Input:
+			modes: list
+				list of K modes (l,m)
+			iota: :class:`~numpy:numpy.ndarray`
+				shape (N,) - inclination for each wave
+			derivative: bool
+				whether to return the derivatives of the coefficients w.r.t. iota
+		
+		Output:
+			c_plus, c_cross: :class:`~numpy:numpy.ndarray`
+				shape (N,K) - coefficients for h_plus and h_cross (or their derivatives)
+		"""
+		iota = np.atleast_1d(iota)
+		coeffs = [self.__get_spherical_harmonics_coefficients(tuple(mode), iota, derivative) for mode in modes]
+		return np.stack([c[0] for c in coeffs], axis = -1), np.stack([c[1] for c in coeffs], axis = -1)
 
-			#FIXME: this can be done better interpolating after the spherical harmonic multiplication
-		h_lm_real = np.multiply(np.multiply(amp.T,np.cos(ph.T+m*phi_0)), const*(d_lm + parity * d_lmm) ).T #(N,D)
-		h_lm_imag = np.multiply(np.multiply(amp.T,np.sin(ph.T+m*phi_0)), const*(d_lm - parity * d_lmm) ).T #(N,D)
+	def __add_spherical_harmonics(self, mode, amp, ph, iota, h_plus, h_cross, buff = None):
+		"""
+		Adds in place the contribution of a mode to the polarizations, with the coefficients of :func:`__get_spherical_harmonics_coefficients`.
+		The phase must already include the term m*phi_0. The arrays amp and ph are overwritten.
 
-		return h_lm_real, h_lm_imag
+		Input:
+			mode: tuple
+				(l,m) of the current mode
+			amp, ph: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - amplitude and phase (including m*phi_0) of the WFs
+			iota: :class:`~numpy:numpy.ndarray`
+				shape (N,) - inclination for each wave
+			h_plus, h_cross: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - polarizations to update
+			buff: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - array to use as workspace (if None, a new array is allocated)
+		"""
+		c_plus, c_cross = self.__get_spherical_harmonics_coefficients(mode, iota)
+		buff = np.cos(ph, out = buff)
+		buff *= amp
+		buff *= c_plus[:,None]
+		h_plus += buff
+		np.sin(ph, out = ph)
+		ph *= amp
+		ph *= c_cross[:,None]
+		h_cross += ph
+
+	def __get_Wigner_d_table(self, l):
+		"""
+		Returns the coefficients of the Wigner d functions with a given l, written as polynomials in cos(beta/2) and sin(beta/2):
 
-	def __generate_pow_exponents_for_Wigner_d_function(self, l, n, m):
-		ki = max(0, m-n)
-		kf = min(l+m, l-n)
+			d^l_nm(beta) = sum_b T[n+l, m+l, b] cos(beta/2)^(2l-b) sin(beta/2)^b
 
-		cos_i_powers = [2 * l + m - n - 2 * id_ for id_ in np.arange(ki, kf + 1)]
-		sin_i_powers = [2 * id_ + n - m for id_ in np.arange(ki, kf + 1)]
-		return cos_i_powers, sin_i_powers
+		The tables are computed once for each l (the ones for the modes of the model are computed at load time) and stored in Wigner_d_tables.
 
-	#@do_profile()
-	def __get_Wigner_d_function(self, l, n, m, cos_i, sin_i, cos_i_powers = None, sin_i_powers=None):
-		"""
-		Return the general Wigner d function (or small Wigner matrix).
-		See eq. (16-18) of https://arxiv.org/pdf/2005.05338.pdf for an explicit expression or eq. (A1) of https://arxiv.org/pdf/2004.06503
-		
 		Input:
 			l: int
 				l parameter
-			n,m: int
-				matrix elements
-			cos_i: :class:`~numpy:numpy.ndarray`
-				shape ()/(N,) - Cosine of half of the angle to evaluate the function at
-			sin_i: :class:`~numpy:numpy.ndarray`
-				shape ()/(N,) - Sine of half of the angle to evaluate the function at
-			cos_i_powers: dict
-				Precomputed powers of cos(0.5*iota) for speed-up. If not given, they will be computed internally.
-			sin_i_powers: dict
-				Precomputed powers of sin(0.5*iota) for speed-up. If not given, they will be computed internally.
+
 		Output:
-			d_lms: :class:`~numpy:numpy.ndarray`
-				shape ()/(N,) - Amplitude of the spherical harmonics d_lm(iota)
-		"""
-		#cos_i = np.cos(iota*0.5) #(N,)
-		#sin_i = np.sin(iota*0.5) #(N,)
-    
-			#starting computation (sloooow??)
-		ki = max(0, m-n)
-		kf = min(l+m, l-n)
-
-		pow_minus_one_n_m = (-1) ** (n - m)
-			#TODO: precompute the cos_i_powers and sin_i_powers in the __get_Wigner_D_matrix function and you will gain a lot of time!!
-		cos_i_powers_exponents, sin_i_powers_exponents = self.__generate_pow_exponents_for_Wigner_d_function(l,n,m)
-		
-		if not cos_i_powers:
-			cos_i_powers = {id_: np.power(cos_i, id_) for id_ in cos_i_powers_exponents}
-		if not sin_i_powers:
-			sin_i_powers = {id_: np.power(sin_i, id_) for id_ in sin_i_powers_exponents}
-
-		d_lnm = np.zeros(cos_i.shape) #(N,) 
-
-		for k in range(ki, kf + 1):
-			norm = fact(k) * fact(l + m - k) * fact(l - n - k) * fact(n - m + k)  # normalization constant
-			term = (pow_minus_one_n_m * (-1) ** k * cos_i_powers[2*l+m-n-2*k] * sin_i_powers[2*k+n-m]) / norm
-			d_lnm += term
-			
-			#Unoptimized computation
-		if False:
-			d_lnm_ = np.zeros(cos_i.shape) #(N,)  	
-			for k in range(ki,kf+1):
-				norm = fact(k) * fact(l+m-k) * fact(l-n-k) * fact(n-m+k) #normalization constant
-				d_lnm_ = d_lnm_ +  (pow(-1.,k+n-m) * np.power(cos_i,2*l+m-n-2*k) * np.power(sin_i,2*k+n-m) ) / norm
-			assert np.allclose(d_lnm_,d_lnm)
+			table: :class:`~numpy:numpy.ndarray`
+				shape (2l+1,2l+1,2l+1) - coefficients T[n+l, m+l, b] of the Wigner d functions
+		"""
+		if l not in self.Wigner_d_tables:
+			from math import factorial as fact
+			table = np.zeros((2*l+1, 2*l+1, 2*l+1))
+			for n in range(-l, l+1):
+				for m in range(-l, l+1):
+					const = np.sqrt(float(fact(l+m) * fact(l-m) * fact(l+n) * fact(l-n)))
+					for k in range(max(0, m-n), min(l+m, l-n)+1):
+						norm = fact(k) * fact(l + m - k) * fact(l - n - k) * fact(n - m + k)  # normalization constant
+						table[n+l, m+l, 2*k+n-m] = (-1)**(n-m+k) * const / norm
+			self.Wigner_d_tables[l] = table
+		return self.Wigner_d_tables[l]
+
+	@staticmethod
+	def __get_half_angle_powers(cos_i, sin_i, l, derivative = False):
+		"""
+		Returns the monomials cos(beta/2)^(2l-b) sin(beta/2)^b, b = 0,...,2l, which enter the Wigner d functions (see __get_Wigner_d_table), or their derivatives w.r.t. beta.
+		The powers are built by repeated multiplications.
 
+		Input:
+			cos_i, sin_i: :class:`~numpy:numpy.ndarray`
+				shape (...) - cosine and sine of half of the angle beta
+			l: int
+				l parameter
+			derivative: bool
+				whether to return the derivatives of the monomials w.r.t. beta
 
-		const = np.sqrt(fact(l+m) * fact(l-m) * fact(l+n) * fact(l-n))
-		
-		return const*d_lnm
+		Output:
+			powers: :class:`~numpy:numpy.ndarray`
+				shape (...,2l+1) - monomials (or their derivatives)
+		"""
+		cos_i, sin_i = np.asarray(cos_i, dtype = np.float64), np.asarray(sin_i, dtype = np.float64)
+		cos_powers = np.empty(cos_i.shape+(2*l+1,))
+		sin_powers = np.empty(sin_i.shape+(2*l+1,))
+		cos_powers[...,0], sin_powers[...,0] = 1., 1.
+		for p in range(1, 2*l+1):
+			np.multiply(cos_powers[...,p-1], cos_i, out = cos_powers[...,p])
+			np.multiply(sin_powers[...,p-1], sin_i, out = sin_powers[...,p])
+		powers = np.multiply(cos_powers[...,::-1], sin_powers, out = cos_powers[...,::-1]) #(...,2l+1)
+		if not derivative:
+			return powers
+			#d/dbeta [cos^(2l-b)(beta/2) sin^b(beta/2)] = 0.5*(b cos^(2l-b+1) sin^(b-1) - (2l-b) cos^(2l-b-1) sin^(b+1))
+		b = np.arange(2*l+1)
+		d_powers = np.zeros(powers.shape)
+		d_powers[...,1:] += 0.5*b[1:]*powers[...,:-1]
+		d_powers[...,:-1] -= 0.5*(2*l-b[:-1])*powers[...,1:]
+		return d_powers
+
+	@staticmethod
+	def __get_exp_powers(angle, l):
+		"""
+		Returns exp(-1j*m*angle) for m = -l,...,l. The powers are built by recurrence from exp(-1j*angle), so that a single complex exponential is evaluated.
+
+		Input:
+			angle: :class:`~numpy:numpy.ndarray`
+				shape (...) - angle
+			l: int
+				l parameter
+
+		Output:
+			exp_powers: :class:`~numpy:numpy.ndarray`
+				shape (...,2l+1) - exp(-1j*m*angle) for m = -l,...,l
+		"""
+		angle = np.asarray(angle, dtype = np.float64)
+		exp_powers = np.empty(angle.shape+(2*l+1,), dtype = np.complex128)
+		exp_powers[...,l] = 1.
+		exp_powers[...,l+1] = np.cos(angle) - 1j*np.sin(angle)
+		for m in range(2, l+1):
+			np.multiply(exp_powers[...,l+m-1], exp_powers[...,l+1], out = exp_powers[...,l+m])
+		np.conj(exp_powers[...,l+1:], out = exp_powers[...,l-1::-1])
+		return exp_powers
+
+	def __get_Wigner_d_function(self, l, n, m, cos_i, sin_i, derivative = False):
+		"""
+		Return the general Wigner d function (or small Wigner matrix).
+		See eq. (16-18) of https://arxiv.org/pdf/2005.05338.pdf for an explicit expression or eq. (A1) of https://arxiv.org/pdf/2004.06503
+		The function is evaluated as a polynomial in cos(iota/2) and sin(iota/2), with the precomputed coefficients of __get_Wigner_d_table.
+		
+		Input:
+			l: int
+				l parameter
+			n,m: int
+				matrix elements
+			cos_i: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - Cosine of half of the angle to evaluate the function at
+			sin_i: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - Sine of half of the angle to evaluate the function at
+			derivative: bool
+				whether to return the derivative of the function w.r.t. the angle iota
+		Output:
+			d_lms: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - Amplitude of the spherical harmonics d_lm(iota) (or its derivative)
+		"""
+		powers = self.__get_half_angle_powers(cos_i, sin_i, l, derivative) #(N,2l+1)
+		return np.matmul(powers, self.__get_Wigner_d_table(l)[n+l, m+l])
 	
 	#@do_profile()
 	def __get_Wigner_D_matrix(self, l, m_prime, m, alpha, c_beta, s_beta, gamma):
@@ -1274,6 +2005,7 @@ class GW_generator:
 		Return the general Wigner D matrix. It takes in input l,n,m and the angles (might be time dependent)
 		For an explicit expression, see eq. (3.4) in https://arxiv.org/pdf/2004.06503.pdf or eq. (36-37) in https://arxiv.org/pdf/2004.08302.pdf
 		See also: (2.8) in https://dcc.ligo.org/LIGO-T2000446
+		The whole (M',M) block of the small d matrix is computed with a single contraction of the monomials in cos(beta/2), sin(beta/2) with the precomputed coefficients (see __get_Wigner_d_table) and the phases are built by recurrence (see __get_exp_powers).
 		
 		Input:
 			l: int
@@ -1286,48 +2018,31 @@ class GW_generator:
 				shape (N,)/(N,D) -Cosine of half the Euler angle beta
 			s_beta: :class:`~numpy:numpy.ndarray`
 				shape (N,)/(N,D) -Sine of half the Euler angle beta
-			alpha: :class:`~numpy:numpy.ndarray`
+			gamma: :class:`~numpy:numpy.ndarray`
 				shape (N,)/(N,D) -Euler angle gamma
 		Output:
 			D_lms: :class:`~numpy:numpy.ndarray`
 				shape (N,D,M',M)/(N,M',M) - Wigner D matrix
 		"""
 		#FIXME:check over the sign of exp(1j*alpha), exp(1j*gamma)!! There is an ambiguity...
-		if alpha.ndim == 1:
-			alpha = alpha[:,None]
-			beta = beta[:,None]
-			gamma = gamma[:,None]
-			squeeze = True
-		else:
-			squeeze = False
-		
-		if isinstance(m_prime,float): m_prime = [m_prime]
-		if isinstance(m,float): m = [m]
+		squeeze = (np.ndim(alpha) == 1)
+		if squeeze:
+			alpha, c_beta, s_beta, gamma = alpha[:,None], c_beta[:,None], s_beta[:,None], gamma[:,None]
 		
-		#c_beta, s_beta = np.cos(beta*0.5), np.sin(beta*0.5)
-		
-			#Precomputing powers
-		pows = [self.__generate_pow_exponents_for_Wigner_d_function(l,m_prime_,m_) for m_prime_ in m_prime for m_ in m]
-		pows = set([p for ppp in pows for pp in ppp for p in pp])
-		c_beta_powers = {p: np.power(c_beta, p) if p>0 else np.ones(c_beta.shape) for p in pows}
-		s_beta_powers = {p: np.power(s_beta, p) if p>0 else np.ones(s_beta.shape) for p in pows}
-
-		D_mprimem = np.zeros((alpha.shape[0], alpha.shape[1], len(m_prime), len(m))) #(N,D, M', M)
-		for i, m_prime_ in enumerate(m_prime):
-			for j, m_ in enumerate(m):
-				D_mprimem[:,:,i,j] = self.__get_Wigner_d_function(l, m_prime_, m_, c_beta, s_beta, c_beta_powers, s_beta_powers) #(N,D)
-			
-			#computing exp(-1j*m*alpha)
-		exp_alpha = np.einsum('ij,k->ijk', alpha, np.array(m_prime)) #(N,D,M')
-		exp_alpha = np.exp(-1j*exp_alpha) #(N,D,M)
-
-			#computing exp(1j*m'*gamma)
-		exp_gamma = np.einsum('ij,k->ijk', gamma, np.array(m)) #(N,D,M)
-		exp_gamma = np.exp(-1j*exp_gamma) #(N,D,M'')
-			
-			#putting everything together
-		exp_term = np.einsum('ijk,ijl->ijkl',exp_alpha, exp_gamma) #(N,D, M', M)
-		D_mprimem = np.multiply(D_mprimem,exp_term)
+		if np.isscalar(m_prime): m_prime = [m_prime]
+		if np.isscalar(m): m = [m]
+		ids_m_prime, ids_m = np.add(m_prime, l), np.add(m, l)
+
+			#small d matrix: (N*D,2l+1) x (2l+1,M'*M)
+		table = self.__get_Wigner_d_table(l)[ids_m_prime][:,ids_m] #(M',M,2l+1)
+		powers = self.__get_half_angle_powers(c_beta, s_beta, l) #(N,D,2l+1)
+		D_mprimem = np.matmul(powers, table.reshape(-1, 2*l+1).T).reshape(alpha.shape+table.shape[:2]) #(N,D,M',M)
+
+			#D_m'm = exp(-1j*m'*alpha) d_m'm exp(-1j*m*gamma)
+		exp_alpha = self.__get_exp_powers(alpha, l)[...,ids_m_prime] #(N,D,M')
+		exp_gamma = self.__get_exp_powers(gamma, l)[...,ids_m] #(N,D,M)
+		D_mprimem = np.multiply(D_mprimem, exp_alpha[...,:,None])
+		D_mprimem *= exp_gamma[...,None,:]
 		
 		if squeeze: return D_mprimem[:,0,:,:]
 		return D_mprimem
@@ -1335,6 +2050,7 @@ class GW_generator:
 	def get_mode_obj(self, mode):
 		"""
 		Returns an instance of class mode_generator which hold the ML model for the required mode.
+		If the mode is not loaded yet (see `lazy` in :func:`load`), it is loaded.
 
 		Input:
 			mode: tuple
@@ -1344,11 +2060,77 @@ class GW_generator:
 			mode_obj: :class:`mode_generator_base`
 				instance of mode_generator (depending on the model it can be :class:`mode_generator_NN` or :class:`mode_generator_MoE`)
 		"""
-		for mode_ in self.modes:	
-			if mode_.lm() == mode: #check if it is the correct mode
-				return mode_
-		return None
+		try:
+			return self.__get_mode_generator(tuple(mode))
+		except KeyError:
+			return None
+
+	def get_extrinsic_projector(self, theta, t_grid, modes = None):
+		"""
+		Generates the modes for a single point in the intrinsic parameter space (m1, m2, s1, s2) and returns an :class:`extrinsic_projector`, which builds the polarizations for any number of extrinsic parameters (D_L, iota, phi_0, time shift) without evaluating the ML models again.
+		It is useful when many extrinsic points are evaluated for each intrinsic point (e.g. for samplers marginalizing over extrinsic parameters).
+		
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (4,) - intrinsic parameters [m1, m2, spin1_z, spin2_z] (further parameters are ignored)
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - grid in time to evaluate the wave at
+			modes: list
+				list of modes employed for building the WF (if None, every mode available is employed)
+		
+		Output:
+			projector: :class:`extrinsic_projector`
+				projector of the modes onto the extrinsic parameters
+		"""
+		return extrinsic_projector(self, theta, t_grid, modes)
+		
+	def __get_mass_jacobian(self, theta, grad_var):
+		"""
+		Returns the jacobian to convert the gradients w.r.t. (M,q) into gradients w.r.t. the mass variables given by grad_var (see get_mode_grads).
+		
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - source parameters (m1, m2, ...)
+			grad_var: str
+				the variables which the gradients are computed w.r.t. ('M_q', 'mchirp_eta' or 'm1_m2')
 		
+		Output:
+			Jac: :class:`~numpy:numpy.ndarray`
+				shape (N,2,2) - jacobian J[:,i,j] = d(M,q)_j/d(var)_i (None if grad_var = 'M_q')
+		"""
+		Jac = None
+		if grad_var == 'mchirp_eta':
+			dq_deta = lambda mchirp, eta: -(1/(eta*np.sqrt(1-4*eta))+0.5/eta**2+ np.sqrt(1-4*eta)/(2*eta**2))
+			dM_dmchirp = lambda mchirp, eta: np.power(eta, -3./5.)
+			dM_deta = lambda mchirp, eta: -3./5.*np.multiply(mchirp,np.power(eta, -8./5.))
+			mchirp = np.power(theta[:,0]*theta[:,1], 3./5.)/np.power(theta[:,0]+theta[:,1], 1./5.) #chirp mass
+			eta = np.divide(theta[:,0]/theta[:,1], np.square(1+theta[:,0]/theta[:,1])) #chirp mass
+			
+			Jac = np.zeros((theta.shape[0],2,2))
+			Jac[:,0,0] = dM_dmchirp(mchirp, eta)
+			Jac[:,1,0] = dM_deta(mchirp, eta)
+			Jac[:,1,1] = dq_deta(mchirp, eta)
+			#Jac[:,0,1] = dq/dmchirp = 0
+
+		if grad_var == 'm1_m2':
+			dq_dm1 = lambda m1,m2: 1/m2
+			dq_dm2 = lambda m1,m2: -m1/m2**2
+				#switchin m1/m2 wherever needed
+			ids_inv = np.where(theta[:,0]<theta[:,1])
+			ids_ok = np.where(theta[:,0]>=theta[:,1])
+			
+			Jac = np.zeros((theta.shape[0],2,2))
+			Jac[:,0,0] = 1. #dM_dm1
+			Jac[:,1,0] = 1. #dM_dm2
+			Jac[ids_ok,0,1] = dq_dm1(theta[ids_ok,0], theta[ids_ok,1])
+			Jac[ids_ok,1,1] = dq_dm2(theta[ids_ok,0], theta[ids_ok,1])
+
+			Jac[ids_inv,0,1] = dq_dm2(theta[ids_inv,1], theta[ids_inv,0])
+			Jac[ids_inv,1,1] = dq_dm1(theta[ids_inv,1], theta[ids_inv,0])
+
+		return Jac
+
+	@call_cache(call_cache.modes_quantities)
 	def get_mode_grads(self, theta, t_grid, modes = (2,2), out_type = "ampph", grad_var = 'M_q'):
 		"""
 		Return the gradients of the GW higher order modes in the model; the gradients are evaluated on the given time grid.
@@ -1391,63 +2173,883 @@ class GW_generator:
 		theta = np.array(theta)
 		theta, modes, remove_first_dim, remove_last_dim = self.__check_modes_input(theta, modes)
 
-		if grad_var == 'mchirp_eta':
-			dq_deta = lambda mchirp, eta: -(1/(eta*np.sqrt(1-4*eta))+0.5/eta**2+ np.sqrt(1-4*eta)/(2*eta**2))
-			dM_dmchirp = lambda mchirp, eta: np.power(eta, -3./5.)
-			dM_deta = lambda mchirp, eta: -3./5.*np.multiply(mchirp,np.power(eta, -8./5.))
-			mchirp = np.power(theta[:,0]*theta[:,1], 3./5.)/np.power(theta[:,0]+theta[:,1], 1./5.) #chirp mass
-			eta = np.divide(theta[:,0]/theta[:,1], np.square(1+theta[:,0]/theta[:,1])) #chirp mass
-			
-			Jac = np.zeros((theta.shape[0],2,2))
-			Jac[:,0,0] = dM_dmchirp(mchirp, eta)
-			Jac[:,1,0] = dM_deta(mchirp, eta)
-			Jac[:,1,1] = dq_deta(mchirp, eta)
-			#Jac[:,0,1] = dq/dmchirp = 0
+		Jac = self.__get_mass_jacobian(theta, grad_var)
+
+		K = len(modes)
+
+		res1 = np.zeros((theta.shape[0],t_grid.shape[0],4,K))
+		res2 = np.zeros((theta.shape[0],t_grid.shape[0],4,K))
+
+		for i, mode in enumerate(modes):
+			try:
+				mode_gen = self.__get_mode_generator(mode)
+			except KeyError:
+				warnings.warn("Unable to find mode {}: mode might be non existing or in the wrong format. Skipping it".format(mode))
+				continue
+			res1[:,:,:,i], res2[:,:,:,i] = mode_gen.get_grads(theta, t_grid, out_type = out_type)
+
+		if Jac is not None:
+			res1[:,:,:2,:] = np.einsum('ijkl,imk -> ijml', res1[:,:,:2,:], Jac)
+			res2[:,:,:2,:] = np.einsum('ijkl,imk -> ijml', res2[:,:,:2,:], Jac)
+
+		if remove_last_dim:
+			res1, res2 = res1[...,0], res2[...,0] #(N,D)
+		if remove_first_dim:
+			res1, res2 = res1[0,...], res2[0,...] #(D,)/(D,K)
+		return res1, res2
+
+	@call_cache(call_cache.modes_quantities)
+	def get_WF_grads(self, theta, t_grid, modes = (2,2), grad_var = 'M_q', return_WF = False):
+		"""
+		Returns the gradients of the polarizations h_plus, h_cross with respect to all the parameters of the D = 7 layout, plus a time shift:
+
+			[M, q, s1, s2, D_L, inclination, phi_0, t_c]
+
+		The first two mass variables depend on `grad_var`, as in :func:`get_mode_grads`: [M, q] (grad_var = 'M_q'), [Mc, eta] (grad_var = 'mchirp_eta') or [m1, m2] (grad_var = 'm1_m2').
+		The time shift t_c moves the WF as h(t - t_c), hence the gradient is evaluated at t_c = 0. The phase reference is kept fixed: the shift does not move the point at which the phase is set (the first point of the time grid).
+		Each mode is generated only once, together with its gradients: the dependence on D_L, inclination and phi_0 is analytic (through the amplitude prefactor and the spherical harmonics) and the derivative w.r.t. t_c is given by the time derivative of the modes.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (7,)/(N,7) - source parameters [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0]
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - a grid in time to evaluate the wave at
+			modes: list
+				list of modes employed for building the WF (if None, every mode available is employed)
+			grad_var: str
+				the mass variables which the gradients are computed w.r.t.
+			return_WF: bool
+				whether to return also the polarizations
+
+		Output:
+			h_plus, h_cross: :class:`~numpy:numpy.ndarray`
+				shape (D',)/(N,D') - polarizations (only if return_WF is True)
+			grad_h_plus, grad_h_cross: :class:`~numpy:numpy.ndarray`
+				shape (D',8)/(N,D',8) - gradients of the polarizations
+		"""
+		if grad_var not in ["M_q", "mchirp_eta", "m1_m2"]:
+			raise ValueError("Wrong gradient variables chosen. Expected \"M_q\", \"mchirp_eta\", \"m1_m2\"; given \"{}\"".format(grad_var))
+
+		theta = np.asarray(theta, dtype = np.float64)
+		t_grid = np.asarray(t_grid, dtype = np.float64)
+		theta, modes, remove_first_dim, _ = self.__check_modes_input(theta, modes)
+		if theta.shape[1] != 7:
+			raise ValueError("Wrong number of source parameters: expected 7 [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0], given {}".format(theta.shape[1]))
+
+		m_tot_us = theta[:,0] + theta[:,1]
+		amp_prefactor = (AMP_PREFACTOR*m_tot_us/theta[:,4])[:,None] #(N,1)
+
+		h_plus = np.zeros((theta.shape[0], len(t_grid)))
+		h_cross = np.zeros((theta.shape[0], len(t_grid)))
+		grad_h_plus = np.zeros((theta.shape[0], len(t_grid), 8))
+		grad_h_cross = np.zeros((theta.shape[0], len(t_grid), 8))
+
+		for mode in modes:
+			try:
+				mode_gen = self.__get_mode_generator(mode)
+			except KeyError:
+				warnings.warn("Unable to find mode {}: mode might be non existing or in the wrong format. Skipping it".format(mode))
+				continue
+			amp, ph, grad_amp, grad_ph, amp_dot, ph_dot = mode_gen.get_mode_and_grads(theta[:,:4], t_grid)
+			amp *= amp_prefactor
+			grad_amp *= amp_prefactor[:,:,None]
+			amp_dot *= amp_prefactor
+			grad_amp[:,:,0] += amp/m_tot_us[:,None] #the amplitude prefactor is proportional to M
+
+			m = mode[1]
+			ph += m*theta[:,6,None]
+			cos_ph, sin_ph = np.cos(ph), np.sin(ph)
+			c_plus, c_cross = self.__get_spherical_harmonics_coefficients(mode, theta[:,5])
+			dc_plus, dc_cross = self.__get_spherical_harmonics_coefficients(mode, theta[:,5], derivative = True)
+			c_plus, c_cross, dc_plus, dc_cross = c_plus[:,None], c_cross[:,None], dc_plus[:,None], dc_cross[:,None]
+
+				#h_plus += c_plus*A*cos(ph) and h_cross += c_cross*A*sin(ph)
+			h_plus_lm, h_cross_lm = c_plus*amp*cos_ph, c_cross*amp*sin_ph
+			h_plus += h_plus_lm
+			h_cross += h_cross_lm
+				#intrinsic parameters
+			grad_h_plus[:,:,:4] += c_plus[:,:,None]*(grad_amp*cos_ph[:,:,None] - (amp*sin_ph)[:,:,None]*grad_ph)
+			grad_h_cross[:,:,:4] += c_cross[:,:,None]*(grad_amp*sin_ph[:,:,None] + (amp*cos_ph)[:,:,None]*grad_ph)
+				#inclination
+			grad_h_plus[:,:,5] += dc_plus*amp*cos_ph
+			grad_h_cross[:,:,5] += dc_cross*amp*sin_ph
+				#phi_0
+			grad_h_plus[:,:,6] -= m*c_plus*amp*sin_ph
+			grad_h_cross[:,:,6] += m*c_cross*amp*cos_ph
+				#time shift: dh/dt_c = - dh/dt
+			grad_h_plus[:,:,7] -= c_plus*(amp_dot*cos_ph - amp*ph_dot*sin_ph)
+			grad_h_cross[:,:,7] -= c_cross*(amp_dot*sin_ph + amp*ph_dot*cos_ph)
+
+			#luminosity distance: h is proportional to 1/D_L
+		grad_h_plus[:,:,4] = -h_plus/theta[:,4,None]
+		grad_h_cross[:,:,4] = -h_cross/theta[:,4,None]
+
+		Jac = self.__get_mass_jacobian(theta, grad_var)
+		if Jac is not None:
+			grad_h_plus[:,:,:2] = np.einsum('ijk,imk -> ijm', grad_h_plus[:,:,:2], Jac)
+			grad_h_cross[:,:,:2] = np.einsum('ijk,imk -> ijm', grad_h_cross[:,:,:2], Jac)
+
+		if remove_first_dim:
+			h_plus, h_cross, grad_h_plus, grad_h_cross = h_plus[0], h_cross[0], grad_h_plus[0], grad_h_cross[0]
+		if return_WF:
+			return h_plus, h_cross, grad_h_plus, grad_h_cross
+		return grad_h_plus, grad_h_cross
+	
+################# extrinsic_projector class
+
+class extrinsic_projector():
+	"""
+	Holds the modes of a WF for a single intrinsic point (m1, m2, s1, s2) and projects them onto many sets of extrinsic parameters (D_L, iota, phi_0, t_shift).
+	The amplitude and the phase of each mode are computed once on the grid of the model: for a common time shift, the polarizations of all the extrinsic points are a linear combination of the modes, computed with a matrix product; for different (also sub-sample) time shifts, the modes are interpolated at the shifted grid of each point, exactly as :class:`mode_generator_base` does.
+	An instance is returned by :func:`GW_generator.get_extrinsic_projector`.
+	"""
+	_chunk_size = 2**20 #number of points interpolated at once for different time shifts
+
+	@call_cache(call_cache.modes_quantities)
+	def __init__(self, generator, theta, t_grid, modes = None):
+		"""
+		Generates the modes for the given intrinsic parameters.
+		
+		Input:
+			generator: :class:`GW_generator`
+				generator holding the modes
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (4,) - intrinsic parameters [m1, m2, spin1_z, spin2_z]
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - grid in time to evaluate the wave at. The phase of each mode is set at t_grid[0], as in :func:`GW_generator.get_WF`
+			modes: list
+				list of modes employed for building the WF (if None, every mode available is employed)
+		"""
+		theta = np.asarray(theta, dtype = np.float64)
+		if theta.ndim != 1 or theta.shape[0] < 4:
+			raise ValueError("Wrong shape of the intrinsic parameters: expected (4,) [m1, m2, spin1_z, spin2_z], given {}".format(theta.shape))
+		self.t_grid = np.asarray(t_grid, dtype = np.float64)
+		if self.t_grid.ndim != 1:
+			raise ValueError("Wrong shape ({}) of time grid".format(self.t_grid.shape))
+		self.generator = generator
+		self.dtype = generator.dtype
+		if modes is None:
+			modes = generator.list_modes()
+		elif isinstance(modes, tuple):
+			modes = [modes]
+
+			#amplitude (with the prefactor G/c^2*(M_sun/Mpc)*(M/M_sun)) and phase of each mode on the grid of the model (s)
+		self.modes, self.amp, self.ph, self.times = [], [], [], []
+		for mode in modes:
+			mode_gen = generator.get_mode_obj(mode)
+			if mode_gen is None:
+				warnings.warn("Unable to find mode {}: mode might be non existing or in the wrong format. Skipping it".format(mode))
+				continue
+			amp, ph, m_tot = mode_gen.get_scaled_raw_mode(theta[None,:4], self.t_grid[0])
+			self.modes.append(tuple(mode))
+			self.amp.append(amp[0]*AMP_PREFACTOR*m_tot[0])
+			self.ph.append(ph[0])
+			self.times.append(mode_gen.times*m_tot[0])
+		self.m = np.array([m for l, m in self.modes]) #(K,)
+		self.shift, self.H = None, None #real and imaginary part of the modes on the grid t_grid-shift (for the last common shift)
+
+	def __interpolate_modes(self, t_shift):
+		"""
+		Interpolates amplitude and phase of each mode at the grids t_grid - t_shift.
+		
+		Input:
+			t_shift: :class:`~numpy:numpy.ndarray`
+				shape (E,) - time shift for each extrinsic point
+		
+		Output:
+			amp_ph: generator
+				for each mode, a tuple of two arrays of shape (E,D) with amplitude and phase (modulo 2pi)
+		"""
+		E, D = len(t_shift), len(self.t_grid)
+		interpolator = None
+		for k in range(len(self.modes)):
+			if interpolator is None or not np.array_equal(self.times[k], self.times[k-1]):
+					#the grids of all the points are interpolated as a single row, since the mode to interpolate is the same
+				interpolator = batch_interpolator.get_shifted(self.times[k], self.t_grid, t_shift)
+				if interpolator.extrapolates:
+					warnings.warn("Warning: time grid given is too long for the fitted model. Set 0 amplitude outside the fitting domain.")
+			amp = interpolator(self.amp[k][None,:].astype(self.dtype), left = 0, right = 0)
+			ph = interpolator.interpolate_phase(self.ph[k][None,:], self.dtype)
+			yield amp.reshape(E, D), ph.reshape(E, D)
+
+	def get_modes(self, t_shift = 0.):
+		"""
+		Returns real and imaginary part of the modes, evaluated at t_grid - t_shift. The modes do not depend on the extrinsic parameters: they include the amplitude prefactor for D_L = 1 Mpc and phi_0 = 0.
+		The output for the last time shift is cached.
+		
+		Input:
+			t_shift: float
+				time shift (s)
+		
+		Output:
+			H: :class:`~numpy:numpy.ndarray`
+				shape (2K,D) - real part of the K modes, followed by their imaginary part
+		"""
+		if self.shift != t_shift or self.H is None:
+			K, D = len(self.modes), len(self.t_grid)
+			H = np.empty((2*K, D), dtype = self.dtype)
+			for k, (amp, ph) in enumerate(self.__interpolate_modes(np.array([t_shift], dtype = np.float64))):
+				np.cos(ph[0], out = H[k])
+				np.sin(ph[0], out = H[K+k])
+				H[k] *= amp[0]
+				H[K+k] *= amp[0]
+			self.shift, self.H = t_shift, H
+		return self.H
+
+	def __call__(self, D_L, iota, phi_0, t_shift = None):
+		"""
+		Builds the polarizations for many sets of extrinsic parameters. The inputs are broadcasted against each other.
+		The WF at time shift t_shift is h(t_grid - t_shift): any shift (also smaller than the sampling of the grid) is allowed.
+		
+		Input:
+			D_L: :class:`~numpy:numpy.ndarray`
+				shape ()/(E,) - luminosity distance (Mpc)
+			iota: :class:`~numpy:numpy.ndarray`
+				shape ()/(E,) - inclination
+			phi_0: :class:`~numpy:numpy.ndarray`
+				shape ()/(E,) - reference phase
+			t_shift: :class:`~numpy:numpy.ndarray`
+				shape ()/(E,) - time shift (s) (if None, no shift is applied)
+		
+		Output:
+			h_plus, h_cross: :class:`~numpy:numpy.ndarray`
+				shape (D,)/(E,D) - polarizations for each set of extrinsic parameters
+		"""
+		D_L, iota, phi_0, t_shift = np.broadcast_arrays(D_L, iota, phi_0, 0. if t_shift is None else t_shift)
+		squeeze = (D_L.ndim == 0)
+		D_L, iota, phi_0, t_shift = [np.array(x, dtype = np.float64, ndmin = 1).ravel() for x in (D_L, iota, phi_0, t_shift)]
+		E, D, K = len(D_L), len(self.t_grid), len(self.modes)
+
+			#the extrinsic parameters enter only through the coefficients of each mode (E,K)
+		c_plus, c_cross = self.generator.get_polarization_coefficients(self.modes, iota)
+		c_plus /= D_L[:,None]
+		c_cross /= D_L[:,None]
+		m_phi_0 = np.multiply.outer(phi_0, self.m) #(E,K)
+
+		h_plus = np.zeros((E, D), dtype = self.dtype)
+		h_cross = np.zeros((E, D), dtype = self.dtype)
+		if K == 0:
+			pass
+		elif np.all(t_shift == t_shift[0]):
+				#h_plus = Re(sum_k c_plus_k exp(i m phi_0) H_k) and h_cross = Im(sum_k c_cross_k exp(i m phi_0) H_k)
+			H = self.get_modes(t_shift[0]) #(2K,D)
+			cos_m, sin_m = np.cos(m_phi_0), np.sin(m_phi_0)
+			np.matmul(np.concatenate([c_plus*cos_m, -c_plus*sin_m], axis = 1).astype(self.dtype), H, out = h_plus)
+			np.matmul(np.concatenate([c_cross*sin_m, c_cross*cos_m], axis = 1).astype(self.dtype), H, out = h_cross)
+		else:
+				#every point has its own grid: the modes are interpolated in chunks of points
+			step = max(1, self._chunk_size//max(D,1))
+			for start in range(0, E, step):
+				ids = slice(start, start+step)
+				for k, (amp, ph) in enumerate(self.__interpolate_modes(t_shift[ids])):
+					ph += m_phi_0[ids,k,None].astype(self.dtype)
+					buff = np.cos(ph)
+					buff *= amp
+					buff *= c_plus[ids,k,None].astype(self.dtype)
+					h_plus[ids] += buff
+					np.sin(ph, out = ph)
+					ph *= amp
+					ph *= c_cross[ids,k,None].astype(self.dtype)
+					h_cross[ids] += ph
+
+		if squeeze: return h_plus[0], h_cross[0]
+		return h_plus, h_cross
+	
+################# parallel_GW_generator class
+
+_worker_state = {'generator': None, 'shm': None} #state of each worker process of parallel_GW_generator
+
+def _init_parallel_worker(folder, kwargs):
+	"""
+	Initializer of the worker processes of :class:`parallel_GW_generator`: the model is loaded once for each worker.
+	"""
+	if kwargs.get('backend', 'tensorflow') == 'tensorflow':
+			#each worker uses a single thread, not to oversubscribe the cores
+		import tensorflow as tf
+		try:
+			tf.config.threading.set_intra_op_parallelism_threads(1)
+			tf.config.threading.set_inter_op_parallelism_threads(1)
+		except RuntimeError:
+			pass
+	_worker_state['generator'] = GW_generator(folder, **kwargs)
+
+def _run_parallel_task(task):
+	"""
+	Runs a method of the generator of the worker on a shard of theta. The outputs are written in the shared memory block given by the parent process.
+	"""
+	from multiprocessing import shared_memory
+	method, shm_name, layout, start, stop, theta, args, kwargs = task
+	generator = _worker_state['generator']
+
+	if method == 'list_modes':
+		return generator.list_modes()
+
+		#attaching to the shared memory (the block is kept until the parent allocates a new one)
+	shm = _worker_state['shm']
+	if shm is None or shm.name != shm_name:
+		if shm is not None: shm.close()
+		shm = shared_memory.SharedMemory(name = shm_name) #the block is owned (and unlinked) by the parent
+		_worker_state['shm'] = shm
+	out = [np.ndarray(lay[0], dtype = lay[1], buffer = shm.buf, offset = lay[2])[start:stop] if lay is not None else None for lay in layout]
+
+	if method == 'get_twisted_modes':
+		res = generator.get_twisted_modes(theta, *args, **kwargs)
+		for out_, res_ in zip(out, res):
+			out_[...] = res_
+	else:
+		getattr(generator, method)(theta, *args, out = tuple(out), **kwargs)
+	return None
+
+class parallel_GW_generator():
+	"""
+	Generates the WFs of a :class:`GW_generator` with a pool of worker processes, to use many CPU cores for large batches.
+	The pool is persistent: each worker loads the model once at startup. For each call, the parameters are split in shards, one for each task, and each worker writes its WFs in a block of shared memory. In this way, the outputs are not pickled back to the parent process.
+	The shared memory block is kept and reused across calls (it is reallocated only if a larger output is required).
+	If no output buffer ``out`` is given, the methods return views of the shared memory block, to avoid a copy of the whole output: the outputs are valid only until the next call (which overwrites them) and they must be copied by the user if they are needed for longer. If ``out`` is given, the outputs are copied from the shared memory to ``out``.
+	A block replaced by a larger one is released by the first call after all the outputs referring to it are deleted.
+
+	The workers are started with the "spawn" method by default, which is safe with tensorflow: as usual with multiprocessing, the script using the class must be protected by ``if __name__ == '__main__':``.
+	The pool should be closed with :func:`close` (or by using the class as a context manager).
+
+	It accepts the same arguments of :class:`GW_generator`.
+	"""
+	def __init__(self, folder = 0, n_jobs = None, shard_size = None, start_method = 'spawn', **kwargs):
+		"""
+		Starts the pool of workers, each loading the model.
+
+		Input:
+			folder: str/int
+				model to load, as in :class:`GW_generator`
+			n_jobs: int
+				number of worker processes (if None, the number of CPUs is used)
+			shard_size: int
+				maximum number of WFs generated by each task (if None, the batch is divided equally among the workers)
+			start_method: str
+				start method of the worker processes ('spawn', 'forkserver' or 'fork')
+			kwargs:
+				other arguments to pass to :class:`GW_generator` (e.g. backend, fuse_networks, dtype)
+		"""
+		import multiprocessing
+		self.n_jobs = os.cpu_count() if n_jobs is None else int(n_jobs)
+		if self.n_jobs < 1:
+			raise ValueError("The number of jobs must be a positive integer, given {}".format(n_jobs))
+		if shard_size is not None and shard_size < 1:
+			raise ValueError("The shard size must be a positive integer, given {}".format(shard_size))
+		self.shard_size = shard_size
+		self.dtype = kwargs.get('dtype', np.float64)
+		self.shm = None
+		self.old_shm = [] #blocks replaced while some outputs were still referring to them
+
+		ctx = multiprocessing.get_context(start_method)
+		self.pool = ctx.Pool(self.n_jobs, initializer = _init_parallel_worker, initargs = (folder, kwargs))
+		self.modes = self.pool.apply(_run_parallel_task, (('list_modes', None, None, None, None, None, None, None),))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __del__(self):
+		try:
+			self.close()
+		except:
+			pass
+
+	def close(self):
+		"""
+		Terminates the workers and frees the shared memory.
+		"""
+		if getattr(self, 'pool', None) is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+		if getattr(self, 'shm', None) is not None:
+			self.__free_shm()
+
+	def list_modes(self):
+		"""
+		Returns the list of the modes available in the model.
+
+		Output:
+			modes: list
+				list of (l,m) tuples
+		"""
+		return self.modes
+
+	def __free_shm(self):
+		"""
+		Frees the shared memory block. If some outputs still refer to the block, it is closed by a later call, once they are deleted.
+		"""
+		self.shm.unlink()
+		self.old_shm.append(self.shm)
+		self.shm = None
+		self.__close_old_shm()
+
+	def __close_old_shm(self):
+		"""
+		Closes the blocks replaced in the previous calls, if no output refers to them anymore.
+		"""
+		for shm in list(self.old_shm):
+			try:
+				shm.close()
+				self.old_shm.remove(shm)
+			except BufferError:
+				pass #some outputs are still alive
+
+	def __get_shared_arrays(self, shapes, dtypes):
+		"""
+		Returns the layout of the given arrays within the shared memory block, reallocating it if it is too small.
+
+		Input:
+			shapes: list
+				shapes of the arrays (None for an array that is not computed)
+			dtypes: list
+				dtypes of the arrays
+		Output:
+			layout: list
+				(shape, dtype, offset) for each array (None for an array that is not computed)
+			arrays: list
+				arrays held in the shared memory (None for an array that is not computed)
+		"""
+		from multiprocessing import shared_memory
+		self.__close_old_shm()
+		layout, size = [], 0
+		for shape, dtype in zip(shapes, dtypes):
+			if shape is None:
+				layout.append(None)
+				continue
+			layout.append((tuple(shape), np.dtype(dtype).str, size))
+			size += int(np.prod(shape))*np.dtype(dtype).itemsize
+			size += (-size)%64 #each array is aligned to a cache line
+		if self.shm is None or self.shm.size < size:
+			if self.shm is not None:
+				self.__free_shm()
+			self.shm = shared_memory.SharedMemory(create = True, size = max(size, 1))
+			#np.frombuffer holds the buffer of the block: the block cannot be unmapped while an output refers to it
+		arrays = [np.frombuffer(self.shm.buf, dtype = lay[1], count = int(np.prod(lay[0])), offset = lay[2]).reshape(lay[0]) if lay is not None else None for lay in layout]
+		return layout, arrays
+
+	def __run(self, method, theta, shapes, dtypes, args, kwargs, out = None):
+		"""
+		Splits theta in shards and runs the given method of the workers on them.
+		If out is None, the views of the shared memory are returned (they are overwritten by the next call), otherwise the outputs are copied from the shared memory to out.
+		"""
+		if self.pool is None:
+			raise RuntimeError("The pool of workers has been closed")
+		N = theta.shape[0]
+		shard_size = int(np.ceil(N/self.n_jobs)) if self.shard_size is None else self.shard_size
+		shard_size = max(shard_size, 1)
+
+		layout, arrays = self.__get_shared_arrays(shapes, dtypes)
+		tasks = [(method, self.shm.name, layout, start, min(start+shard_size, N), theta[start:start+shard_size], args, kwargs)
+			for start in range(0, N, shard_size)]
+		self.pool.map(_run_parallel_task, tasks, chunksize = 1)
+
+		if out is None:
+			return tuple(arrays)
+		for out_, arr in zip(out, arrays):
+			if arr is not None:
+				np.copyto(out_, arr.reshape(out_.shape))
+		return out
+
+	def get_WF(self, theta, t_grid, modes = (2,2), out = None):
+		"""
+		Generates the WFs in parallel, as in :func:`GW_generator.get_WF`.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (D,)/(N,D) - source parameters to make prediction at
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - a grid in time to evaluate the wave at
+			modes: list
+				list of modes employed for building the WF (if None, every mode available is employed)
+			out: tuple
+				two arrays (h_plus, h_cross) of shape (D',)/(N,D'), to store the output in (if None, views of the shared memory are returned, valid only until the next call)
+
+		Ouput:
+			h_plus, h_cross: :class:`~numpy:numpy.ndarray`
+				shape (D',)/(N,D') - desidered polarizations
+		"""
+		theta, t_grid = np.asarray(theta), np.asarray(t_grid)
+		to_reshape = (theta.ndim == 1)
+		theta = np.atleast_2d(theta)
+		shape = (theta.shape[0], len(t_grid))
+		if out is not None:
+			check_out_buffers(out, shape[1:] if to_reshape else shape, self.dtype)
+		h_plus, h_cross = self.__run('get_WF', theta, [shape, shape], [self.dtype]*2, (t_grid, modes), {}, out)
+		if out is not None:
+			return out
+		if to_reshape:
+			return h_plus[0], h_cross[0]
+		return h_plus, h_cross
+
+	def get_modes(self, theta, t_grid, modes = (2,2), out_type = "ampph", out = None, outputs = ('amp', 'ph')):
+		"""
+		Returns the modes in parallel, as in :func:`GW_generator.get_modes`.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (D,)/(N,D) - source parameters to make prediction at
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - a grid in time to evaluate the wave at
+			modes: list
+				list of modes to be returned (if None, every mode available is employed)
+			out_type: str
+				whether amplitude and phase ("ampph") or real and imaginary part ("realimag") shall be returned
+			out: tuple
+				two arrays with the same shape of the output, to store the output in (if None, views of the shared memory are returned, valid only until the next call). The array of an output not computed is ignored (and it can be None)
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph' (both are needed for out_type = "realimag")
+
+		Output:
+			amp, ph: :class:`~numpy:numpy.ndarray`
+				shape (N, D', K) - amplitude and phase of the K modes (if K =1, no third dimension). An output not computed is None
+			real, imag: :class:`~numpy:numpy.ndarray`
+				shape (N, D', K) - real and imaginary part of the K modes (if K =1, no third dimension)
+		"""
+		outputs = check_outputs(outputs)
+		if out_type == "realimag" and outputs != ('amp', 'ph'):
+			raise ValueError("Both amplitude and phase are needed for out_type = \"realimag\", given outputs = {}".format(outputs))
+
+		theta, t_grid = np.asarray(theta), np.asarray(t_grid)
+		remove_first_dim = (theta.ndim == 1)
+		remove_last_dim = isinstance(modes, tuple)
+		theta = np.atleast_2d(theta)
+		modes = self.list_modes() if modes is None else ([modes] if remove_last_dim else list(modes))
+		shape = (theta.shape[0], len(t_grid), len(modes))
+		shapes = [shape if o in outputs else None for o in ('amp', 'ph')]
+
+		if out is not None:
+			out = tuple([out_ if o in outputs else None for out_, o in zip(out, ('amp', 'ph'))])
+			out_shape = shape[:-1] if remove_last_dim else shape
+			check_out_buffers([out_ for out_ in out if out_ is not None], out_shape[1:] if remove_first_dim else out_shape, self.dtype)
+		res1, res2 = self.__run('get_modes', theta, shapes, [self.dtype]*2, (t_grid, modes, out_type), {'outputs': outputs}, out)
+		if out is not None:
+			return out
+		if remove_last_dim:
+			res1, res2 = [res[...,0] if res is not None else None for res in (res1, res2)]
+		if remove_first_dim:
+			res1, res2 = [res[0,...] if res is not None else None for res in (res1, res2)]
+		return res1, res2
+
+	def get_twisted_modes(self, theta, t_grid, modes, **kwargs):
+		"""
+		Returns the twisted modes in parallel, as in :func:`GW_generator.get_twisted_modes`.
+		The outputs are views of the shared memory, valid only until the next call.
+		The keyword arguments are passed to :func:`GW_generator.get_twisted_modes`.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,8) - source parameters to make prediction at (m1, m2, s1x, s1y, s1z, s2x, s2y, s2z)
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - a grid in time to evaluate the wave at
+			modes: list
+				list of modes to be returned
+
+		Output:
+			real, imag: :class:`~numpy:numpy.ndarray`
+				shape (N, D', K) - real and imaginary part of the K modes (if mode is a tuple, no third dimension)
+			alpha, beta, gamma: :class:`~numpy:numpy.ndarray`
+				shape (N, D') - precessing angles
+		"""
+		theta, t_grid = np.atleast_2d(np.asarray(theta)), np.asarray(t_grid)
+		remove_last_dim = isinstance(modes, tuple)
+		modes = [modes] if remove_last_dim else list(modes)
+		N, D = theta.shape[0], len(t_grid)
+		shapes = [(N, D, len(modes))]*2 + [(N, D)]*3
+		h_real, h_imag, alpha, beta, gamma = self.__run('get_twisted_modes', theta, shapes, [np.float32]*2+[np.float64]*3, (t_grid, modes), kwargs)
+		if remove_last_dim:
+			h_real, h_imag = h_real[...,0], h_imag[...,0]
+		return h_real, h_imag, alpha, beta, gamma
+
+def check_out_buffers(out, shape, dtype):
+	"""
+	Checks that the arrays given by the user to store an output are fine: they must have the expected shape and precision.
+	The arrays are overwritten by the functions that use them.
+
+	Input:
+		out: tuple
+			arrays to store the output in
+		shape: tuple
+			expected shape of each array
+		dtype: type
+			expected precision of each array
+	"""
+	for out_ in out:
+		if not isinstance(out_, np.ndarray):
+			raise ValueError("The output buffers must be numpy arrays, given {}".format(type(out_)))
+		if out_.shape != tuple(shape):
+			raise ValueError("Wrong shape of the output buffer: expected {}, given {}".format(tuple(shape), out_.shape))
+		if out_.dtype != dtype:
+			raise ValueError("Wrong dtype of the output buffer: expected {}, given {}".format(np.dtype(dtype), out_.dtype))
+
+def check_outputs(outputs):
+	"""
+	Checks the outputs requested to a mode generator and returns them in a standard form.
+
+	Input:
+		outputs: iterable
+			outputs to compute: a non empty subset of {'amp', 'ph'} (a single string is also accepted)
+
+	Output:
+		outputs: tuple
+			the requested outputs, ordered as ('amp', 'ph')
+	"""
+	outputs = [outputs] if isinstance(outputs, str) else list(outputs)
+	if len(outputs) == 0 or not set(outputs) <= {'amp', 'ph'}:
+		raise ValueError("Wrong outputs chosen. Expected a non empty subset of {{'amp', 'ph'}}, given {}".format(outputs))
+	return tuple([o for o in ('amp', 'ph') if o in outputs])
+
+class batch_interpolator():
+	"""
+	Linear interpolator of many functions, known on the same grid xp, at many set of points x (one for each function).
+	It mirrors the behaviour of ``np.interp``, but it computes the indices and the weights of the interpolation for all the rows at once with ``np.searchsorted``; the values are gathered by fancy indexing.
+	Indices and weights depend only on the grids: once computed, they are used to interpolate any number of functions (e.g. amplitude and phase of all the modes).
+
+	Within a :class:`call_cache` block, the interpolators built by :func:`get_mass_rescaled` are memoized, so that all the modes sharing the same time grid reuse the same indices.
+	"""
+	_chunk_size = 2**15 #number of points interpolated at once
+
+	def __init__(self, xp, x, ids = None):
+		"""
+		Computes indices and weights of the interpolation.
+
+		Input:
+			xp: :class:`~numpy:numpy.ndarray`
+				shape (D,) - increasing grid at which the functions are known
+			x: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - points at which each of the N functions is evaluated
+			ids: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - index of the left node of the interval in which each point of x falls, clipped to [0,D-2] (if None, it is computed with ``np.searchsorted``)
+		"""
+		xp = np.asarray(xp)
+		x = np.atleast_2d(x)
+		self.shape = (x.shape[0], len(xp))
+
+			#index of the left node of each interval
+		if ids is None:
+			ids = np.searchsorted(xp, x, side = 'right')
+			ids -= 1
+			np.clip(ids, 0, len(xp)-2, out = ids)
+
+		self.weights = xp[ids] #(N,D')
+		np.subtract(x, self.weights, out = self.weights)
+		self.weights *= np.reciprocal(np.diff(xp))[ids]
+		np.clip(self.weights, 0., 1., out = self.weights)
+
+			#indices are stored for the flattened array of the functions
+		ids += (np.arange(x.shape[0], dtype = ids.dtype)*len(xp))[:,None]
+		self.ids = ids #(N,D')
+
+		self.below = x < xp[0] #(N,D')
+		self.above = x > xp[-1] #(N,D')
+		self.extrapolates = bool(np.any(self.below))
+		self.weights_32 = None #single precision weights (computed only if needed)
+
+	@classmethod
+	def get_mass_rescaled(cls, times, t_grid, m_tot):
+		"""
+		Returns the interpolator from the reduced time grid ``times`` to the user grid ``t_grid``, rescaled by the total mass of each WF: the i-th row is evaluated at ``t_grid/m_tot[i]``.
+		Within a :class:`call_cache` block, the interpolator is built only once for each set of grids.
+
+		Input:
+			times: :class:`~numpy:numpy.ndarray`
+				shape (D,) - reduced time grid of the model (s/M_sun)
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - user time grid (s)
+			m_tot: :class:`~numpy:numpy.ndarray`
+				shape (N,) - total mass of each WF (M_sun)
+
+		Output:
+			interpolator: :class:`batch_interpolator`
+				interpolator from times to the user grid
+		"""
+		def build():
+			x = np.divide(t_grid[None,:], m_tot[:,None]) #(N,D')
+			if len(times) < len(t_grid) and np.all(np.diff(t_grid) >= 0):
+				ids = cls.locate_nodes(t_grid, np.multiply.outer(m_tot, times[1:-1]))
+			else:
+				ids = None
+			return cls(times, x, ids)
+
+		key = np.concatenate([[len(times), len(t_grid)], times, t_grid, m_tot])
+		return call_cache.get('interpolator', cls, key, build)
+
+	@classmethod
+	def get_shifted(cls, xp, t_grid, t_shift):
+		"""
+		Returns the interpolator from the grid xp to the shifted grids ``t_grid - t_shift[i]``, one for each shift. All the shifted grids are concatenated in a single row, so that the interpolator applies to a single function.
+
+		Input:
+			xp: :class:`~numpy:numpy.ndarray`
+				shape (D,) - increasing grid at which the function is known
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - grid to shift
+			t_shift: :class:`~numpy:numpy.ndarray`
+				shape (E,) - time shifts
+
+		Output:
+			interpolator: :class:`batch_interpolator`
+				interpolator from xp to the points of shape (1,E*D')
+		"""
+		E, D = len(t_shift), len(t_grid)
+		x = np.subtract(t_grid[None,:], t_shift[:,None]) #(E,D')
+		if len(xp) < len(t_grid) and np.all(np.diff(t_grid) >= 0):
+			ids = cls.locate_nodes(t_grid, np.add.outer(t_shift, xp[1:-1])).reshape(1, E*D)
+		else:
+			ids = None
+		return cls(xp, x.reshape(1, E*D), ids)
+
+	@staticmethod
+	def locate_nodes(t_grid, nodes):
+		"""
+		Computes the index of the left node of the interval in which each point of a sorted grid falls, for many sets of internal nodes.
+		For a dense grid, it is cheaper to locate the nodes within t_grid (N*D searches) than the points of the grid within the nodes (N*D' searches): each node is counted at the first point after it and the cumulative sum of the counts gives the index of the left node.
+
+		Input:
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - sorted grid
+			nodes: :class:`~numpy:numpy.ndarray`
+				shape (N,D-2) - internal nodes (i.e. without the first and the last) of each set, in the same units of t_grid
+
+		Output:
+			ids: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - index of the left node for each point of the grid, in [0,D-2]
+		"""
+		N, D = nodes.shape[0], len(t_grid)
+		nodes_pos = np.searchsorted(t_grid, nodes, side = 'left') #(N,D-2)
+		nodes_pos += (np.arange(N)*(D+1))[:,None]
+		ids = np.bincount(nodes_pos.ravel(), minlength = N*(D+1)).reshape(N, D+1)[:,:D]
+		return np.cumsum(ids, axis = 1)
+
+	def get_column(self, fp, j):
+		"""
+		Interpolates the functions only at the j-th point of each row of x.
+
+		Input:
+			fp: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - values of the N functions on the grid xp
+			j: int
+				index of the point of x to evaluate the functions at
+
+		Output:
+			f_j: :class:`~numpy:numpy.ndarray`
+				shape (N,) - functions interpolated at x[:,j]
+		"""
+		fp = np.ascontiguousarray(fp, dtype = np.float64).ravel()
+		ids = self.ids[:,j]
+		return fp[ids] + self.weights[:,j]*(fp[ids+1]-fp[ids])
+
+	def derivative(self, fp, xp, left = 0., right = 0.):
+		"""
+		Evaluates the derivative of the linear interpolant of the functions, i.e. the slope of the interval in which each point of x falls.
+		It is the exact derivative of the output of :func:`__call__` with respect to x (at the nodes, the slope of the interval on the right is taken).
+
+		Input:
+			fp: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - values of the N functions on the grid xp
+			xp: :class:`~numpy:numpy.ndarray`
+				shape (D,) - grid at which the functions are known
+			left: float
+				value to return for x < xp[0]
+			right: float
+				value to return for x > xp[-1]
+
+		Output:
+			f_dot: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - derivative of the interpolated functions at x
+		"""
+		slopes = np.zeros(self.shape)
+		slopes[:,:-1] = np.divide(np.diff(fp, axis = 1), np.diff(xp))
+		slopes[:,-1] = slopes[:,-2]
+		return self(slopes, left = left, right = right, increments = np.zeros(self.shape))
+
+	def interpolate_phase(self, ph, dtype = np.float64, out = None):
+		"""
+		Interpolates a phase modulo 2pi.
+		The phase is wrapped at the nodes of xp and the (unwrapped) increments between nodes are interpolated: in this way, the interpolated phase is always smaller than 2pi plus an increment and it can be held in single precision without loosing accuracy. It is meant for phases that only enter trigonometric functions.
 
-		if grad_var == 'm1_m2':
-			dq_dm1 = lambda m1,m2: 1/m2
-			dq_dm2 = lambda m1,m2: -m1/m2**2
-				#switchin m1/m2 wherever needed
-			ids_inv = np.where(theta[:,0]<theta[:,1])
-			ids_ok = np.where(theta[:,0]>=theta[:,1])
-			
-			Jac = np.zeros((theta.shape[0],2,2))
-			Jac[:,0,0] = 1. #dM_dm1
-			Jac[:,1,0] = 1. #dM_dm2
-			Jac[ids_ok,0,1] = dq_dm1(theta[ids_ok,0], theta[ids_ok,1])
-			Jac[ids_ok,1,1] = dq_dm2(theta[ids_ok,0], theta[ids_ok,1])
+		Input:
+			ph: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - values of the N phases on the grid xp
+			dtype: type
+				precision of the output (np.float32 or np.float64)
+			out: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - array to store the output in (if None, a new array is allocated)
 
-			Jac[ids_inv,0,1] = dq_dm2(theta[ids_inv,1], theta[ids_inv,0])
-			Jac[ids_inv,1,1] = dq_dm1(theta[ids_inv,1], theta[ids_inv,0])
-			
-			
-		K = len(modes)
+		Output:
+			ph_interp: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - phases interpolated at x (up to a multiple of 2pi)
+		"""
+		ph = np.asarray(ph, dtype = np.float64)
+		increments = np.empty(ph.shape, dtype = dtype)
+		np.subtract(ph[:,1:], ph[:,:-1], out = increments[:,:-1])
+		increments[:,-1] = 0.
+		return self(np.mod(ph, 2.*np.pi).astype(dtype), increments = increments, out = out)
 
-		res1 = np.zeros((theta.shape[0],t_grid.shape[0],4,K))
-		res2 = np.zeros((theta.shape[0],t_grid.shape[0],4,K))
+	def __call__(self, fp, left = None, right = None, increments = None, out = None):
+		"""
+		Interpolates the functions.
+		The precision of the output is the one of fp (single or double).
+		The interpolation is computed on chunks of rows, small enough to stay in cache, which are written directly in the output array.
 
-		for i, mode in enumerate(modes):
-			try:
-				mode_id = self.mode_dict[mode]
-			except KeyError:
-				warnings.warn("Unable to find mode {}: mode might be non existing or in the wrong format. Skipping it".format(mode))
-				continue
-			res1[:,:,:,i], res2[:,:,:,i] = self.modes[mode_id].get_grads(theta, t_grid, out_type = out_type)
+		Input:
+			fp: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - values of the N functions on the grid xp
+			left: float
+				value to return for x < xp[0] (default is fp[:,0])
+			right: float
+				value to return for x > xp[-1] (default is fp[:,-1])
+			increments: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - increments fp[:,i+1]-fp[:,i] of the functions between two consecutive nodes (if None, they are computed from fp)
+			out: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - array to store the output in, with the same precision of fp (if None, a new array is allocated)
 
-		if grad_var in ['m1_m2', 'mchirp_eta']:
-			res1[:,:,:2,:] = np.einsum('ijkl,imk -> ijml', res1[:,:,:2,:], Jac)
-			res2[:,:,:2,:] = np.einsum('ijkl,imk -> ijml', res2[:,:,:2,:], Jac)
+		Output:
+			f: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - functions interpolated at x
+		"""
+		dtype = np.float32 if np.asarray(fp).dtype == np.float32 else np.float64
+		fp = np.ascontiguousarray(fp, dtype = dtype)
+		if fp.shape != self.shape:
+			raise ValueError("Wrong shape of the functions to interpolate: expected {}, given {}".format(self.shape, fp.shape))
+		fp = fp.ravel()
+		if increments is not None:
+			increments = np.ascontiguousarray(increments, dtype = dtype).ravel()
+
+		if out is None:
+			out = np.empty(self.ids.shape, dtype = dtype)
+		else:
+			check_out_buffers((out,), self.ids.shape, dtype)
+
+		if dtype == np.float64:
+			weights = self.weights
+		else:
+			if self.weights_32 is None: self.weights_32 = self.weights.astype(np.float32)
+			weights = self.weights_32
+
+		N, D = self.ids.shape
+		step = max(1, self._chunk_size//max(D,1)) #rows per chunk
+		for start in range(0, N, step):
+			ids = self.ids[start:start+step]
+			f = fp[ids]
+			if increments is None:
+				df = fp[1:][ids] #value at the right node
+				df -= f
+			else:
+				df = increments[ids]
+			df *= weights[start:start+step]
+			f += df
+			out[start:start+step] = f
+		if left is not None: out[self.below] = left
+		if right is not None: out[self.above] = right
+		return out
 
-		if remove_last_dim:
-			res1, res2 = res1[...,0], res2[...,0] #(N,D)
-		if remove_first_dim:
-			res1, res2 = res1[0,...], res2[0,...] #(D,)/(D,K)
-		return res1, res2
-	
 class mode_generator_base():
 	"""
 	Base class for the mode generator.
-	All modes generator should inherit from it and implement methods ``load``, ``get_raw_mode``. If gradients are needed, it must implement ``get_raw_grads``.
+	All modes generator should inherit from it and implement methods ``load``, ``get_raw_mode`` (computing only the outputs, amplitude and/or phase, it is asked for). If gradients are needed, it must implement ``get_raw_grads``.
 	"""
 	def __init__(self, mode, folder = None):
 		"""
@@ -1465,6 +3067,7 @@ class mode_generator_base():
 		self.times = None
 		self.mode = mode #(l,m) tuple
 		self.readme = None	
+		self.dtype = np.float64
 
 		if folder is not None:
 			self.load(folder, verbose = False)
@@ -1476,12 +3079,49 @@ class mode_generator_base():
 	def load(self, folder, verbose = False):
 		raise NotImplementedError("You cannot use base class to load a mode generator")
 	
-	def get_raw_mode(self, theta):
+	def get_raw_mode(self, theta, outputs = ('amp', 'ph')):
 		raise NotImplementedError("You cannot use base class to generate a mode")		
 
+	def get_shared_raw_mode(self, theta, outputs = ('amp', 'ph')):
+		"""
+		Same as :func:`get_raw_mode`, but the raw amplitude and phase are memoized by :class:`call_cache` (if open), separately: only the outputs not already in the memo are computed.
+		The returned arrays are shared with the other callers and they must not be modified in place.
+		
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - source parameters to make prediction at
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph'
+
+		Ouput:
+			amp,ph: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - amplitude and phase on the internal time grid (None if not computed)
+		"""
+		outputs = check_outputs(outputs)
+		raw = {o: call_cache.lookup('raw_'+o, self, theta) for o in outputs}
+		missing = tuple([o for o in outputs if raw[o] is None])
+		if len(missing) > 0:
+			for o, value in zip(('amp', 'ph'), self.get_raw_mode(theta, missing)):
+				if o in missing: raw[o] = call_cache.store('raw_'+o, self, theta, value)
+		return raw.get('amp', None), raw.get('ph', None)
+
 	def summary(self, filename = None):
 		warnings.warn("No summary has been implemented for the current model")
 
+	def set_dtype(self, dtype):
+		"""
+		Sets the precision of the generated modes.
+		In single precision, the amplitude PCA model, the interpolation and the output are in single precision. The phase PCA model is kept in double precision, as the phase can be as large as thousands of radians: the phase is wrapped modulo 2pi before being interpolated, whenever only its trigonometric functions are needed (see :func:`batch_interpolator.interpolate_phase`).
+
+		Input:
+			dtype: type
+				np.float32 or np.float64
+		"""
+		if dtype not in [np.float32, np.float64]:
+			raise ValueError("Wrong dtype chosen. Expected np.float32 or np.float64, given {}".format(dtype))
+		self.dtype = dtype
+		if hasattr(self, 'amp_PCA'): self.amp_PCA.set_dtype(dtype)
+
 	def lm(self):
 		"""
 		Returns the (l,m) index of the mode.
@@ -1503,7 +3143,7 @@ class mode_generator_base():
 		return self.times
 
 
-	def get_mode(self, theta, t_grid, out_type = "ampph"):
+	def get_mode(self, theta, t_grid, out_type = "ampph", amp_factor = None, ph_offset = None, wrap_phase = False, out = None, outputs = ('amp', 'ph')):
 		"""
 		Generates the mode according to the MLGW model.
 		hlm(t; theta) = A(t) * exp(1j*phi(t)) 
@@ -1530,17 +3170,30 @@ class mode_generator_base():
 				shape (D',) - grid in time to evaluate the wave at (uses np.interp)
 			out_type: str
 				the output to be returned ('ampph', 'realimag')
+			amp_factor: :class:`~numpy:numpy.ndarray`
+				shape (,)/(N,) - factor to multiply the amplitude of each WF by (if None, no factor is applied)
+			ph_offset: :class:`~numpy:numpy.ndarray`
+				shape (,)/(N,) - constant to add to the phase of each WF (if None, no offset is applied)
+			wrap_phase: bool
+				whether to return the phase modulo 2pi (more accurate in single precision if only trigonometric functions of the phase are needed)
+			out: tuple
+				two arrays of shape (D',)/(N,D') and precision of the generator, to store the output in (if None, new arrays are allocated). The array of an output not computed is ignored (and it can be None)
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph' (both are needed for out_type = 'realimag'): the networks, the PCA reconstruction and the interpolation of the other one are skipped
 
 		Ouput:
 			amp, phase :class:`~numpy:numpy.ndarray`
-				shape (1,D)/(N,D) - desidered amplitude and phase (if it applies)
+				shape (1,D)/(N,D) - desidered amplitude and phase (if it applies). An output not computed is None
 			hlm_real, hlm_im :class:`~numpy:numpy.ndarray`
 				shape (1,D)/(N,D) - desidered h_22 components (if it applies)
 		"""
 		if out_type not in ["realimag", "ampph"]:
 			raise ValueError("Wrong output type chosen. Expected \"realimag\", \"ampph\", given \""+out_type+"\"")
+		outputs = check_outputs(outputs)
+		if out_type == "realimag" and outputs != ('amp', 'ph'):
+			raise ValueError("Both amplitude and phase are needed for out_type = \"realimag\", given outputs = {}".format(outputs))
 
-		theta = np.array(theta) #to ensure that theta is copied into new array
+		theta = np.asarray(theta) #theta is never modified
 		if not isinstance(t_grid, np.ndarray): #making sure that t_grid is np.array
 			t_grid = np.array(t_grid)
 
@@ -1560,14 +3213,19 @@ class mode_generator_base():
 			raise RuntimeError("Unable to generata mode. Wrong shape ({}) of time grid!!".format(t_grid.shape))
 			return
 
+		if out is not None:
+			out = tuple([out_ if o in outputs else None for out_, o in zip(out, ('amp', 'ph'))])
+			check_out_buffers([out_ for out_ in out if out_ is not None], (t_grid.shape[0],) if to_reshape else (theta.shape[0], t_grid.shape[0]), self.dtype)
+			if to_reshape: out = tuple([out_[None,:] if out_ is not None else None for out_ in out]) #(1,D)
+
 			#generating waves and returning to user
-		res1, res2 = self.__get_mode(theta, t_grid, out_type) #(N,D)
+		res1, res2 = self.__get_mode(theta, t_grid, out_type, amp_factor, ph_offset, wrap_phase, out, outputs) #(N,D)
 		if to_reshape:
-			return res1[0,:], res2[0,:] #(D,)
+			return tuple([res[0,:] if res is not None else None for res in (res1, res2)]) #(D,)
 		return res1, res2 #(N,D)
 
 	#@do_profile(follow=[])
-	def __get_mode(self, theta, t_grid, out_type):
+	def __get_mode(self, theta, t_grid, out_type, amp_factor = None, ph_offset = None, wrap_phase = False, out = None, outputs = ('amp', 'ph')):
 		"""
 
 		Generates the mode in domain and perform. Called by get_mode.
@@ -1580,12 +3238,77 @@ class mode_generator_base():
 				shape (D',) - a grid in time to evaluate the wave at (uses np.interp)
 			out_type: str
 				the output to be returned ('ampph', 'realimag')
+			amp_factor: :class:`~numpy:numpy.ndarray`
+				shape (,)/(N,) - factor to multiply the amplitude of each WF by
+			ph_offset: :class:`~numpy:numpy.ndarray`
+				shape (,)/(N,) - constant to add to the phase of each WF
+			wrap_phase: bool
+				whether to return the phase modulo 2pi
+			out: tuple
+				two arrays of shape (N,D') to store the output in (if None, new arrays are allocated)
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph'
 		Output:
 			amp, phase: :class:`~numpy:numpy.ndarray`
-				shape (N,D') - desidered amplitude and phase (if it applies)
+				shape (N,D') - desidered amplitude and phase (if it applies, None if not computed)
 			hlm_real, hlm_im: :class:`~numpy:numpy.ndarray`
 				shape (N,D') - desidered h_22 components (if it applies)
 		"""
+		amp, ph, m_tot_us = self.get_scaled_raw_mode(theta, t_grid[0], outputs)
+
+		interpolator = batch_interpolator.get_mass_rescaled(self.times, t_grid, m_tot_us)
+
+			#Every factor and offset which is constant along each WF is applied on the (smaller) model grid: as the interpolation is linear, the result is the same.
+		if amp_factor is not None and amp is not None: amp *= np.reshape(amp_factor, (-1,1))
+		if ph_offset is not None and ph is not None: ph += np.reshape(ph_offset, (-1,1))
+
+			#doing interpolations on the true red grid t_grid/M (indices are shared among the modes)
+			############
+		if out is None: out = (None, None)
+		if amp is not None:
+			amp = interpolator(amp.astype(self.dtype, copy = False), left = 0, right = 0, out = out[0]) #set to zero outside the domain
+		if ph is None:
+			pass
+		elif out_type == 'realimag':
+			ph = interpolator.interpolate_phase(ph, self.dtype)
+		elif wrap_phase:
+			ph = interpolator.interpolate_phase(ph, self.dtype, out = out[1])
+		else:
+			ph = interpolator(ph.astype(self.dtype, copy = False), out = out[1])
+
+			#warning if the model extrapolates outiside the grid
+		if interpolator.extrapolates:
+			warnings.warn("Warning: time grid given is too long for the fitted model. Set 0 amplitude outside the fitting domain.")
+
+		if out_type == 'ampph':
+			return amp, ph
+		else:
+			hlm_imag = np.sin(ph, out = out[1])
+			hlm_imag *= amp
+			hlm_real = amp #amp is overwritten
+			hlm_real *= np.cos(ph, out = ph)
+			return hlm_real, hlm_imag
+
+	def get_scaled_raw_mode(self, theta, t_0 = 0., outputs = ('amp', 'ph')):
+		"""
+		Generates amplitude and phase of the mode on the time grid of the model (see :func:`get_time_grid`), before the interpolation on the user grid. Called by get_mode.
+		The amplitude includes the scaling with the symmetric mass ratio and the phase is set to the relative phase between the modes at the time t_0.
+		The grid in physical units for each WF is ``times*m_tot``.
+		
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - source parameters to make prediction at (D=3 or D=4, as in get_mode)
+			t_0: float
+				time (s) at which the phase is set (usually the first point of the user grid)
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph'
+		
+		Output:
+			amp, phase: :class:`~numpy:numpy.ndarray`
+				shape (N,D'') - amplitude and phase on the grid of the model (None if not computed)
+			m_tot: :class:`~numpy:numpy.ndarray`
+				shape (N,) - total mass of each WF (20 M_sun if D=3)
+		"""
 		D= theta.shape[1] #number of features given
 		assert D in [3,4] #check that the number of dimension is fine
 
@@ -1604,25 +3327,7 @@ class mode_generator_base():
 			theta_std[to_switch,0] = np.power(theta_std[to_switch,0], -1)
 			theta_std[to_switch,1], theta_std[to_switch,2] = theta_std[to_switch,2], theta_std[to_switch,1]
 
-		amp, ph =  self.get_raw_mode(theta_std) #raw WF (N, N_grid)
-
-			#doing interpolations
-			############
-		new_amp = np.zeros((amp.shape[0], t_grid.shape[0]))
-		new_ph = np.zeros((amp.shape[0], t_grid.shape[0]))
-
-		for i in range(amp.shape[0]):
-				#computing the true red grid
-			interp_grid = np.divide(t_grid, m_tot_us[i])
-			#FIXME: here you can already apply spherical harmonics (calling _set_spherical_harmonics) for speed up
-
-				#putting the wave on the user grid
-			new_amp[i,:] = np.interp(interp_grid, self.times, amp[i,:], left = 0, right = 0) #set to zero outside the domain
-			new_ph[i,:]  = np.interp(interp_grid, self.times, ph[i,:])
-
-				#warning if the model extrapolates outiside the grid
-			if (interp_grid[0] < self.times[0]):
-				warnings.warn("Warning: time grid given is too long for the fitted model. Set 0 amplitude outside the fitting domain.")
+		amp, ph = self.get_shared_raw_mode(theta_std, outputs) #raw WF (N, N_grid)
 
 			#amplitude and phase of the mode (maximum of amp at t=0)
 		if isinstance(self, mode_generator_NN):
@@ -1630,16 +3335,16 @@ class mode_generator_base():
 			nu = theta_std[:,0]/(1 + theta_std[:,0])**2
 			phi_diff = {(2,2):0, (2,1):np.pi/2, (3,3): -np.pi/2, (4,4):np.pi, (5,5): np.pi/2}			
 		else:
-			nu, phi_diff = 1, {self.mode: 0}
-		amp = (new_amp.T*nu).T
-		ph = (new_ph.T - new_ph[:,0] + phi_diff[self.mode]).T #phase is zero at the beginning of the WF
+			nu, phi_diff = np.ones(theta_std.shape[0]), {self.mode: 0}
 
-		if out_type == 'ampph':
-			return amp, ph
-		else:
-			hlm_real = np.multiply(amp, np.cos(ph))
-			hlm_imag = np.multiply(amp, np.sin(ph))
-			return hlm_real, hlm_imag
+			#The phase is zero (up to the relative phase between modes) at t_0
+			#the raw mode might be shared with other callers (see call_cache): it is not modified in place
+		if amp is not None:
+			amp = amp*nu[:,None]
+		if ph is not None:
+			ph_0 = batch_interpolator(self.times, (t_0/m_tot_us)[:,None]).get_column(ph, 0)
+			ph = ph + (phi_diff[self.mode] - ph_0)[:,None]
+		return amp, ph, m_tot_us
 
 	def PCA_models(self, model_type):
 		"""
@@ -1689,6 +3394,36 @@ class mode_generator_base():
 		if out_type not in ["realimag", "ampph"]:
 			raise ValueError("Wrong output type chosen. Expected \"realimag\", \"ampph\", given \""+out_type+"\"")
 
+		amp, ph, grad_amp, grad_ph, _, _ = self.get_mode_and_grads(theta, t_grid)
+
+		if out_type == "ampph":
+			return grad_amp, grad_ph
+		if out_type == "realimag":
+			#computing gradients of the real and imaginary part
+			ph = np.subtract(ph.T,ph[:,0]).T
+			grad_Re = np.multiply(grad_amp, np.cos(ph)[:,:,None]) - np.multiply(np.multiply(grad_ph, np.sin(ph)[:,:,None]), amp[:,:,None]) #(N,D,4)
+			grad_Im = np.multiply(grad_amp, np.sin(ph)[:,:,None]) + np.multiply(np.multiply(grad_ph, np.cos(ph)[:,:,None]), amp[:,:,None])#(N,D,4)
+			return grad_Re, grad_Im
+
+	def get_mode_and_grads(self, theta, t_grid):
+		"""
+		Returns amplitude and phase of the mode, their gradients with respect to (M, q, s1, s2) and their time derivatives, evaluated on the user given time grid t_grid.
+		The model is evaluated only once. As in get_mode, the phase is set at the first point of the time grid. Called by get_grads and :func:`GW_generator.get_WF_grads`.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,D) - orbital parameters with format (m1, m2, s1, s2)
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - time grid to evaluate the mode at
+		
+		Output:
+			amp, ph: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - amplitude and phase of the mode
+			grad_amp, grad_ph: :class:`~numpy:numpy.ndarray`
+				shape (N,D',4) - gradients of amplitude and phase
+			amp_dot, ph_dot: :class:`~numpy:numpy.ndarray`
+				shape (N,D') - time derivatives of amplitude and phase
+		"""
 		if theta.shape[1] >= 4:
 			theta = theta[:,:4]
 		elif theta.shape[1]<4:
@@ -1709,44 +3444,40 @@ class mode_generator_base():
 
 		#dealing with gradients w.r.t. (q,s1,s2)
 		grad_q_amp, grad_q_ph = self.get_raw_grads(theta_std) #(N,D_std,3)
-			#interpolating gradients on the user grid
-		for i in range(theta_std.shape[0]):
-			for j in range(1,4):
-				#print(t_grid.shape,self.times.shape)
-				grad_amp[i,:,j] = np.interp(t_grid, self.times * m_tot_us[i], grad_q_amp[i,:,j-1],left = 0, right = 0) #set to zero outside the domain #(D,)
-				grad_ph[i,:,j]  = np.interp(t_grid, self.times * m_tot_us[i], grad_q_ph[i,:,j-1]) #(D,)
+			#interpolating gradients on the user grid (indices are shared among the gradients)
+		interpolator = batch_interpolator.get_mass_rescaled(self.times, t_grid, m_tot_us)
+		for j in range(1,4):
+			grad_amp[:,:,j] = interpolator(np.ascontiguousarray(grad_q_amp[:,:,j-1]), left = 0, right = 0) #set to zero outside the domain #(N,D)
+			grad_ph[:,:,j] = interpolator(np.ascontiguousarray(grad_q_ph[:,:,j-1])) #(N,D)
 
 		#dealing with gradients w.r.t. M
-		amp, ph = self.get_mode(theta, t_grid, out_type = "ampph") #true wave evaluated at t_grid #(N,D)
-		for i in range(theta_std.shape[0]):
-			grad_M_amp = np.gradient(amp[i,:], t_grid) #(D,)
-			grad_M_ph = np.gradient(ph[i,:], t_grid) #(D,)
-				#don't know why but things work here...
-			grad_amp[i,:,0] = - np.multiply(t_grid/m_tot_us[i], grad_M_amp) #(D,)
-			grad_ph[i,:,0]  = -np.multiply(t_grid/m_tot_us[i], grad_M_ph) #(D,)
-
-		grad_ph = np.subtract(grad_ph,grad_ph[:,0,None,:]) #unclear... but apparently compulsory
+		amp, ph, _ = self.get_scaled_raw_mode(theta, t_grid[0]) #true wave on the grid of the model #(N,D_std)
+			#A(t; M) = A_raw(t/M) => dA/dt = dA_raw/dt / M and dA/dM = -t/M * dA/dt (the time derivative is the one of the linear interpolant)
+		amp_dot = interpolator.derivative(amp, self.times)/m_tot_us[:,None] #(N,D)
+		ph_dot = interpolator.derivative(ph, self.times, left = 0, right = 0)/m_tot_us[:,None] #(N,D)
+		grad_amp[:,:,0] = - np.multiply(t_grid/m_tot_us[:,None], amp_dot) #(N,D)
+		grad_ph[:,:,0]  = -np.multiply(t_grid/m_tot_us[:,None], ph_dot) #(N,D)
+		amp, ph = interpolator(amp, left = 0, right = 0), interpolator(ph) #true wave evaluated at t_grid #(N,D)
+
+			#the amplitude of the NN models is scaled by the symmetric mass ratio nu(q) (see get_scaled_raw_mode)
+		if isinstance(self, mode_generator_NN):
+			q = theta_std[:,0]
+			nu = q/(1 + q)**2
+			grad_amp[:,:,1:] *= nu[:,None,None]
+			grad_amp[:,:,1] += amp*((1 - q)/((1 + q)**3*nu))[:,None] #A * dnu/dq / nu
+
+		grad_ph = np.subtract(grad_ph,grad_ph[:,0,None,:]) #the phase is set at the first point of the grid
 			#check when grad is zero and keeping it
-		diff = np.concatenate((np.diff(ph, axis = 1), np.zeros((ph.shape[0],1))), axis =1)
+		diff = np.diff(ph, axis = 1)
+		diff = np.concatenate((diff, diff[:,-1:]), axis =1) #the last point is flat only if the one before is
 		zero = np.where(diff== 0)
 		grad_ph[zero[0],zero[1],:] = 0 #takes care of the flat part after ringdown (gradient there shall be zero!!)
 
-
-		if out_type == "ampph":
 			#switching back spins
-			#sure of it???
-			grad_amp[to_switch,:,2], grad_amp[to_switch,:,3] = grad_amp[to_switch,:,3], grad_amp[to_switch,:,2]
-			grad_ph[to_switch,:,2], grad_ph[to_switch,:,3] = grad_ph[to_switch,:,3], grad_ph[to_switch,:,2]
-			return grad_amp, grad_ph
-		if out_type == "realimag":
-			#computing gradients of the real and imaginary part
-			ph = np.subtract(ph.T,ph[:,0]).T
-			grad_Re = np.multiply(grad_amp, np.cos(ph)[:,:,None]) - np.multiply(np.multiply(grad_ph, np.sin(ph)[:,:,None]), amp[:,:,None]) #(N,D,4)
-			grad_Im = np.multiply(grad_amp, np.sin(ph)[:,:,None]) + np.multiply(np.multiply(grad_ph, np.cos(ph)[:,:,None]), amp[:,:,None])#(N,D,4)
+		grad_amp[to_switch,:,2], grad_amp[to_switch,:,3] = grad_amp[to_switch,:,3], grad_amp[to_switch,:,2]
+		grad_ph[to_switch,:,2], grad_ph[to_switch,:,3] = grad_ph[to_switch,:,3], grad_ph[to_switch,:,2]
 
-			grad_Re[to_switch,:,2], grad_Re[to_switch,:,3] = grad_Re[to_switch,:,3], grad_Re[to_switch,:,2]
-			grad_Im[to_switch,:,2], grad_Im[to_switch,:,3] = grad_Im[to_switch,:,3], grad_Im[to_switch,:,2]
-			return grad_Re, grad_Im
+		return amp, ph, grad_amp, grad_ph, amp_dot, ph_dot
 
 class mode_generator_NN(mode_generator_base):
 	"""
@@ -1755,12 +3486,22 @@ class mode_generator_NN(mode_generator_base):
 
 		#WRITEME
 
+	The networks can be evaluated with two backends:
+
+	- 'tensorflow': each network is loaded with keras and distilled into a frozen TF graph
+
+	- 'numpy': the weights are read from the keras files and the networks are evaluated with stacked NumPy matrix multiplications (see :class:`ML_routines.numpy_NN_stack`). Tensorflow is never imported.
 	"""
-	def __init__(self, mode, folder = None):
+	def __init__(self, mode, folder = None, backend = 'tensorflow'):
+		if backend not in ['tensorflow', 'numpy']:
+			raise ValueError("Wrong backend chosen. Expected \"tensorflow\", \"numpy\", given \""+str(backend)+"\"")
 		self.ph_models = {}
 		self.ph_residual_models = {}
 		self.amp_models = {}
 		self.ph_res_coefficients = {}
+		self.backend = backend
+		self.fused_graph = None #fused_NN_graph to be used for inference (if any)
+		self.grads_graph = None #TF graph for the gradients of the reduced coefficients (built when first needed)
 		super().__init__(mode, folder)
 
 	def load(self, folder, verbose = False, batch_size=10):
@@ -1776,7 +3517,7 @@ class mode_generator_NN(mode_generator_base):
 				Batch size for inference. A large number may provide a speed up at the cost of a large memory usage
 
 		"""
-		if not os.path.isdir(folder):
+		if not bundle.isdir(folder):
 			raise RuntimeError("Unable to load folder "+folder+": no such directory!")
 
 		if verbose: #define a verboseprint if verbose is true
@@ -1789,16 +3530,21 @@ class mode_generator_NN(mode_generator_base):
 
 		self.batch_size = batch_size
 			#loading PCA
-		self.amp_PCA = PCA_model()
-		self.amp_PCA.load_model(*glob.glob(str(folder/"amp_PCA_model*")))
-		self.ph_PCA = PCA_model()
-		self.ph_PCA.load_model(*glob.glob(str(folder/"ph_PCA_model*")))
-		self.times = np.loadtxt(*glob.glob(str(folder/"times*")))
+		self.amp_PCA = bundle.load_PCA_model(*bundle.glob(str(folder/"amp_PCA_model*")))
+		self.ph_PCA = bundle.load_PCA_model(*bundle.glob(str(folder/"ph_PCA_model*")))
+		self.times = bundle.loadtxt(*bundle.glob(str(folder/"times*")))
 		
+			#The frozen graphs are cached (see get_cache_folder): if they are found, keras deserialization and tracing are skipped
+		self.cache_folder = None
+		if self.backend == 'tensorflow':
+			import tensorflow as tf
+			from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+			from .NN_model import mlgw_NN
+			self.cache_folder = get_cache_folder(folder, 'tf_'+tf.__version__)
 		
 			#Loading neural networks
 		for q_str in ['amp', 'ph']:
-			for nn_file in glob.glob(str(folder)+'/{}*[0-9]*keras'.format(q_str)):
+			for nn_file in bundle.glob(str(folder)+'/{}*[0-9]*keras'.format(q_str)):
 
 					#Loading residuals
 				if nn_file.find('residual')>-1:
@@ -1808,7 +3554,7 @@ class mode_generator_NN(mode_generator_base):
 					dict_to_fill = self.ph_residual_models
 
 					try:
-						self.ph_res_coefficients[comps] = np.loadtxt(folder/'residual_coefficients_{}'.format(comps))
+						self.ph_res_coefficients[comps] = bundle.loadtxt(folder/'residual_coefficients_{}'.format(comps))
 					except FileNotFoundError:
 						msg = "Coefficient file for network '{}' not found: the residual network won't be loaded in the model.".format(nn_file)
 						warnings.warn(msg)
@@ -1821,8 +3567,24 @@ class mode_generator_NN(mode_generator_base):
 					comps = comps[0][1:-1]
 					dict_to_fill = self.amp_models if q_str == 'amp' else self.ph_models
 
-			
-				new_model = mlgw_NN.load_from_file(nn_file)
+
+				if self.backend == 'numpy':
+					with bundle.open_file(nn_file) as f:
+						dict_to_fill[comps] = numpy_NN.load_from_file(f)
+					continue
+
+				cache_file = None if self.cache_folder is None else os.path.join(self.cache_folder, os.path.basename(nn_file))
+				try:
+					tf_function = None if cache_file is None else load_frozen_graph(cache_file)
+				except Exception as e:
+					warnings.warn("Unable to load the cached graph for network '{}': it will be rebuilt. Error: {}".format(nn_file, e))
+					tf_function = None
+				if tf_function is not None:
+					verboseprint("\tLoaded cached graph for network {}".format(nn_file))
+					dict_to_fill[comps] = tf_function
+					continue
+
+				new_model = mlgw_NN.load_from_file(bundle.get_file(nn_file))
 				
 					#Distilling the model for fast inference
 				tf_function = tf.function(new_model,
@@ -1831,6 +3593,12 @@ class mode_generator_NN(mode_generator_base):
 				tf_function.features = new_model.features #Adding features by hand :D
 				
 				dict_to_fill[comps] = tf_function
+
+				if cache_file is not None:
+					try:
+						save_frozen_graph(tf_function, cache_file, list(new_model.features))
+					except OSError as e:
+						warnings.warn("Unable to cache the graph for network '{}': {}".format(nn_file, e))
 						
 						
 				#dict_to_fill[comps] = tf.function(new_model,
@@ -1838,10 +3606,100 @@ class mode_generator_NN(mode_generator_base):
 
 		if not (self.amp_models and self.ph_models):
 			raise RuntimeError("Please supply both amplitude and phase models!")
+
+		if self.backend == 'numpy':
+			self.NN_stack = numpy_NN_stack([model for _, _, model in self.list_networks()])
+
+	def list_networks(self):
+		"""
+		Returns a list of all the networks of the mode, in a fixed order: amplitude, phase and phase residual networks.
+
+		Output:
+			networks: list
+				list of tuples (model_type, comps, model), where model_type is 'amp', 'ph' or 'ph_residual' and comps is the string of the PCA components predicted by the network
+		"""
+		networks = [('amp', comps, model) for comps, model in self.amp_models.items()]
+		networks += [('ph', comps, model) for comps, model in self.ph_models.items()]
+		networks += [('ph_residual', comps, model) for comps, model in self.ph_residual_models.items()]
+		return networks
+
+	def get_network_ids(self, outputs = ('amp', 'ph')):
+		"""
+		Returns the indices, in the list given by :func:`list_networks`, of the networks needed to compute the given outputs (the 'ph_residual' networks are needed for the phase).
+
+		Input:
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph'
+
+		Output:
+			ids: list
+				indices of the networks
+		"""
+		return [i for i, (model_type, _, _) in enumerate(self.list_networks()) if model_type.split('_')[0] in outputs]
+
+	def collect_red_coefficients(self, theta, predictions, outputs = ('amp', 'ph')):
+		"""
+		Builds the PCA reduced coefficients from the predictions of the networks (in the order given by :func:`list_networks`).
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - source parameters the predictions are made at
+			predictions: list
+				list of predictions (N,K_i) of each network needed for the outputs (see :func:`get_network_ids`)
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph'
+
+		Output:
+			red_amp,red_ph: :class:`~numpy:numpy.ndarray`
+				shape (N,K) - PCA reduced amplitude and phase (None if not computed)
 		
+		If the predictions have extra trailing dimensions (e.g. the gradients (N,K_i,3) of the networks), the output has the same extra dimensions.
+		"""
+		comps_to_list = lambda comps_str: [int(c) for c in comps_str]
+		extra_shape = np.shape(predictions[0])[2:] if len(predictions) else ()
+		amp_pred = np.zeros((theta.shape[0], self.amp_PCA.get_dimensions()[1])+extra_shape) if 'amp' in outputs else None
+		ph_pred = np.zeros((theta.shape[0], self.ph_PCA.get_dimensions()[1])+extra_shape) if 'ph' in outputs else None
+
+		networks = [self.list_networks()[i] for i in self.get_network_ids(outputs)]
+		for (model_type, comps, _), pred in zip(networks, predictions):
+			if model_type == 'amp':
+				amp_pred[:,comps_to_list(comps)] = pred
+			elif model_type == 'ph':
+				ph_pred[:,comps_to_list(comps)] = pred
+			else:
+				res_coefficients = np.reshape(self.ph_res_coefficients[comps], (-1,)+(1,)*len(extra_shape))
+				ph_pred[:,comps_to_list(comps)] += pred*res_coefficients
+		return amp_pred, ph_pred
+
+	def get_NN_inputs(self, theta, features_cache = None, outputs = ('amp', 'ph')):
+		"""
+		Computes the augmented features for all the networks (in the order given by :func:`list_networks`), as single precision arrays. The features are computed once for each different set of features.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - source parameters to make prediction at
+			features_cache: dict
+				dictionary with the features already computed for theta (it is updated in place)
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph': only the inputs of the networks needed for them are returned (see :func:`get_network_ids`)
+
+		Output:
+			inputs: list
+				list of inputs (N,F_i) for each network
+		"""
+		if features_cache is None: features_cache = {}
+		inputs = []
+		networks = self.list_networks()
+		for i in self.get_network_ids(outputs):
+			model = networks[i][2]
+			key = tuple(model.features)
+			if key not in features_cache:
+				features_cache[key] = augment_features(theta, model.features).astype(np.float32)
+			inputs.append(features_cache[key])
+		return inputs
 
 	#@do_profile(follow=[])
-	def get_raw_mode(self, theta):
+	def get_raw_mode(self, theta, outputs = ('amp', 'ph')):
 		"""
 		Generates a mode according to the MLGW model with a parameters vector in MLGW model style (params=  [q,s1z,s2z]).
 		They are generated at masses m1 = q * m2 and m2 = 20/(1+q), so that M_tot = 20.
@@ -1850,59 +3708,313 @@ class mode_generator_NN(mode_generator_base):
 		Input:
 			theta: :class:`~numpy:numpy.ndarray`
 				shape (N,3) - source parameters to make prediction at
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph': the networks and the PCA reconstruction of the other one are skipped
 
 		Ouput:
 			amp,ph: :class:`~numpy:numpy.ndarray`
-				shape (N,D) - desidered amplitude and phase, evaluated on the internal default time grid
+				shape (N,D) - desidered amplitude and phase, evaluated on the internal default time grid (None if not computed)
 		"""
 		theta = np.atleast_2d(np.asarray(theta))
-		if theta.shape[0]> self.batch_size:
-			coeff_list = [self.get_red_coefficients(theta[i:i+self.batch_size]) for i in range(0, len(theta), self.batch_size)]
-			rec_PCA_amp = np.concatenate([c[0] for c in coeff_list], axis = 0)
-			rec_PCA_ph = np.concatenate([c[1] for c in coeff_list], axis = 0)
+		outputs = check_outputs(outputs)
+		if not self.uses_fused_graph(outputs) and theta.shape[0]> self.batch_size:
+			coeff_list = [self.get_red_coefficients(theta[i:i+self.batch_size], outputs) for i in range(0, len(theta), self.batch_size)]
+			rec_PCA_amp = np.concatenate([c[0] for c in coeff_list], axis = 0) if 'amp' in outputs else None
+			rec_PCA_ph = np.concatenate([c[1] for c in coeff_list], axis = 0) if 'ph' in outputs else None
 		else:
-			rec_PCA_amp, rec_PCA_ph = self.get_red_coefficients(theta) #(N,K)
+			rec_PCA_amp, rec_PCA_ph = self.get_red_coefficients(theta, outputs) #(N,K)
 
-		rec_amp = self.amp_PCA.reconstruct_data(rec_PCA_amp) #(N,D)
-		rec_ph = self.ph_PCA.reconstruct_data(rec_PCA_ph) #(N,D)
+		rec_amp = self.amp_PCA.reconstruct_data(rec_PCA_amp) if rec_PCA_amp is not None else None #(N,D)
+		rec_ph = self.ph_PCA.reconstruct_data(rec_PCA_ph) if rec_PCA_ph is not None else None #(N,D)
 
 		return rec_amp, rec_ph
 
+	def uses_fused_graph(self, outputs = ('amp', 'ph')):
+		"""
+		Returns whether the reduced coefficients for the given outputs are computed by the fused graph of all the modes. If only one output is needed, the networks of the mode are evaluated on their own, as the fused graph evaluates all the networks of all the modes.
+
+		Input:
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph'
+
+		Output:
+			uses_fused_graph: bool
+				whether the fused graph is used
+		"""
+		return self.fused_graph is not None and check_outputs(outputs) == ('amp', 'ph')
+
 	#@do_profile(follow=[])
-	def get_red_coefficients(self, theta):
+	def get_red_coefficients(self, theta, outputs = ('amp', 'ph')):
 		"""
 		Returns the PCA reduced coefficients, as estimated by the neural network models.
 
 		Input:
 			theta: :class:`~numpy:numpy.ndarray`
 				shape (N,3) - source parameters to make prediction at
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph': the networks of the other one are not evaluated
 
 		Output:
 			red_amp,red_ph: :class:`~numpy:numpy.ndarray`
-				shape (N,K) - PCA reduced amplitude and phase
+				shape (N,K) - PCA reduced amplitude and phase (None if not computed)
 		"""
+		outputs = check_outputs(outputs)
+		if self.uses_fused_graph(outputs):
+			return self.fused_graph(theta)[self.mode]
+
+		if self.backend == 'numpy':
+			inputs = self.get_NN_inputs(theta, outputs = outputs)
+			return self.collect_red_coefficients(theta, self.NN_stack(inputs, self.get_network_ids(outputs)), outputs)
+
+		import tensorflow as tf
 		comps_to_list = lambda comps_str: [int(c) for c in comps_str]
 		#new way
-		amp_pred = np.zeros((theta.shape[0], self.amp_PCA.get_dimensions()[1]))
-		ph_pred = np.zeros((theta.shape[0], self.ph_PCA.get_dimensions()[1]))
+		amp_pred = np.zeros((theta.shape[0], self.amp_PCA.get_dimensions()[1])) if 'amp' in outputs else None
+		ph_pred = np.zeros((theta.shape[0], self.ph_PCA.get_dimensions()[1])) if 'ph' in outputs else None
+		amp_models = self.amp_models if 'amp' in outputs else {}
+		ph_models, ph_residual_models = (self.ph_models, self.ph_residual_models) if 'ph' in outputs else ({}, {})
 		
-		for comps, model in self.amp_models.items():
+		for comps, model in amp_models.items():
 			#amp_pred[:,comps_to_list(comps)] = model(augment_features(theta, model.features)).numpy()
 			input_ = tf.constant(augment_features(theta, model.features).astype(np.float32))
 			amp_pred[:,comps_to_list(comps)] = model(input_)[0].numpy()
 		
-		for comps, model in self.ph_models.items():
+		for comps, model in ph_models.items():
 			#ph_pred[:,comps_to_list(comps)] = model(augment_features(theta, model.features)).numpy()
 			input_ = tf.constant(augment_features(theta, model.features).astype(np.float32))
 			ph_pred[:,comps_to_list(comps)] = model(input_)[0].numpy()
         
-		for comps, model in self.ph_residual_models.items():
+		for comps, model in ph_residual_models.items():
 			#ph_pred[:,comps_to_list(comps)] += model(augment_features(theta, model.features)).numpy()*self.ph_res_coefficients[comps]
 			input_ = tf.constant(augment_features(theta, model.features).astype(np.float32))
 			ph_pred[:,comps_to_list(comps)] += model(input_)[0].numpy()*self.ph_res_coefficients[comps]
 
 		return amp_pred, ph_pred
 
+	def get_red_coefficients_tf(self, theta):
+		"""
+		Builds the TF operations that compute the PCA reduced coefficients from the raw parameters (q,s1,s2). It is meant to be called inside a `tf.function`, e.g. by :class:`fused_NN_graph`.
+		The feature augmentation is performed once for every different set of features.
+
+		Input:
+			theta: :class:`tf.Tensor`
+				shape (N,3) - float64 tensor with the source parameters to make prediction at
+
+		Output:
+			red_amp,red_ph: :class:`tf.Tensor`
+				shape (N,K) - float64 tensor with the PCA reduced amplitude and phase
+		"""
+		import tensorflow as tf
+		features_cache = {}
+		def get_input(model):
+			key = tuple(model.features)
+			if key not in features_cache:
+				features_cache[key] = tf.cast(augment_features(theta, model.features, backend = 'tensorflow'), tf.float32)
+			return features_cache[key]
+
+		def stack_columns(models, K, residual_models = {}):
+			columns = [None for _ in range(K)]
+			for comps, model in models.items():
+				pred = tf.cast(model(get_input(model))[0], tf.float64)
+				for j, c in enumerate(comps):
+					columns[int(c)] = pred[:,j]
+			for comps, model in residual_models.items():
+				pred = tf.cast(model(get_input(model))[0], tf.float64)*self.ph_res_coefficients[comps]
+				for j, c in enumerate(comps):
+					columns[int(c)] = columns[int(c)] + pred[:,j] if columns[int(c)] is not None else pred[:,j]
+			zeros = tf.zeros_like(theta[:,0])
+			columns = [c if c is not None else zeros for c in columns]
+			return tf.stack(columns, axis = 1)
+
+		red_amp = stack_columns(self.amp_models, self.amp_PCA.get_dimensions()[1])
+		red_ph = stack_columns(self.ph_models, self.ph_PCA.get_dimensions()[1], self.ph_residual_models)
+		return red_amp, red_ph
+
+	def get_red_grads(self, theta):
+		"""
+		Returns the jacobian of the PCA reduced coefficients with respect to the raw parameters (q,s1,s2).
+		With the numpy backend, the derivatives are propagated analytically through the feature augmentation and the layers of each network (see :func:`ML_routines.numpy_NN.jvp`). With the tensorflow backend, they are computed by a TF graph with automatic differentiation (GradientTape), built at the first call.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - source parameters to compute the gradients at
+
+		Output:
+			grad_red_amp,grad_red_ph: :class:`~numpy:numpy.ndarray`
+				shape (N,K,3) - gradients of the PCA reduced amplitude and phase
+		"""
+		theta = np.atleast_2d(np.asarray(theta, dtype = np.float64))
+
+		if self.backend == 'numpy':
+			inputs, jacobians, grads = {}, {}, []
+			for _, _, model in self.list_networks():
+				key = tuple(model.features)
+				if key not in inputs:
+					inputs[key] = augment_features(theta, model.features)
+					jacobians[key] = jac_augment_features(theta, model.features)
+				grads.append(model.jvp(inputs[key], jacobians[key])[1])
+			return self.collect_red_coefficients(theta, grads)
+
+		import tensorflow as tf
+		if self.grads_graph is None:
+			K_amp, K_ph = self.amp_PCA.get_dimensions()[1], self.ph_PCA.get_dimensions()[1]
+			K = K_amp + K_ph
+				#The rows of theta are independent: the input is repeated K times and the k-th copy is used to differentiate the k-th output. In this way, the whole jacobian is computed with a single backward pass (much faster to trace than a batch_jacobian)
+			def grads_function(theta):
+				N = tf.shape(theta)[0]
+				theta_rep = tf.tile(theta, [K, 1]) #(K*N,3)
+				with tf.GradientTape() as tape:
+					tape.watch(theta_rep)
+					red_coefficients = tf.concat(self.get_red_coefficients_tf(theta_rep), axis = 1) #(K*N,K)
+					mask = tf.repeat(tf.eye(K, dtype = tf.float64), N, axis = 0) #(K*N,K)
+					red_sum = tf.reduce_sum(red_coefficients*mask)
+				grads = tf.transpose(tf.reshape(tape.gradient(red_sum, theta_rep), (K, N, 3)), (1, 0, 2)) #(N,K,3)
+				return grads[:,:K_amp], grads[:,K_amp:]
+			self.grads_graph = tf.function(grads_function,
+					input_signature=(tf.TensorSpec(shape=(None, 3), dtype=tf.float64),))
+
+		grad_red_amp, grad_red_ph = self.grads_graph(tf.constant(theta))
+		return grad_red_amp.numpy(), grad_red_ph.numpy()
+
+	def get_raw_grads(self, theta):
+		"""
+		Computes the gradients of the amplitude and phase w.r.t. (q,s1,s2).
+		Gradients are functions dependent on time and are evaluated on the internal reduced grid (mode_generator.get_time_grid()).
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - Values of orbital parameters to compute the gradient at
+		
+		Output:
+			grad_amp: :class:`~numpy:numpy.ndarray`
+				shape (N,D,3) - Gradients of the amplitude
+			grad_ph: :class:`~numpy:numpy.ndarray`
+				shape (N,D,3) - Gradients of the phase
+		"""
+		grad_red_amp, grad_red_ph = self.get_red_grads(theta) #(N,K,3)
+		return self.amp_PCA.reconstruct_grads(grad_red_amp), self.ph_PCA.reconstruct_grads(grad_red_ph) #(N,D,3)
+
+class fused_NN_graph():
+	"""
+	Compiles the neural networks of many :class:`mode_generator_NN` into a single frozen TF graph.
+	The graph takes as input the raw parameters (q,s1,s2) and returns the PCA reduced coefficients of amplitude and phase for all the modes. In this way, a batch of parameters costs a single graph call, rather than one call for each network of each mode.
+	Within a :class:`call_cache` block, the output is memoized: as all the modes are evaluated on the same parameters, the modes after the first reuse the coefficients computed by the first one.
+	"""
+	def __init__(self, mode_generators):
+		"""
+		Builds and freezes the graph.
+		If all the mode generators are cached (see :func:`get_cache_folder`), the graph is also cached and it is loaded from there if available.
+		
+		Input:
+			mode_generators: list
+				list of :class:`mode_generator_NN` whose networks shall be fused
+		"""
+		import tensorflow as tf
+		from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+		self.modes = [mode_gen.lm() for mode_gen in mode_generators]
+
+		cache_folders = [getattr(mode_gen, 'cache_folder', None) for mode_gen in mode_generators]
+		if None in cache_folders:
+			cache_file = None
+		else:
+			key = hashlib.sha256(' '.join([os.path.basename(f) for f in cache_folders]).encode()).hexdigest()
+			cache_file = os.path.join(os.path.dirname(cache_folders[0]), 'fused_'+key, 'fused_graph')
+			try:
+				self.graph = load_frozen_graph(cache_file)
+			except Exception as e:
+				warnings.warn("Unable to load the cached fused graph: it will be rebuilt. Error: {}".format(e))
+				self.graph = None
+			if self.graph is not None:
+				return
+
+		def fused_function(theta):
+			outputs = []
+			for mode_gen in mode_generators:
+				outputs.extend(mode_gen.get_red_coefficients_tf(theta))
+			return outputs
+
+		tf_function = tf.function(fused_function,
+				input_signature=(tf.TensorSpec(shape=(None, 3), dtype=tf.float64),))
+		self.graph = convert_variables_to_constants_v2(tf_function.get_concrete_function())
+
+		if cache_file is not None:
+			try:
+				save_frozen_graph(self.graph, cache_file)
+			except OSError as e:
+				warnings.warn("Unable to cache the fused graph: {}".format(e))
+
+	def __call__(self, theta):
+		"""
+		Returns the PCA reduced coefficients for all the fused modes. Within a :class:`call_cache` block, they are computed only once for each theta.
+		
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - source parameters to make prediction at
+
+		Output:
+			red_coefficients: dict
+				dictionary with an entry (red_amp, red_ph) for each mode (l,m). Each red_amp, red_ph has shape (N,K)
+		"""
+		theta = np.atleast_2d(np.asarray(theta, dtype = np.float64))
+		return call_cache.get('fused_red_coefficients', self, theta, lambda: self.compute_red_coefficients(theta))
+
+	def compute_red_coefficients(self, theta):
+		"""
+		Evaluates the graph, without looking at the memo.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - source parameters to make prediction at
+
+		Output:
+			red_coefficients: dict
+				dictionary with an entry (red_amp, red_ph) for each mode (l,m)
+		"""
+		import tensorflow as tf
+		outputs = self.graph(tf.constant(theta))
+		return {lm: (outputs[2*i].numpy(), outputs[2*i+1].numpy()) for i, lm in enumerate(self.modes)}
+
+class fused_NN_numpy(fused_NN_graph):
+	"""
+	NumPy counterpart of :class:`fused_NN_graph`, for the modes loaded with the numpy backend.
+	The networks of all the modes are evaluated together by a single :class:`ML_routines.numpy_NN_stack` and the feature augmentation is shared among the networks of all the modes.
+	"""
+	def __init__(self, mode_generators):
+		"""
+		Builds the stack of networks.
+		
+		Input:
+			mode_generators: list
+				list of :class:`mode_generator_NN` (with numpy backend) whose networks shall be fused
+		"""
+		self.modes = [mode_gen.lm() for mode_gen in mode_generators]
+		self.mode_generators = mode_generators
+		self.NN_stack = numpy_NN_stack([model for mode_gen in mode_generators for _, _, model in mode_gen.list_networks()])
+
+	def compute_red_coefficients(self, theta):
+		"""
+		Evaluates the networks, without looking at the memo.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,3) - source parameters to make prediction at
+
+		Output:
+			red_coefficients: dict
+				dictionary with an entry (red_amp, red_ph) for each mode (l,m)
+		"""
+		features_cache = {}
+		inputs = [input_ for mode_gen in self.mode_generators for input_ in mode_gen.get_NN_inputs(theta, features_cache)]
+		predictions = self.NN_stack(inputs)
+
+		red_coefficients, start = {}, 0
+		for mode_gen in self.mode_generators:
+			n_networks = len(mode_gen.list_networks())
+			red_coefficients[mode_gen.lm()] = mode_gen.collect_red_coefficients(theta, predictions[start:start+n_networks])
+			start += n_networks
+		return red_coefficients
+
 class mode_generator_MoE(mode_generator_base):
 	"""
 	This class holds all the parts of ML models and acts as single (l,m) mode generator. Model is composed by a PCA model to reduce dimensionality of a WF datasets and by several MoE models to fit PCA in terms of source parameters. WFs are generated in time domain.
@@ -1956,7 +4068,7 @@ class mode_generator_MoE(mode_generator_base):
 			return self.ph_PCA
 		return None
 
-	def get_raw_mode(self, theta):
+	def get_raw_mode(self, theta, outputs = ('amp', 'ph')):
 		"""
 		Generates a mode according to the MLGW model with a parameters vector in MLGW model style (params=  [q,s1z,s2z]).
 		They are generated at masses m1 = q * m2 and m2 = 20/(1+q), so that M_tot = 20.
@@ -1965,15 +4077,17 @@ class mode_generator_MoE(mode_generator_base):
 		Input:
 			theta: :class:`~numpy:numpy.ndarray`
 				shape (N,3) - source parameters to make prediction at
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph': the MoE models and the PCA reconstruction of the other one are skipped
 
 		Ouput:
 			amp,ph: :class:`~numpy:numpy.ndarray`
-				shape (N,D) - desidered amplitude and phase, evaluated on the internal default time grid
+				shape (N,D) - desidered amplitude and phase, evaluated on the internal default time grid (None if not computed)
 		"""
-		rec_PCA_amp, rec_PCA_ph = self.get_red_coefficients(theta) #(N,K)
+		rec_PCA_amp, rec_PCA_ph = self.get_red_coefficients(theta, outputs) #(N,K)
 
-		rec_amp = self.amp_PCA.reconstruct_data(rec_PCA_amp) #(N,D)
-		rec_ph = self.ph_PCA.reconstruct_data(rec_PCA_ph) #(N,D)
+		rec_amp = self.amp_PCA.reconstruct_data(rec_PCA_amp) if rec_PCA_amp is not None else None #(N,D)
+		rec_ph = self.ph_PCA.reconstruct_data(rec_PCA_ph) if rec_PCA_ph is not None else None #(N,D)
 
 		return rec_amp, rec_ph
 
@@ -1989,11 +4103,9 @@ class mode_generator_MoE(mode_generator_base):
 			feat_list: list
 				list of features
 		"""
-		f = open(feat_file, "r")
-		feat_list = f.readlines()
+		feat_list = bundle.read_bytes(feat_file).decode().splitlines(True)
 		for i in range(len(feat_list)):
 			feat_list[i] = feat_list[i].rstrip()
-		f.close()
 		return feat_list
 
 	def load(self, folder, verbose = False):
@@ -2013,7 +4125,7 @@ class mode_generator_MoE(mode_generator_base):
 			verbose: bool
 				whether to print output
 		"""
-		if not os.path.isdir(folder):
+		if not bundle.isdir(folder):
 			raise RuntimeError("Unable to load folder "+folder+": no such directory!")
 
 		if verbose: #define a verboseprint if verbose is true
@@ -2025,13 +4137,11 @@ class mode_generator_MoE(mode_generator_base):
 		if not folder.endswith('/'):
 			folder = folder + "/"
 		verboseprint("Loading model for "+str(self.mode)+" from: ", folder)
-		file_list = os.listdir(folder)
+		file_list = bundle.listdir(folder)
 
 			#loading PCA
-		self.amp_PCA = PCA_model()
-		self.amp_PCA.load_model(folder+"amp_PCA_model")
-		self.ph_PCA = PCA_model()
-		self.ph_PCA.load_model(folder+"ph_PCA_model")
+		self.amp_PCA = bundle.load_PCA_model(folder+"amp_PCA_model")
+		self.ph_PCA = bundle.load_PCA_model(folder+"ph_PCA_model")
 
 		verboseprint("  Loaded PCA model for amplitude with ", self.amp_PCA.get_V_matrix().shape[1], " PC")
 		verboseprint("  Loaded PCA model for phase with ", self.ph_PCA.get_V_matrix().shape[1], " PC")
@@ -2050,7 +4160,7 @@ class mode_generator_MoE(mode_generator_base):
 		k = 0
 		while "amp_exp_"+str(k) in file_list and  "amp_gat_"+str(k) in file_list:
 			self.MoE_models_amp.append(MoE_model(3+len(self.amp_features),1))
-			self.MoE_models_amp[-1].load(folder+"amp_exp_"+str(k),folder+"amp_gat_"+str(k))
+			self.MoE_models_amp[-1].load(bundle.loadtxt(folder+"amp_exp_"+str(k)), bundle.loadtxt(folder+"amp_gat_"+str(k)))
 			verboseprint("    Loaded amplitude model for comp: ", k)
 			k += 1
 		
@@ -2059,19 +4169,18 @@ class mode_generator_MoE(mode_generator_base):
 		k = 0
 		while "ph_exp_"+str(k) in file_list and  "ph_gat_"+str(k) in file_list:
 			self.MoE_models_ph.append(MoE_model(3+len(self.ph_features),1))
-			self.MoE_models_ph[-1].load(folder+"ph_exp_"+str(k),folder+"ph_gat_"+str(k))
+			self.MoE_models_ph[-1].load(bundle.loadtxt(folder+"ph_exp_"+str(k)), bundle.loadtxt(folder+"ph_gat_"+str(k)))
 			verboseprint("    Loaded phase model for comp: ", k)
 			k += 1
 
 		if ("times" in file_list) or ("times.dat" in file_list):
 			verboseprint("  Loaded time vector")
-			self.times = np.loadtxt(*glob.glob(str(folder+"times*")))
+			self.times = bundle.loadtxt(*bundle.glob(str(folder+"times*")))
 		else:
 			raise RuntimeError("Unable to load model: no time vector given!")
 
 		if 'README' in file_list:
-			with open(folder+"README") as f:
-				contents = f.read()
+			contents = bundle.read_bytes(folder+"README").decode()
 			self.readme = ast.literal_eval(contents) #dictionary holding some relevant information about the model loaded
 			try:
 				self.readme = ast.literal_eval(contents) #dictionary holding some relevant information about the model loaded
@@ -2155,35 +4264,39 @@ class mode_generator_MoE(mode_generator_base):
 		return
 
 	#@do_profile(follow=[])
-	def get_red_coefficients(self, theta):
+	def get_red_coefficients(self, theta, outputs = ('amp', 'ph')):
 		"""
 		Returns the PCA reduced coefficients, as estimated by the MoE models.
 
 		Input:
 			theta: :class:`~numpy:numpy.ndarray`
 				shape (N,3) - source parameters to make prediction at
+			outputs: tuple
+				outputs to compute, among 'amp' and 'ph': the MoE models of the other one are not evaluated
 
 		Output:
 			red_amp,red_ph: :class:`~numpy:numpy.ndarray`
-				shape (N,K) - PCA reduced amplitude and phase
+				shape (N,K) - PCA reduced amplitude and phase (None if not computed)
 		"""
 		assert theta.shape[1] == 3, ValueError("Wrong number of features given: expected 3 but {} given".format(theta.shape[1])) #DEBUG
-
-			#adding extra features
-		amp_theta = add_extra_features(theta, self.amp_features, log_list = [0])
-		ph_theta = add_extra_features(theta, self.ph_features, log_list = [0])
+		outputs = check_outputs(outputs)
+		rec_PCA_amp, rec_PCA_ph = None, None
 
 			#making predictions for amplitude
-		rec_PCA_amp = np.zeros((amp_theta.shape[0], self.amp_PCA.get_dimensions()[1]))
-		for k in range(len(self.MoE_models_amp)):
-			if k >= self.amp_PCA.get_dimensions()[1]: break
-			rec_PCA_amp[:,k] = self.MoE_models_amp[k].predict(amp_theta)
+		if 'amp' in outputs:
+			amp_theta = add_extra_features(theta, self.amp_features, log_list = [0])
+			rec_PCA_amp = np.zeros((amp_theta.shape[0], self.amp_PCA.get_dimensions()[1]))
+			for k in range(len(self.MoE_models_amp)):
+				if k >= self.amp_PCA.get_dimensions()[1]: break
+				rec_PCA_amp[:,k] = self.MoE_models_amp[k].predict(amp_theta)
 
 			#making predictions for phase
-		rec_PCA_ph = np.zeros((ph_theta.shape[0], self.ph_PCA.get_dimensions()[1]))
-		for k in range(len(self.MoE_models_ph)):
-			if k >= self.ph_PCA.get_dimensions()[1]: break
-			rec_PCA_ph[:,k] = self.MoE_models_ph[k].predict(ph_theta)
+		if 'ph' in outputs:
+			ph_theta = add_extra_features(theta, self.ph_features, log_list = [0])
+			rec_PCA_ph = np.zeros((ph_theta.shape[0], self.ph_PCA.get_dimensions()[1]))
+			for k in range(len(self.MoE_models_ph)):
+				if k >= self.ph_PCA.get_dimensions()[1]: break
+				rec_PCA_ph[:,k] = self.MoE_models_ph[k].predict(ph_theta)
 
 		return rec_PCA_amp, rec_PCA_ph
 
@@ -2241,14 +4354,8 @@ class mode_generator_MoE(mode_generator_base):
 			grad_g_ph[:,k,:] = self.__MoE_gradients(theta, self.MoE_models_ph[k], self.ph_features) #(N,3)
 		
 			#computing gradients
-		#amp
-		grad_amp = np.zeros((theta.shape[0], D, theta.shape[1])) #(N,D,3)
-		for i in range(theta.shape[1]):
-			grad_amp[:,:,i] = self.amp_PCA.reconstruct_data(grad_g_amp[:,:,i]) - self.amp_PCA.PCA_params[1] #(N,D)
-		#ph
-		grad_ph = np.zeros((theta.shape[0], D, theta.shape[1])) #(N,D,3)
-		for i in range(theta.shape[1]):
-			grad_ph[:,:,i] = self.ph_PCA.reconstruct_data(grad_g_ph[:,:,i]) - self.ph_PCA.PCA_params[1] #(N,D)
+		grad_amp = self.amp_PCA.reconstruct_grads(grad_g_amp) #(N,D,3)
+		grad_ph = self.ph_PCA.reconstruct_grads(grad_g_ph) #(N,D,3)
 
 		return grad_amp, grad_ph
 
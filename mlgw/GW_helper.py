@@ -8,6 +8,8 @@ Module GW_helper.py
 			function compute_scalar: computes the Wigner scalar product between two GW waveforms
 		Optimal mismatch computation:
 			function compute_optimal_mismatch: computes the optimal mismatch between two waves (i.e. by minimizing the mismatch w.r.t. the alignment)
+		Batched match:
+			class batch_match: computes the match between many pairs of waves, maximised over time and phase, with a PSD and frequency cuts
 		Dataset creation Time Domain
 			function create_dataset_TD: creates a dataset of GW in time domain.
 		Dataset creation Frequency Domain
@@ -18,10 +20,7 @@ Module GW_helper.py
 import numpy as np
 import time
 import os.path
-import matplotlib.pyplot as plt #debug
 import warnings
-import scipy.signal
-from tqdm import tqdm
 
 ################# Helpers with the frequency
 
@@ -195,6 +194,130 @@ compute_optimal_mismatch
 	else:
 		return overlap, phi_optimal
 
+class batch_match():
+	"""
+batch_match
+===========
+	Computes the match between many pairs of WFs, maximised over time and phase, with a noise weighted scalar product:
+		M = max_{t,phi} <h1, h2(t+t_shift) e^(i*phi)>/sqrt(<h1,h1><h2,h2>)		<h1,h2> = sum_f conj(h1(f)) h2(f)/S(f)
+	The maximisation over time is done by an inverse FFT of the cross spectrum conj(h1(f)) h2(f)/S(f) and the maximisation over phase by taking its modulus.
+	For real WFs, the sum runs over the positive frequencies only (i.e. the phase is the one of the 22 mode); for complex WFs h = h_plus + i h_cross, it runs over all the frequencies.
+	The WFs are zero padded so that the time shifts are not circular. The pairs are processed in chunks and the FFT buffers are allocated only once.
+	"""
+	_max_buffer_size = 2**22 #maximum number of (complex) elements of a buffer
+
+	def __init__(self, D, dt, PSD = None, f_min = None, f_max = None, complex_WF = False, max_shift = None):
+		"""
+		Initialise the frequency weights and the buffers.
+		Input:
+			D ()			number of time samples of each WF
+			dt ()			time step of the WFs (s)
+			PSD 			noise power spectral density: callable S(f) or tuple (f, S(f)) to be interpolated. If None, the noise is white
+			f_min, f_max ()	frequency cuts (Hz): the frequencies outside [f_min, f_max] are not considered
+			complex_WF		whether the WFs are complex (i.e. h_plus + i h_cross) or real
+			max_shift ()	maximum time shift |t_shift| (s) considered in the maximisation (if None, every time shift is considered)
+		"""
+		import scipy.fft
+		self.D, self.dt, self.complex_WF = int(D), float(dt), complex_WF
+		self.n_fft = scipy.fft.next_fast_len(2*self.D-1)
+		if complex_WF:
+			self.freqs = scipy.fft.fftfreq(self.n_fft, self.dt)
+		else:
+			self.freqs = scipy.fft.rfftfreq(self.n_fft, self.dt)
+		f = np.abs(self.freqs)
+
+			#weights 1/S(f), with the frequency cuts
+		if PSD is None:
+			self.weights = np.ones(f.shape)
+		else:
+			if callable(PSD):
+				S = np.asarray(PSD(f), dtype = np.float64)
+			else:
+				S = np.interp(f, *PSD, left = np.inf, right = np.inf)
+			self.weights = np.divide(1., S, out = np.zeros(f.shape), where = S > 0)
+		if f_min is not None: self.weights[f < f_min] = 0.
+		if f_max is not None: self.weights[f > f_max] = 0.
+		if not np.any(self.weights > 0):
+			raise ValueError("No frequency is left after the frequency cuts: check f_min, f_max and the PSD")
+
+			#time shift of each point of the inverse FFT
+		self.shifts = np.fft.fftfreq(self.n_fft, 1./self.n_fft)*self.dt
+		self.shift_mask = None if max_shift is None else np.abs(self.shifts) > max_shift
+
+		self.chunk_size = max(1, self._max_buffer_size//self.n_fft)
+		self.__buffers = None
+
+	def __get_buffers(self):
+		"""
+		Returns the buffers (allocated at the first call): padded WFs (chunk_size, n_fft) and cross spectrum (chunk_size, n_fft).
+		"""
+		if self.__buffers is None:
+			pad = np.zeros((self.chunk_size, self.n_fft), dtype = np.complex128 if self.complex_WF else np.float64)
+			cross = np.zeros((self.chunk_size, self.n_fft), dtype = np.complex128)
+			self.__buffers = (pad, cross)
+		return self.__buffers
+
+	def __fft(self, h, pad):
+		"""
+		Computes the FFT of the zero padded WFs h (n,D), using pad as a buffer.
+		"""
+		import scipy.fft
+		n = h.shape[0]
+		pad[:n,:self.D] = h
+		if self.complex_WF:
+			return scipy.fft.fft(pad[:n], axis = 1)
+		return scipy.fft.rfft(pad[:n], axis = 1)
+
+	def __call__(self, h1, h2, return_F = False):
+		"""
+		Computes the optimal match between h1 and h2.
+		Input:
+			h1 (N,D)/(D,)	first WF
+			h2 (N,D)/(D,)	second WF
+			return_F		whether to return the mismatch 1-M rather than the match M
+		Output:
+			M (N,)/()			optimal match (or mismatch)
+			t_shift (N,)/()		optimal time shift (s): h1(t) is best matched by h2(t+t_shift)
+			phi (N,)/()			optimal phase: h1(t) is best matched by h2(t+t_shift)*exp(i*phi) (for complex WFs)
+		"""
+		import scipy.fft
+		h1, h2 = np.asarray(h1), np.asarray(h2)
+		if h1.shape != h2.shape or h1.shape[-1] != self.D:
+			raise ValueError("The WFs must have the same shape (N,{}): given {} and {}".format(self.D, h1.shape, h2.shape))
+		if np.iscomplexobj(h1) or np.iscomplexobj(h2):
+			if not self.complex_WF:
+				raise ValueError("Complex WFs are given but the match was initialised with complex_WF = False")
+		squeeze = (h1.ndim == 1)
+		h1, h2 = np.atleast_2d(h1), np.atleast_2d(h2)
+
+		N = h1.shape[0]
+		M, t_shift, phi = np.zeros(N), np.zeros(N), np.zeros(N)
+		pad, cross = self.__get_buffers()
+		n_freqs = len(self.freqs)
+		for start in range(0, N, self.chunk_size):
+			stop = min(start+self.chunk_size, N)
+			n = stop - start
+			H1 = self.__fft(h1[start:stop], pad)
+			H2 = self.__fft(h2[start:stop], pad)
+			norm = np.sqrt(np.sum(self.weights*np.square(np.abs(H1)), axis = 1)*np.sum(self.weights*np.square(np.abs(H2)), axis = 1))
+
+				#cross correlation: for real WFs, the negative frequencies are left to zero (complex analytic signal)
+			cross[:n,:n_freqs] = np.conj(H1)*H2*self.weights
+			z = scipy.fft.ifft(cross[:n], axis = 1)*self.n_fft
+			abs_z = np.abs(z)
+			if self.shift_mask is not None: abs_z[:,self.shift_mask] = 0.
+			ids = np.argmax(abs_z, axis = 1)
+
+			z_max = z[np.arange(n), ids]
+			M[start:stop] = np.divide(np.abs(z_max), norm, out = np.zeros(n), where = norm > 0)
+			t_shift[start:stop] = self.shifts[ids]
+			phi[start:stop] = -np.angle(z_max)
+
+		if return_F:
+			M = 1. - M
+		if squeeze: return M[0], t_shift[0], phi[0]
+		return M, t_shift, phi
+
 
 
 ################# Dataset related stuff
@@ -331,6 +454,7 @@ create_dataset_TD
 		buff_list.append(filebuff)
 
 		#####creating WFs
+	from tqdm import tqdm
 	for n_WF in tqdm(range(N_data), desc = 'Generating dataset'):
 			#setting value for data
 		if isinstance(m2_range, (tuple, list)):
@@ -506,6 +630,7 @@ create_dataset_TD
 
 			if False:
 				#TODO: remove this shit!!
+				import matplotlib.pyplot as plt
 				plt.figure()
 				plt.plot(time_grid_list[i], temp_amp_,'o', ms = 2)
 				plt.plot(time_full, temp_amp)
@@ -765,6 +890,7 @@ def locate_peak(amp, start = 0.3):
 	"""
 	assert amp.ndim == 1
 	id_start = int(len(amp)*start)
+	import scipy.signal
 	extrema = scipy.signal.argrelextrema(np.abs(amp[id_start:]), np.greater)
 	if len(extrema[0]):
 		return extrema[0][0]+id_start
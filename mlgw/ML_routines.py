@@ -8,12 +8,18 @@ Module ML_routines.py
 			class GDA: implements a model for a Gaussian discriminant Analysis classifiers. It might be useful for MoE.
 		Data augmentation helper
 			function add_extra_features: adds to a dataset some extra polynomial features
+			function augment_features: computes the polynomial features of the input variables (used by the NN models)
+			function jac_augment_features: computes the jacobian of the features given by augment_features
+		NumPy neural networks
+			class numpy_NN: evaluates a feed-forward network (saved in keras format) with plain NumPy
+			class numpy_NN_stack: evaluates many numpy_NN at once with stacked matrix multiplications
 """
 #################
 
-import scipy.stats, scipy.linalg
 import numpy as np
 import warnings
+import json
+import zipfile
 from itertools import combinations_with_replacement
 
 ################# PCA class
@@ -98,6 +104,18 @@ PCA_model
 		self.PCA_params= [V,mu,max_PC, E]
 		return None
 
+	def set_dtype(self, dtype):
+		"""
+	set_dtype
+	=========
+		Casts the PCA parameters to the given precision. The reconstructed data will have the same precision.
+		Input:
+			dtype		np.float32 or np.float64
+		Output:
+		"""
+		self.PCA_params = [np.asarray(p, dtype = dtype) for p in self.PCA_params]
+		return None
+
 	def reconstruct_data(self, red_data, K = None):
 		"""
 	reconstruct_data
@@ -118,12 +136,27 @@ PCA_model
 		if red_data.shape[1]<self.PCA_params[0].shape[1]:
 			red_data = np.concatenate([red_data[:,:K], np.zeros((red_data.shape[0], self.PCA_params[0].shape[1]-red_data.shape[1]))], axis = 1) 
 		
-		red_data = np.multiply(red_data, self.PCA_params[2])
+		red_data = np.multiply(np.asarray(red_data, dtype = self.PCA_params[0].dtype), self.PCA_params[2])
 		data = np.matmul(red_data, self.PCA_params[0].T)
 		data = data+self.PCA_params[1]
 		return data.real
 
 
+	def reconstruct_grads(self, red_grads):
+		"""
+	reconstruct_grads
+	=================
+		Computes the gradients of the high dimensional data, given the gradients of the low dimensional representation. As the reconstruction is linear, the mean shift does not contribute.
+		Input:
+			red_grads (N,K',T)	gradients of the low dimensional representation of data w.r.t. T variables
+		Output:
+			grads (N,D,T)		gradients of the high dimensional reconstruction of data
+		"""
+		V, max_PC = self.PCA_params[0], self.PCA_params[2]
+		K = min(red_grads.shape[1], V.shape[1])
+		red_grads = np.multiply(red_grads[:,:K,:], np.reshape(max_PC, (-1,1))[:K])
+		return np.einsum('nkt,dk->ndt', red_grads, V[:,:K]).real
+
 	def reduce_data(self, data):
 		"""
 	reduce_data
@@ -159,6 +192,7 @@ PCA_model
 			K = X.shape[1]
 
 		#E, V = np.linalg.eig(np.cov(X.T))
+		import scipy.linalg
 		E, V = scipy.linalg.eig(np.cov(X.T)) #better than np?
 		
 		idx = np.argsort(E)[::-1]
@@ -242,7 +276,9 @@ GDA
 		self.naive = naive
 		self.same_weights = same_weights
 		self.hard_clustering = hard_clustering
-		if not naive: self.models = []
+		if not naive:
+			import scipy.stats
+			self.models = []
 		self.model_params = []
 			#initializing with dummy things
 		for k in range(self.K):	
@@ -329,6 +365,7 @@ GDA
 			X_train (N,D)	train data
 			y_train (N,)	train labels
 		"""
+		import scipy.stats
 		self.models = []
 		self.model_params = []
 		for k in range(self.K):	
@@ -458,20 +495,20 @@ jac_extra_features
 
 	return jac
 
-def augment_features(theta, features):
+def parse_features(features):
 	"""
-	Given a list of features string, it computes all the polynomial features.
-	The feature string is of the format:
-	
-		2-eta_chieff_s1
-	
-	This represents a second order polynomial in the variables eta, chieff and s1
+	Parses a list of feature strings (see :func:`augment_features`).
 
-	"""
-	theta = np.atleast_2d(theta)
-	feats_to_add = []
+	Input:
+		features: list
+			list of feature strings
 
+	Output:
+		parsed: list
+			for each feature string, the sorted list of the base features and the list of their products (tuples of base features)
+	"""
 	if not isinstance(features, list): features = [features]
+	parsed = []
 	
 	for feat_str in features:
 
@@ -490,26 +527,90 @@ def augment_features(theta, features):
 		feat_list = []
 		for i in range(1,order):
 			feat_list.extend(combinations_with_replacement(features_, i+1))
-		
+		parsed.append((features_, feat_list))
+	return parsed
+
+def get_base_feature(f, q, s1, s2, log = np.log, power = np.power, derivative = False):
+	"""
+	Computes a base feature as a function of the input variables (q, s1, s2), or its derivatives w.r.t. them.
+	The base features are: eta, chieff, q, logq, s1, s2, mc. The functions log and power are given by the array module in use (e.g. numpy or tensorflow).
+
+	Input:
+		f: str
+			name of the base feature
+		q, s1, s2: :class:`~numpy:numpy.ndarray`
+			shape (N,) - input variables
+		log, power: callable
+			logarithm and power functions of the array module
+		derivative: bool
+			whether to return the derivatives of the feature w.r.t. (q, s1, s2)
+
+	Output:
+		val: :class:`~numpy:numpy.ndarray`
+			shape (N,) - value of the feature (if derivative is False)
+		grad: tuple
+			derivatives of the feature w.r.t. q, s1 and s2 (if derivative is True): each is an array of shape (N,) or a scalar
+	"""
+	if f == 'eta':
+		if derivative: return (1-q) / (1+q)**3, 0., 0.
+		return q / (1+q)**2
+	elif f == 'chieff':
+		#chieff = (m1*s1+m2*s2)/(m1+m2) = (q*s1+s2)/(1+q)
+		if derivative: return (s1 - s2) / (1 + q)**2, q / (1 + q), 1 / (1 + q)
+		return (q*s1 + s2) / (1 + q)
+	elif f == 'q':
+		if derivative: return 1., 0., 0.
+		return q
+	elif f == 'logq':
+		if derivative: return 1/q, 0., 0.
+		return log(q)
+	elif f == 's1':
+		if derivative: return 0., 1., 0.
+		return s1
+	elif f == 's2':
+		if derivative: return 0., 0., 1.
+		return s2
+	elif f == 'mc':
+		eta = q / (1+q)**2
+		if derivative: return 3/5*power(eta, -2/5) * (1-q) / (1+q)**3, 0., 0.
+		return power(eta, 3/5)
+	raise ValueError("Feature '{}' not recognized: please consider submitting a patch to add support for your favourite feature.".format(f))
+
+def augment_features(theta, features, backend = 'numpy'):
+	"""
+	Given a list of features string, it computes all the polynomial features.
+	The feature string is of the format:
+	
+		2-eta_chieff_s1
+	
+	This represents a second order polynomial in the variables eta, chieff and s1
+
+	With backend = 'tensorflow', theta is a tensor and the features are computed with tensorflow operations: in this way, the function can be used inside a `tf.function`, so that the feature augmentation becomes part of the graph.
+
+	Input:
+		theta: :class:`~numpy:numpy.ndarray`
+			shape (N,3) - input variables (q, s1, s2)
+		features: list
+			list of feature strings
+		backend: str
+			array module to compute the features with ('numpy' or 'tensorflow')
+
+	Output:
+		theta_aug: :class:`~numpy:numpy.ndarray`
+			shape (N,F) - augmented features
+	"""
+	if backend == 'tensorflow':
+		import tensorflow as tf
+		log, power, concat = tf.math.log, tf.pow, tf.concat
+	else:
+		theta = np.atleast_2d(theta)
+		log, power, concat = np.log, np.power, np.concatenate
+	feats_to_add = []
+
+	for features_, feat_list in parse_features(features):
 		feat_vals = {}
 		for f in features_:
-			if f == 'eta':
-				val = theta[:,0] / (1+theta[:,0])**2
-			elif f == 'chieff':
-				#chieff = (m1*s1+m2*s2)/(m1+m2) = (q*s1+s2)/(1+q)
-				val = (theta[:,0]*theta[:,1] + theta[:,2]) / (1 + theta[:,0])
-			elif f == 'q':
-				val = theta[:,0]
-			elif f == 'logq':
-				val = np.log(theta[:,0])
-			elif f == 's1':
-				val = theta[:,1]
-			elif f == 's2':
-				val = theta[:,2]
-			elif f == 'mc':
-				val = np.power(theta[:,0] / (1+theta[:,0])**2, 3/5)
-			else:
-				raise ValueError("Feature '{}' not recognized: please consider submitting a patch to add support for your favoutite feature.".format(f))
+			val = get_base_feature(f, theta[:,0], theta[:,1], theta[:,2], log, power)
 			if f not in ['q', 's1', 's2']: feats_to_add.append(val[:,None])
 			feat_vals[f] = val
 		
@@ -519,7 +620,47 @@ def augment_features(theta, features):
 				val *= feat_vals[f]
 			feats_to_add.append(val[:,None])
 	
-	return np.concatenate([theta, *feats_to_add], axis = 1)
+	return concat([theta, *feats_to_add], axis = 1)
+
+def jac_augment_features(theta, features):
+	"""
+	Computes the jacobian of the features given by :func:`augment_features` with respect to the input variables (q, s1, s2).
+	The features are in the same order as in :func:`augment_features`.
+
+	Input:
+		theta: :class:`~numpy:numpy.ndarray`
+			shape (N,3) - input variables (q, s1, s2)
+		features: list
+			list of feature strings (see :func:`augment_features`)
+
+	Output:
+		jac: :class:`~numpy:numpy.ndarray`
+			shape (N,F,3) - jacobian of the augmented features
+	"""
+	theta = np.atleast_2d(theta)
+	N, D = theta.shape
+	q, s1, s2 = theta[:,0], theta[:,1], theta[:,2]
+	jac_to_add = []
+
+	for features_, feat_list in parse_features(features):
+		feat_vals, feat_grads = {}, {}
+		for f in features_:
+			grad = np.zeros((N, D))
+			grad[:,0], grad[:,1], grad[:,2] = get_base_feature(f, q, s1, s2, derivative = True)
+			if f not in ['q', 's1', 's2']: jac_to_add.append(grad[:,None,:])
+			feat_vals[f], feat_grads[f] = get_base_feature(f, q, s1, s2), grad
+
+			#product rule
+		for feats in feat_list:
+			val, grad = np.ones((N,)), np.zeros((N, D))
+			for f in feats:
+				grad = grad*feat_vals[f][:,None] + val[:,None]*feat_grads[f]
+				val = val*feat_vals[f]
+			jac_to_add.append(grad[:,None,:])
+
+	jac_theta = np.broadcast_to(np.eye(D), (N, D, D))
+	return np.concatenate([jac_theta, *jac_to_add], axis = 1)
+
 
 	
 	
@@ -537,3 +678,239 @@ def augment_features(theta, features):
 
 
 
+
+
+################# NumPy neural networks
+def expit(x):
+	"""
+	Logistic sigmoid 1/(1+exp(-x)), computed as (1+tanh(x/2))/2: it does not overflow for large |x| and it keeps the precision of x.
+	"""
+	return 0.5*(1.+np.tanh(0.5*x))
+
+numpy_activations = {
+	'linear': lambda x: x,
+	'sigmoid': expit,
+	'tanh': np.tanh,
+	'relu': lambda x: np.maximum(x, 0),
+	'elu': lambda x: np.where(x>0, x, np.expm1(np.minimum(x, 0))),
+	'selu': lambda x: 1.0507009873554805*np.where(x>0, x, 1.6732632423543772*np.expm1(np.minimum(x, 0))),
+	'softplus': lambda x: np.logaddexp(x, 0),
+	'swish': lambda x: x*expit(x),
+	'silu': lambda x: x*expit(x),
+	'exponential': np.exp,
+}
+
+	#derivatives of the activation functions, as a function of the input of the activation
+numpy_activations_derivatives = {
+	'linear': lambda x: np.ones_like(x),
+	'sigmoid': lambda x: expit(x)*expit(-x),
+	'tanh': lambda x: 1 - np.square(np.tanh(x)),
+	'relu': lambda x: (x>0).astype(x.dtype),
+	'elu': lambda x: np.where(x>0, 1., np.exp(np.minimum(x, 0))).astype(x.dtype),
+	'selu': lambda x: 1.0507009873554805*np.where(x>0, 1., 1.6732632423543772*np.exp(np.minimum(x, 0))).astype(x.dtype),
+	'softplus': expit,
+	'swish': lambda x: expit(x)*(1 + x*expit(-x)),
+	'silu': lambda x: expit(x)*(1 + x*expit(-x)),
+	'exponential': np.exp,
+}
+
+class numpy_NN:
+	"""
+	Feed-forward neural network made of Dense layers, evaluated with plain NumPy.
+	It reads the weights and the activations of a network saved in keras format (as done by :class:`NN_model.mlgw_NN`), without importing tensorflow or keras.
+	As in tensorflow, the network is evaluated in single precision.
+	"""
+	def __init__(self, weights, biases, activations, features = None):
+		"""
+		Initialise the network.
+
+		Input:
+			weights: list
+				list of kernels (F_in, F_out) for each layer
+			biases: list
+				list of biases (F_out,) for each layer
+			activations: list
+				list of the names of the activation functions for each layer
+			features: list
+				list of features for the data augmentation (see :func:`augment_features`)
+		"""
+		for act in activations:
+			if act not in numpy_activations:
+				raise ValueError("Activation '{}' is not supported by the NumPy backend. Supported activations are: {}".format(act, list(numpy_activations.keys())))
+		self.weights = [np.asarray(W, dtype = np.float32) for W in weights]
+		self.biases = [np.asarray(b, dtype = np.float32) for b in biases]
+		self.activations = list(activations)
+		self.features = features if features is not None else ['']
+
+	@classmethod
+	def load_from_file(cls, nn_file):
+		"""
+		Loads the network from a ".keras" file.
+		The features are read from the name of the model, following the convention of :class:`NN_model.mlgw_NN`.
+
+		Input:
+			nn_file: str
+				path to the keras file (or binary file object)
+		
+		Output:
+			model: :class:`numpy_NN`
+				the loaded network
+		"""
+		import h5py
+
+		with zipfile.ZipFile(nn_file) as z:
+			config = json.loads(z.read('config.json'))
+			with z.open('model.weights.h5') as f, h5py.File(f, 'r') as weights_file:
+				layers_group = weights_file['layers'] if 'layers' in weights_file else weights_file['_layer_checkpoint_dependencies']
+
+				layers = [layer for layer in config['config']['layers'] if layer['class_name'] != 'InputLayer']
+				for layer in layers:
+					if layer['class_name'] != 'Dense':
+						raise ValueError("Layer '{}' of network {} is not supported by the NumPy backend: only Dense layers are allowed".format(layer['class_name'], nn_file))
+
+					#The names of the weights groups need not match the names in the config (e.g. dense, dense_2, dense_4...): they are sorted by their numeric suffix
+				suffix = lambda name: int(name.split('_')[-1]) if name.split('_')[-1].isdigit() else 0
+				group_names = sorted(layers_group.keys(), key = suffix)
+				if len(group_names) != len(layers):
+					raise ValueError("Network {} has {} layers but {} groups of weights".format(nn_file, len(layers), len(group_names)))
+
+				weights, biases, activations = [], [], []
+				for layer, group_name in zip(layers, group_names):
+					layer_vars = layers_group[group_name]['vars']
+					W = layer_vars['0'][()]
+					b = layer_vars['1'][()] if layer['config'].get('use_bias', True) else np.zeros((W.shape[1],))
+					weights.append(W)
+					biases.append(b)
+					activations.append(layer['config']['activation'])
+
+		name = config['config']['name']
+		id_ = name.find('---')
+		features = [f.strip() for f in name[id_+3:].split('--')] if id_ > -1 else ['']
+		return cls(weights, biases, activations, features)
+
+	def get_input_dimension(self):
+		"""
+		Returns the number of input features of the network.
+		"""
+		return self.weights[0].shape[0]
+
+	def get_output_dimension(self):
+		"""
+		Returns the number of outputs of the network.
+		"""
+		return self.weights[-1].shape[1]
+
+	def __call__(self, x):
+		"""
+		Evaluates the network.
+
+		Input:
+			x: :class:`~numpy:numpy.ndarray`
+				shape (N,F) - augmented input features
+		
+		Output:
+			y: :class:`~numpy:numpy.ndarray`
+				shape (N,K) - output of the network
+		"""
+		x = np.asarray(x, dtype = np.float32)
+		for W, b, act in zip(self.weights, self.biases, self.activations):
+			x = numpy_activations[act](np.matmul(x, W) + b)
+		return x
+
+	def jvp(self, x, dx):
+		"""
+		Evaluates the network together with the derivatives of its output along the given tangent directions (forward mode differentiation).
+		The network is evaluated in single precision, as in :func:`__call__`, while the derivatives are propagated in double precision.
+
+		Input:
+			x: :class:`~numpy:numpy.ndarray`
+				shape (N,F) - augmented input features
+			dx: :class:`~numpy:numpy.ndarray`
+				shape (N,F,T) - derivatives of the input features (e.g. the jacobian of the features w.r.t. T variables)
+
+		Output:
+			y: :class:`~numpy:numpy.ndarray`
+				shape (N,K) - output of the network
+			dy: :class:`~numpy:numpy.ndarray`
+				shape (N,K,T) - derivatives of the output
+		"""
+		x = np.asarray(x, dtype = np.float32)
+		dx = np.swapaxes(np.asarray(dx, dtype = np.float64), 1, 2) #(N,T,F)
+		for W, b, act in zip(self.weights, self.biases, self.activations):
+			z = np.matmul(x, W) + b
+			dx = np.matmul(dx, W.astype(np.float64))*numpy_activations_derivatives[act](z.astype(np.float64))[:,None,:]
+			x = numpy_activations[act](z)
+		return x, np.swapaxes(dx, 1, 2)
+
+class numpy_NN_stack:
+	"""
+	Evaluates many :class:`numpy_NN` at once.
+	Networks with the same sequence of activations are grouped together: their weights are zero-padded to a common shape and stacked, so that each layer of a group is evaluated with a single batched matrix multiplication.
+	"""
+	def __init__(self, networks):
+		"""
+		Builds the stacked weights.
+
+		Input:
+			networks: list
+				list of :class:`numpy_NN` to evaluate
+		"""
+		self.networks = list(networks)
+		self.groups = {}
+		for i, net in enumerate(self.networks):
+			self.groups.setdefault(tuple(net.activations), []).append(i)
+
+		self.stacked_params = {}
+		for acts, ids in self.groups.items():
+			Ws, bs = [], []
+			for l in range(len(acts)):
+				F_in = max([self.networks[i].weights[l].shape[0] for i in ids])
+				F_out = max([self.networks[i].weights[l].shape[1] for i in ids])
+				W = np.zeros((len(ids), F_in, F_out), dtype = np.float32)
+				b = np.zeros((len(ids), 1, F_out), dtype = np.float32)
+				for g, i in enumerate(ids):
+					W_i, b_i = self.networks[i].weights[l], self.networks[i].biases[l]
+					W[g,:W_i.shape[0],:W_i.shape[1]] = W_i
+					b[g,0,:b_i.shape[0]] = b_i
+				Ws.append(W)
+				bs.append(b)
+			self.stacked_params[acts] = (Ws, bs)
+		self.selected_params = {} #stacked weights of the subsets of the networks evaluated so far
+
+	def __call__(self, inputs, networks_ids = None):
+		"""
+		Evaluates all the networks (or only some of them), each on its own input.
+
+		Input:
+			inputs: list
+				list of inputs :class:`~numpy:numpy.ndarray` (N,F_i), one for each network to evaluate. All the inputs must have the same number of rows N
+			networks_ids: list
+				indices of the networks to evaluate, in the order of the inputs (if None, all the networks are evaluated)
+		
+		Output:
+			outputs: list
+				list of outputs :class:`~numpy:numpy.ndarray` (N,K_i), one for each network evaluated
+		"""
+		if networks_ids is None: networks_ids = range(len(self.networks))
+		position = {i: k for k, i in enumerate(networks_ids)} #position of each network in the inputs
+
+		outputs = [None for _ in position]
+		for acts, ids in self.groups.items():
+			Ws, bs = self.stacked_params[acts]
+			selected = [g for g, i in enumerate(ids) if i in position]
+			if len(selected) == 0: continue
+			if len(selected) < len(ids):
+				key = (acts, tuple(selected))
+				if key not in self.selected_params:
+					self.selected_params[key] = ([W[selected] for W in Ws], [b[selected] for b in bs])
+				Ws, bs = self.selected_params[key]
+			ids = [ids[g] for g in selected]
+			N = inputs[position[ids[0]]].shape[0]
+			x = np.zeros((len(ids), N, Ws[0].shape[1]), dtype = np.float32)
+			for g, i in enumerate(ids):
+				x[g,:,:inputs[position[i]].shape[1]] = inputs[position[i]]
+			for W, b, act in zip(Ws, bs, acts):
+				x = numpy_activations[act](np.matmul(x, W) + b)
+			for g, i in enumerate(ids):
+				outputs[position[i]] = x[g,:,:self.networks[i].get_output_dimension()]
+		return outputs
@@ -8,16 +8,14 @@ import sys
 import os
 import numpy as np
 import json
-import matplotlib.pyplot as plt
 from shutil import copy2
 import glob
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
-from keras_tuner import BayesianOptimization, HyperModel
 import tensorflow as tf
 from tensorflow import keras
-from GW_helper import compute_optimal_mismatch
+from GW_helper import batch_match
 from ML_routines import PCA_model, augment_features
 from keras.layers import Dense
 from keras.optimizers import Nadam
@@ -351,7 +349,10 @@ class mlgw_NN(keras.Sequential):
 		if name is None: name = model.name
 		return cls(model.layers, name, features = None)
 	
-class NN_HyperModel(HyperModel):
+class NN_HyperModel():
+	"""
+	Builds a :class:`mlgw_NN` for a given choice of hyperparameters ``hp``. Its method ``build`` is the hypermodel given to ``keras_tuner``.
+	"""
 	def __init__(self,  output_nodes, hyperparameter_ranges, loss_weights):
 		self.hyperparameter_ranges = hyperparameter_ranges
 		self.loss_weights = [1]*output_nodes if not isinstance(loss_weights,list) else loss_weights
@@ -439,6 +440,7 @@ def save_model(model, history, out_folder, hyperparameters, PCA_data, PCA_data_l
 
 	f.close()
 
+	import matplotlib.pyplot as plt
 	plt.figure('lossfunction')
 	plt.title('Loss function of '+PCA_data.quantity)
 	plt.plot(history.history['loss'], label='train')
@@ -468,8 +470,9 @@ def tune_model(out_folder, project_name, quantity, PCA_data_loc, PC_to_fit, hype
 	
 	if init_trials == None: init_trials = 3*len(hyperparameters)
 	
+	from keras_tuner import BayesianOptimization
 	tuner = BayesianOptimization(
-		NN_HyperModel(PCA_data.train_var.shape[1], hyperparameters, loss_weights),
+		NN_HyperModel(PCA_data.train_var.shape[1], hyperparameters, loss_weights).build,
 		objective='val_loss',
 		max_trials=trials,
 		num_initial_points=init_trials,
@@ -499,6 +502,7 @@ def analyse_tuner_results(file_loc, save_loc=None):
 	if len(data)==0:
 		raise ValueError("Unable to load any model from the given folder '{}'".format(file_loc))
 
+	import matplotlib.pyplot as plt
 	hyperparams = data[0][2].keys()
 	for param in hyperparams:
 		x = plt.figure(param)
@@ -689,6 +693,7 @@ def create_residual_PCA(pca_data_loc, base_model_file, save_loc, quantity, compo
 	np.savetxt(save_loc/"PCA_test_{}.dat".format(quantity), new_test_var)
 
 	if savefigs:
+		import matplotlib.pyplot as plt
 		for i,c in enumerate(components):
 			plt.figure()
 			plt.title('delta pca/pred for test data as function of mass ratio')
@@ -699,46 +704,57 @@ def create_residual_PCA(pca_data_loc, base_model_file, save_loc, quantity, compo
 
 	return
 
-def compute_mismatch_WFS(ph_rec, amp_rec, ph_pca, amp_pca, time_grid, size, dt = 0.00001, plot = False):
+def compute_mismatch_WFS(ph_rec, amp_rec, ph_pca, amp_pca, time_grid, size, dt = 0.00001, plot = False, M_tot = None, PSD = None, f_min = None, f_max = None):
+	"""
+	Computes the mismatch between the reconstructed WFs and the PCA WFs, maximised over time and phase (see GW_helper.batch_match).
+	The WFs are interpolated on a uniform grid with spacing dt. If M_tot is given, the time grid (s/M_sun) is scaled to a physical grid (s) for a total mass M_tot (M_sun) and dt is in seconds: this makes the PSD and the frequency cuts physically meaningful.
+	Input:
+		ph_rec, amp_rec (N,D)	phase and amplitude of the reconstructed WFs
+		ph_pca, amp_pca (N,D)	phase and amplitude of the PCA WFs
+		time_grid (D,)			time grid of the WFs
+		size ()					number of WFs to consider
+		dt ()					time step of the uniform grid
+		plot					whether to plot an histogram of the mismatches
+		M_tot ()				total mass (M_sun) to scale the time grid to (if None, the time grid is used as it is)
+		PSD						noise power spectral density: callable S(f) or tuple (f, S(f)) (if None, the noise is white)
+		f_min, f_max ()			frequency cuts
+	Output:
+		F (size,)		mismatches
+	"""
 	F = np.zeros((size))
-	time_grid = time_grid[:]
-
+	time_grid = np.asarray(time_grid, dtype = np.float64)
+	if M_tot is not None:
+		time_grid = time_grid*M_tot
 
 	num = round( (max(time_grid)-min(time_grid)) / dt)
 	new_x_grid = np.linspace(min(time_grid), max(time_grid),num)
+	match = batch_match(num, new_x_grid[1]-new_x_grid[0], PSD = PSD, f_min = f_min, f_max = f_max, complex_WF = True)
 
-	batch_size = min(100,size) #should divide size, but not too large because memory issues
-
-	for j in range(size // batch_size):
-		new_ph_rec = np.empty((batch_size,num),dtype=float)
-		new_amp_rec = np.empty((batch_size,num),dtype=float)
-		new_ph_pca = np.empty((batch_size,num),dtype=float)
-		new_amp_pca = np.empty((batch_size,num),dtype=float)
-
-		for i in range(batch_size):
-			new_ph_rec[i,:] = np.interp(new_x_grid, time_grid, ph_rec[j*batch_size+i,:], left=0, right=0)
-			new_amp_rec[i,:] = np.interp(new_x_grid, time_grid, amp_rec[j*batch_size+i,:], left=0, right=0)
-			new_ph_pca[i,:] = np.interp(new_x_grid, time_grid, ph_pca[j*batch_size+i,:], left=0, right=0)
-			new_amp_pca[i,:] = np.interp(new_x_grid, time_grid, amp_pca[j*batch_size+i,:], left=0, right=0)
-
-		rec_WFs = PcaData.compute_WF(new_amp_rec,new_ph_rec,ratio=1)
-		pca_WFs = PcaData.compute_WF(new_amp_pca,new_ph_pca,ratio=1)
+	batch_size = max(1, min(size, match.chunk_size)) #not too large because memory issues
+	rec_WFs = np.empty((batch_size,num),dtype=np.complex128)
+	pca_WFs = np.empty((batch_size,num),dtype=np.complex128)
 
-		F_model,phase_shift_model = compute_optimal_mismatch(rec_WFs, pca_WFs)
-		F[j*batch_size:(j+1)*batch_size] = F_model
+	for start in range(0, size, batch_size):
+		stop = min(start+batch_size, size)
+		for i in range(start, stop):
+			rec_WFs[i-start,:] = np.interp(new_x_grid, time_grid, amp_rec[i,:], left=0, right=0)*np.exp(1j*np.interp(new_x_grid, time_grid, ph_rec[i,:]))
+			pca_WFs[i-start,:] = np.interp(new_x_grid, time_grid, amp_pca[i,:], left=0, right=0)*np.exp(1j*np.interp(new_x_grid, time_grid, ph_pca[i,:]))
 
+		F[start:stop], _, _ = match(rec_WFs[:stop-start], pca_WFs[:stop-start], return_F = True)
 
 	if plot:
+		import matplotlib.pyplot as plt
 		plt.figure()
 		plt.hist(np.log(F)/np.log(10))
 
 	return F
 
-def check_NN_performance(data_loc, amp_model_locs, ph_model_locs, save_loc, mismatch_N=0):
+def check_NN_performance(data_loc, amp_model_locs, ph_model_locs, save_loc, mismatch_N=0, **mismatch_kwargs):
 	#TODO: seperate loading in the models from different files and checking the performance in to two different functions
 
 	#computes the MSE and optionally mismatch for inputted models on dataset
 	#if mismatch_N > 0, it will return the mismatches.
+	#mismatch_kwargs (M_tot, PSD, f_min, f_max, dt) are passed to compute_mismatch_WFS
 
 	ph_data = PcaData(data_loc, None, 'ph')
 	amp_data = PcaData(data_loc, None, 'amp')
@@ -788,7 +804,7 @@ def check_NN_performance(data_loc, amp_model_locs, ph_model_locs, save_loc, mism
 
 	x_grid = ph_data.times
 
-	F = compute_mismatch_WFS(ph_rec, amp_rec, ph_pca, amp_pca, x_grid, mismatch_N)
+	F = compute_mismatch_WFS(ph_rec, amp_rec, ph_pca, amp_pca, x_grid, mismatch_N, **mismatch_kwargs)
 
 	print('median mismatch is: ', np.median(F))
 
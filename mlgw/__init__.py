@@ -10,6 +10,14 @@ EM_MoE.py
 	It holds a Mixture of Experts model as well as a softmax regression model required for it.
 ML_routines.py
 	It holds some useful ML routines such as PCA model (required by the MLGW_generator) and a routine for performing basis function expansion.
+bundle.py
+	It holds the exporter and the loader of a model saved in a single binary file (.mlgw), with memory-mapped arrays.
+detector.py
+	It holds a network of ground based detectors, which projects the WFs generated by GW_generator onto each detector (antenna patterns and time delays).
+likelihood.py
+	It holds a relative binning likelihood, which computes the gaussian log-likelihood of many templates without generating the full WFs.
+fisher.py
+	It holds a forecaster of the optimal SNR and of the Fisher matrix of many sources, with a given PSD.
 GW_helper.py
 	It holds some routines useful for generating a GW dataset and a computing mismatch between waveforms. This is not strictly required by the model but it is useful for training the model. Used by module fit_model.py
 fit_model.py
@@ -18,4 +26,4 @@ fit_model.py
 """
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-from .GW_generator import GW_generator, list_models
+from .GW_generator import GW_generator, parallel_GW_generator, list_models
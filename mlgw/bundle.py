@@ -0,0 +1,392 @@
+"""
+Module bundle.py
+================
+
+Single file binary bundle of a model.
+
+A model is usually stored in a folder, holding a subfolder for each mode, with text files for the PCA models, the time grid and the regression models, and keras files for the neural networks. The bundle holds the same content in a single binary ``.mlgw`` file:
+
+- the PCA models (V, mu, max_PC, E), the time grids and all the other numerical text files are stored as binary arrays, aligned in memory. They are memory-mapped when loaded: no text parsing is needed and all the processes on a machine share a single physical copy of the arrays
+
+- every other file (keras files, README, features...) is stored as raw bytes
+
+A bundle is exported from a model folder with :func:`export_bundle` and it is loaded by :class:`GW_generator.GW_generator` as if it was a folder: a path ``model.mlgw/22/times.dat`` refers to the file ``times.dat`` of the mode 22 within the bundle ``model.mlgw``.
+The loaders of the package access the model files only with the functions of this module (:func:`isdir`, :func:`listdir`, :func:`glob`, :func:`loadtxt`, :func:`load_PCA_model`, :func:`read_bytes`, :func:`open_file`, :func:`get_file`), which work both with folders and bundles.
+
+The layout of the file is:
+
+	MAGIC (8 bytes) | header length (uint64) | header (json) | padding | data
+
+The header is a dictionary with an entry for each file of the model folder (with its path relative to the folder) and the position of its content within the data. Each array starts at a multiple of 64 bytes.
+"""
+
+import os
+import io
+import mmap
+import json
+import fnmatch
+import tempfile
+import warnings
+import numpy as np
+import glob as glob_module
+from pathlib import Path
+from .ML_routines import PCA_model
+
+MAGIC = b'MLGWBNDL'
+ALIGNMENT = 64
+
+	#patterns of the names of the files saved as arrays (all the other files are saved as bytes)
+PCA_PATTERNS = ['*PCA_model*']
+ARRAY_PATTERNS = ['times*', 'frequencies*', 'residual_coefficients_*', '*_exp_[0-9]*', '*_gat_[0-9]*']
+
+_open_bundles = {} #bundles already opened, to share them among all the modes
+
+class model_bundle():
+	"""
+	Read-only view of a ``.mlgw`` bundle.
+	The whole file is memory-mapped once and the arrays are views of the map.
+	"""
+	def __init__(self, filename):
+		"""
+		Opens the bundle and reads its header.
+
+		Input:
+			filename: str
+				path to the bundle
+		"""
+		self.filename = str(filename)
+		with open(self.filename, 'rb') as f:
+			if f.read(len(MAGIC)) != MAGIC:
+				raise ValueError("File {} is not a valid mlgw bundle".format(self.filename))
+			header_len = int(np.frombuffer(f.read(8), dtype = '<u8')[0])
+			header = json.loads(f.read(header_len).decode())
+			self.mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+		self.entries = header['entries']
+		self.data_start = header['data_start']
+		self.tmp_dir = None #temporary folder where files are extracted (if required by get_file)
+
+	def __get_entry(self, path):
+		path = path.strip('/')
+		if path not in self.entries:
+			raise FileNotFoundError("No such file in bundle {}: '{}'".format(self.filename, path))
+		return self.entries[path]
+
+	def __get_array(self, entry):
+		shape, dtype = tuple(entry['shape']), np.dtype(entry['dtype'])
+		count = int(np.prod(shape))
+		if count == 0:
+			return np.zeros(shape, dtype = dtype)
+		return np.frombuffer(self.mmap, dtype = dtype, count = count, offset = self.data_start+entry['offset']).reshape(shape)
+
+	def isfile(self, path):
+		return path.strip('/') in self.entries
+
+	def isdir(self, path):
+		path = path.strip('/')
+		if path == '':
+			return True
+		return any([name.startswith(path+'/') for name in self.entries])
+
+	def listdir(self, path):
+		"""
+		Returns the names of the files and folders within a folder of the bundle.
+		"""
+		path = path.strip('/')
+		prefix = path+'/' if path else ''
+		if not self.isdir(path):
+			raise FileNotFoundError("No such folder in bundle {}: '{}'".format(self.filename, path))
+		names = [name[len(prefix):].split('/')[0] for name in self.entries if name.startswith(prefix)]
+		return sorted(set(names))
+
+	def glob(self, pattern):
+		"""
+		Returns the paths of the files within the bundle that match a pattern. Wildcards do not match the folder separator.
+		"""
+		pattern_parts = pattern.strip('/').split('/')
+		return sorted([name for name in self.entries if len(name.split('/')) == len(pattern_parts) and
+			all([fnmatch.fnmatchcase(n, p) for n, p in zip(name.split('/'), pattern_parts)])])
+
+	def load_array(self, path):
+		"""
+		Returns a (read-only and memory-mapped) array.
+		"""
+		entry = self.__get_entry(path)
+		if entry['type'] != 'array':
+			raise ValueError("Entry '{}' of bundle {} is not an array".format(path, self.filename))
+		return self.__get_array(entry)
+
+	def load_PCA_params(self, path):
+		"""
+		Returns the parameters [V, mu, max_PC, E] of a PCA model (as read-only and memory-mapped arrays).
+		"""
+		entry = self.__get_entry(path)
+		if entry['type'] != 'PCA':
+			raise ValueError("Entry '{}' of bundle {} is not a PCA model".format(path, self.filename))
+		return [self.__get_array(entry['arrays'][k]) for k in ['V', 'mu', 'max_PC', 'E']]
+
+	def read_bytes(self, path):
+		"""
+		Returns the content of a file saved as bytes.
+		"""
+		entry = self.__get_entry(path)
+		if entry['type'] != 'bytes':
+			raise ValueError("Entry '{}' of bundle {} is not saved as bytes".format(path, self.filename))
+		start = self.data_start+entry['offset']
+		return self.mmap[start:start+entry['size']]
+
+	def get_file(self, path):
+		"""
+		Extracts a file (or a folder) to a temporary folder and returns its path. It is meant for the libraries that can read only from disk (e.g. keras).
+		The temporary folder is deleted when the bundle is closed.
+		"""
+		path = path.strip('/')
+		if self.tmp_dir is None:
+			self.tmp_dir = tempfile.TemporaryDirectory(prefix = 'mlgw_bundle_')
+		names = [name for name in self.entries if name == path or name.startswith(path+'/')]
+		if not names:
+			raise FileNotFoundError("No such file in bundle {}: '{}'".format(self.filename, path))
+		for name in names:
+			out_file = os.path.join(self.tmp_dir.name, name)
+			if os.path.isfile(out_file):
+				continue
+			os.makedirs(os.path.dirname(out_file), exist_ok = True)
+			entry = self.entries[name]
+			if entry['type'] == 'bytes':
+				with open(out_file, 'wb') as f:
+					f.write(self.read_bytes(name))
+			elif entry['type'] == 'array':
+				np.savetxt(out_file, self.load_array(name))
+			else:
+				pca = PCA_model()
+				pca.PCA_params = self.load_PCA_params(name)
+				pca.save_model(out_file)
+		return os.path.join(self.tmp_dir.name, path)
+
+	def hash_content(self, path, file_hash):
+		"""
+		Updates a hash object (from hashlib) with the names and the content of all the files in a folder of the bundle.
+		"""
+		path = path.strip('/')
+		prefix = path+'/' if path else ''
+		for name in sorted(self.entries):
+			if not name.startswith(prefix):
+				continue
+			entry = self.entries[name]
+			file_hash.update(name[len(prefix):].encode())
+			if entry['type'] == 'bytes':
+				file_hash.update(self.read_bytes(name))
+			elif entry['type'] == 'array':
+				file_hash.update(self.load_array(name).tobytes())
+			else:
+				for p in self.load_PCA_params(name):
+					file_hash.update(p.tobytes())
+
+	def close(self):
+		"""
+		Removes the temporary files (if any). The arrays already loaded are still valid.
+		"""
+		if self.tmp_dir is not None:
+			self.tmp_dir.cleanup()
+			self.tmp_dir = None
+
+def open_bundle(filename):
+	"""
+	Opens a bundle. Each bundle is opened only once for each process and it is shared by all the models that use it.
+
+	Input:
+		filename: str
+			path to the bundle
+
+	Output:
+		bundle: :class:`model_bundle`
+			the opened bundle
+	"""
+	key = os.path.realpath(filename)
+	if key not in _open_bundles or os.path.getmtime(key) != _open_bundles[key][0]:
+		_open_bundles[key] = (os.path.getmtime(key), model_bundle(key))
+	return _open_bundles[key][1]
+
+def split_bundle_path(path):
+	"""
+	Splits a path in the bundle and the path of a file within the bundle.
+
+	Input:
+		path: str
+			path (e.g. model.mlgw/22/times.dat)
+
+	Output:
+		bundle: :class:`model_bundle`
+			the bundle the path refers to (None if the path is not within a bundle)
+		inner_path: str
+			path within the bundle (the input path if it is not within a bundle)
+	"""
+	path = str(path)
+	if '.mlgw' not in path:
+		return None, path
+	parts = path.split('/')
+	for i in range(len(parts)):
+		prefix = '/'.join(parts[:i+1])
+		if prefix.endswith('.mlgw') and os.path.isfile(prefix):
+			return open_bundle(prefix), '/'.join(parts[i+1:])
+	return None, path
+
+	#Functions to access the files of a model (either in a folder or in a bundle)
+
+def isdir(path):
+	"""
+	Whether the path is a folder (or a folder within a bundle).
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	if bundle is None:
+		return os.path.isdir(path)
+	return bundle.isdir(inner_path)
+
+def listdir(path):
+	"""
+	Lists the content of a folder (or of a folder within a bundle).
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	if bundle is None:
+		return os.listdir(path)
+	return bundle.listdir(inner_path)
+
+def glob(pattern):
+	"""
+	Returns the paths that match a pattern, as ``glob.glob``. Within a bundle, only the last part of the path can hold wildcards.
+	"""
+	pattern = str(pattern)
+	bundle, inner_pattern = split_bundle_path(pattern)
+	if bundle is None:
+		return glob_module.glob(pattern)
+	prefix = pattern[:len(pattern)-len(inner_pattern)].rstrip('/')
+	return [prefix+'/'+name for name in bundle.glob(inner_pattern)]
+
+def loadtxt(path):
+	"""
+	Loads an array saved as text, as ``np.loadtxt``. Within a bundle, the array is memory-mapped (and read-only).
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	if bundle is None:
+		return np.loadtxt(path)
+	return bundle.load_array(inner_path)
+
+def load_PCA_model(path):
+	"""
+	Loads a :class:`ML_routines.PCA_model`. Within a bundle, the parameters of the model are memory-mapped (and read-only).
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	model = PCA_model()
+	if bundle is None:
+		model.load_model(path)
+	else:
+		model.PCA_params = bundle.load_PCA_params(inner_path)
+	return model
+
+def read_bytes(path):
+	"""
+	Returns the content of a file, as bytes.
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	if bundle is None:
+		with open(path, 'rb') as f:
+			return f.read()
+	return bundle.read_bytes(inner_path)
+
+def open_file(path):
+	"""
+	Returns a binary file object to read a file.
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	if bundle is None:
+		return open(path, 'rb')
+	return io.BytesIO(bundle.read_bytes(inner_path))
+
+def get_file(path):
+	"""
+	Returns a path on disk for a file (or a folder): files within a bundle are extracted to a temporary folder.
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	if bundle is None:
+		return str(path)
+	return bundle.get_file(inner_path)
+
+def hash_content(path, file_hash):
+	"""
+	Updates a hash object (from hashlib) with the names and the content of all the files in a folder (or in a folder within a bundle).
+	"""
+	bundle, inner_path = split_bundle_path(path)
+	if bundle is not None:
+		bundle.hash_content(inner_path, file_hash)
+		return
+	folder = Path(path)
+	for f in sorted(folder.rglob('*')):
+		if f.is_file():
+			file_hash.update(str(f.relative_to(folder).as_posix()).encode())
+			file_hash.update(f.read_bytes())
+
+def export_bundle(folder, filename):
+	"""
+	Exports a model folder to a single ``.mlgw`` bundle.
+	PCA models, time grids and regression coefficients are saved as binary arrays; all the other files are saved as bytes.
+
+	Input:
+		folder: str/int
+			folder of the model (if int, the pre-fitted model with that index, as in :class:`GW_generator.GW_generator`)
+		filename: str
+			name of the bundle (it must end with ".mlgw")
+	"""
+	if isinstance(folder, int):
+		folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TD_models", "model_"+str(folder))
+	if not os.path.isdir(folder):
+		raise RuntimeError("Unable to export folder "+str(folder)+": no such directory!")
+	if not str(filename).endswith('.mlgw'):
+		raise ValueError("The name of the bundle must end with \".mlgw\", given {}".format(filename))
+
+	folder = Path(folder)
+	entries, data, size = {}, [], 0
+
+	def add_data(content):
+		nonlocal size
+		size += (-size)%ALIGNMENT
+		offset = size
+		data.append((offset, content))
+		size += len(content)
+		return offset
+
+	def add_array(arr):
+		arr = np.ascontiguousarray(arr, dtype = np.float64)
+		return {'type': 'array', 'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': add_data(arr.tobytes())}
+
+	for f in sorted(folder.rglob('*')):
+		if not f.is_file() or '__pycache__' in f.parts:
+			continue
+		name = f.relative_to(folder).as_posix()
+		if any([fnmatch.fnmatchcase(f.name, p) for p in PCA_PATTERNS]):
+			with warnings.catch_warnings():
+				warnings.simplefilter('ignore')
+				params = PCA_model(str(f)).PCA_params
+			entries[name] = {'type': 'PCA', 'arrays': {k: add_array(p) for k, p in zip(['V', 'mu', 'max_PC', 'E'], params)}}
+		elif any([fnmatch.fnmatchcase(f.name, p) for p in ARRAY_PATTERNS]):
+			entries[name] = add_array(np.loadtxt(f))
+		else:
+			content = f.read_bytes()
+			entries[name] = {'type': 'bytes', 'offset': add_data(content), 'size': len(content)}
+
+		#the data start at a page boundary after the header
+	header = {'entries': entries, 'data_start': 0}
+	header_len = len(json.dumps(header).encode())+32
+	data_start = len(MAGIC)+8+header_len
+	data_start += (-data_start)%mmap.ALLOCATIONGRANULARITY
+	header['data_start'] = data_start
+	header = json.dumps(header).encode().ljust(header_len)
+
+	tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+	with open(tmp_filename, 'wb') as f:
+		f.write(MAGIC)
+		f.write(np.array([len(header)], dtype = '<u8').tobytes())
+		f.write(header)
+		for offset, content in data:
+			f.seek(data_start+offset)
+			f.write(content)
+	os.replace(tmp_filename, filename)
+	return
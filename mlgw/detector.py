@@ -0,0 +1,270 @@
+"""
+Module detector.py
+==================
+
+Projection of the WFs generated by a :class:`GW_generator.GW_generator` onto a network of ground based detectors.
+
+- :class:`detector_network` computes antenna patterns and time delays from the geocenter for a list of detectors and it generates the strain observed by each detector, for a batch of sources.
+
+The geometry of the detectors and the Greenwich mean sidereal time follow the conventions of lal (``XLALComputeDetAMResponse``, ``XLALTimeDelayFromEarthCenter`` and ``XLALGreenwichMeanSiderealTime``): lal is not required.
+"""
+#################
+
+import warnings
+import numpy as np
+from .GW_generator import batch_interpolator, call_cache, AMP_PREFACTOR
+
+#################
+
+C_SI = 299792458. #speed of light (m/s)
+
+	#Location of the vertex (m, Earth fixed frame) and unit vectors along the two arms of the detectors, as in lal (LALDetectors.h)
+	#New detectors can be added to this dictionary
+known_detectors = {
+	'H1': ([-2.16141492636e+06, -3.83469517889e+06, 4.60035022664e+06],
+		[-0.22389266154, 0.79983062746, 0.55690487831],
+		[-0.91397818574, 0.02609403989, -0.40492342125]),
+	'L1': ([-7.42760447238e+04, -5.49628371971e+06, 3.22425701744e+06],
+		[-0.95457412153, -0.14158077340, -0.26218911324],
+		[0.29774156894, -0.48791033647, -0.82054461286]),
+	'V1': ([4.54637409900e+06, 8.42989697626e+05, 4.37857696241e+06],
+		[-0.70045821479, 0.20848948619, 0.68256166277],
+		[-0.05379255368, -0.96908180549, 0.24080451708]),
+	'K1': ([-3.77733602400e+06, 3.48489841100e+06, 3.76531369700e+06],
+		[-0.37590400000, -0.83615830000, 0.39941890000],
+		[0.71643780000, 0.01114076000, 0.69756200000]),
+}
+
+	#GPS times at which a leap second was introduced in UTC
+gps_leap_seconds = np.array([46828800, 78364801, 109900802, 173059203, 252028804, 315187205, 346723206,
+	393984007, 425520008, 457056009, 504489610, 551750411, 599184012, 820108813, 914803214,
+	1025136015, 1119744016, 1167264017], dtype = np.float64)
+
+def get_gmst(t_gps):
+	"""
+	Computes the Greenwich mean sidereal time, as ``XLALGreenwichMeanSiderealTime`` (IAU 1982 expression, with UT1 = UTC).
+
+	Input:
+		t_gps: :class:`~numpy:numpy.ndarray`
+			shape ()/(N,) - GPS time (s)
+
+	Output:
+		gmst: :class:`~numpy:numpy.ndarray`
+			shape ()/(N,) - Greenwich mean sidereal time (rad, not wrapped)
+	"""
+	t_gps = np.asarray(t_gps, dtype = np.float64)
+	t_utc = t_gps - np.searchsorted(gps_leap_seconds, t_gps, side = 'right')
+		#Julian centuries from J2000 (the GPS epoch is JD 2444244.5)
+	t = (t_utc/86400. + 2444244.5 - 2451545.0)/36525.
+	gmst = 67310.54841 + (3155760000.0 + 8640184.812866)*t + (0.093104 - 6.2e-6*t)*t*t #(s)
+	return gmst*np.pi/43200.
+
+class detector_network():
+	"""
+	A network of ground based detectors.
+	It computes the antenna patterns and the time delays from the geocenter for many sky positions at once and it generates the strain observed by each detector, for a batch of sources:
+
+	.. math::
+
+		h_d(t) = F_+ h_+(t - \\tau_d) + F_\\times h_\\times(t - \\tau_d)
+
+	The modes are generated once for each source and they are interpolated at the time-delayed grids of all the detectors with a single interpolator.
+	"""
+	_chunk_size = 2**22 #number of points (source, detector, time) interpolated at once
+
+	def __init__(self, detectors = ['H1', 'L1', 'V1']):
+		"""
+		Initialise the network.
+
+		Input:
+			detectors: list
+				names of the detectors, among the keys of ``known_detectors``
+		"""
+		if isinstance(detectors, str): detectors = [detectors]
+		for det in detectors:
+			if det not in known_detectors:
+				raise ValueError("Unknown detector {}: available detectors are {}".format(det, list(known_detectors.keys())))
+		self.detectors = list(detectors)
+		self.vertex = np.array([known_detectors[det][0] for det in detectors], dtype = np.float64) #(n_det,3)
+		x_arm = np.array([known_detectors[det][1] for det in detectors], dtype = np.float64)
+		y_arm = np.array([known_detectors[det][2] for det in detectors], dtype = np.float64)
+		self.response = 0.5*(np.einsum('di,dj->dij', x_arm, x_arm) - np.einsum('di,dj->dij', y_arm, y_arm)) #(n_det,3,3)
+
+	def __len__(self):
+		return len(self.detectors)
+
+	def antenna_patterns(self, ra, dec, psi, t_gps):
+		"""
+		Computes the antenna patterns of each detector.
+
+		Input:
+			ra: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - right ascension (rad)
+			dec: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - declination (rad)
+			psi: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - polarization angle (rad)
+			t_gps: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - GPS time (s)
+
+		Output:
+			F_p, F_c: :class:`~numpy:numpy.ndarray`
+				shape (n_det,)/(N,n_det) - plus and cross antenna patterns
+		"""
+		ra, dec, psi, t_gps = np.broadcast_arrays(ra, dec, psi, t_gps)
+		gha = get_gmst(t_gps) - ra #Greenwich hour angle
+		cos_gha, sin_gha = np.cos(gha), np.sin(gha)
+		cos_dec, sin_dec = np.cos(dec), np.sin(dec)
+		cos_psi, sin_psi = np.cos(psi), np.sin(psi)
+
+		X = np.stack([-cos_psi*sin_gha - sin_psi*cos_gha*sin_dec,
+			-cos_psi*cos_gha + sin_psi*sin_gha*sin_dec,
+			sin_psi*cos_dec], axis = -1) #(N,3)
+		Y = np.stack([sin_psi*sin_gha - cos_psi*cos_gha*sin_dec,
+			sin_psi*cos_gha + cos_psi*sin_gha*sin_dec,
+			cos_psi*cos_dec], axis = -1) #(N,3)
+
+		F_p = np.einsum('...i,dij,...j->...d', X, self.response, X) - np.einsum('...i,dij,...j->...d', Y, self.response, Y)
+		F_c = np.einsum('...i,dij,...j->...d', X, self.response, Y) + np.einsum('...i,dij,...j->...d', Y, self.response, X)
+		return F_p, F_c
+
+	def time_delays(self, ra, dec, t_gps):
+		"""
+		Computes the time delay between the arrival of the signal at each detector and at the geocenter.
+
+		Input:
+			ra: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - right ascension (rad)
+			dec: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - declination (rad)
+			t_gps: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - GPS time at the geocenter (s)
+
+		Output:
+			tau: :class:`~numpy:numpy.ndarray`
+				shape (n_det,)/(N,n_det) - time delays (s)
+		"""
+		ra, dec, t_gps = np.broadcast_arrays(ra, dec, t_gps)
+		gha = get_gmst(t_gps) - ra
+		cos_dec = np.cos(dec)
+		e_src = np.stack([cos_dec*np.cos(gha), -cos_dec*np.sin(gha), np.sin(dec)], axis = -1) #(N,3) direction of the source
+		return -np.einsum('...i,di->...d', e_src, self.vertex)/C_SI
+
+	def get_strain(self, generator, theta, t_grid, ra, dec, psi, t_gps, modes = (2,2)):
+		"""
+		Generates the strain observed by each detector, for a batch of aligned spin sources.
+		The time grid is relative to the GPS time of the merger at the geocenter: each detector observes the WF at the grid t_grid - tau_d, where tau_d is the time delay of the detector.
+		The ML models are evaluated once for each source: the modes are then interpolated at the shifted grids of all the detectors at once.
+
+		Input:
+			generator: :class:`GW_generator.GW_generator`
+				generator of the WFs
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (7,)/(N,7) - source parameters [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0]
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - grid of times (s) relative to t_gps, at which the strain is evaluated
+			ra: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - right ascension (rad)
+			dec: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - declination (rad)
+			psi: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - polarization angle (rad)
+			t_gps: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - GPS time of the merger at the geocenter (s)
+			modes: list
+				list of modes employed for building the WF (if None, every mode available is employed)
+
+		Output:
+			strain: :class:`~numpy:numpy.ndarray`
+				shape (D,n_det)/(N,D,n_det) - strain at each detector
+		"""
+		theta = np.asarray(theta, dtype = np.float64)
+		squeeze = (theta.ndim == 1)
+		theta = np.atleast_2d(theta)
+		if theta.shape[1] != 7:
+			raise ValueError("Wrong number of source parameters: expected 7 [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0], given {}".format(theta.shape[1]))
+		t_grid = np.asarray(t_grid, dtype = np.float64)
+		if modes is None:
+			modes = generator.list_modes()
+		elif isinstance(modes, tuple):
+			modes = [modes]
+
+		N, D, n_det = theta.shape[0], len(t_grid), len(self)
+		ra, dec, psi, t_gps = [np.broadcast_to(x, (N,)) for x in (ra, dec, psi, t_gps)]
+		F_p, F_c = self.antenna_patterns(ra, dec, psi, t_gps) #(N,n_det)
+		tau = self.time_delays(ra, dec, t_gps) #(N,n_det)
+
+			#the sources are processed in chunks, to bound the memory of the interpolator
+		strain = np.zeros((N, n_det, D), dtype = generator.dtype)
+		step = max(1, self._chunk_size//max(n_det*D, 1))
+		for start in range(0, N, step):
+			ids = slice(start, start+step)
+			self.__add_strain(generator, theta[ids], t_grid, F_p[ids], F_c[ids], tau[ids], modes, strain[ids])
+
+		strain = np.moveaxis(strain, 1, 2) #(N,D,n_det)
+		if squeeze: return strain[0]
+		return strain
+
+	@call_cache(call_cache.modes_quantities)
+	def __add_strain(self, generator, theta, t_grid, F_p, F_c, tau, modes, strain):
+		"""
+		Adds in place the contribution of the modes to the strain of a chunk of sources. Called by get_strain.
+
+		Input:
+			generator: :class:`GW_generator.GW_generator`
+				generator of the WFs
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,7) - source parameters
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - grid of times (s) relative to the merger at the geocenter
+			F_p, F_c: :class:`~numpy:numpy.ndarray`
+				shape (N,n_det) - antenna patterns
+			tau: :class:`~numpy:numpy.ndarray`
+				shape (N,n_det) - time delays (s)
+			modes: list
+				list of modes employed for building the WF
+			strain: :class:`~numpy:numpy.ndarray`
+				shape (N,n_det,D) - strain to update
+		"""
+		N, n_det, D = strain.shape
+		strain_rows = strain.reshape(N*n_det, D) #each row is a (source, detector) pair
+
+			#coefficients of A*cos(ph + m*phi_0) and A*sin(ph + m*phi_0) for each mode, source and detector
+		c_plus, c_cross = generator.get_polarization_coefficients(modes, theta[:,5]) #(N,K)
+		amp_prefactor = AMP_PREFACTOR*(theta[:,0] + theta[:,1])/theta[:,4] #(N,)
+
+		interpolator, times = None, None
+		for k, mode in enumerate(modes):
+			mode_gen = generator.get_mode_obj(mode)
+			if mode_gen is None:
+				warnings.warn("Unable to find mode {}: mode might be non existing or in the wrong format. Skipping it".format(mode))
+				continue
+			amp, ph, m_tot = mode_gen.get_scaled_raw_mode(theta[:,:4], t_grid[0]) #(N,D'')
+			amp *= amp_prefactor[:,None]
+			ph += mode[1]*theta[:,6,None]
+
+				#the interpolator for the grids (t_grid-tau)/m_tot is shared by the modes with the same grid
+			if interpolator is None or not np.array_equal(times, mode_gen.times):
+				times = mode_gen.times
+				m_rows = np.repeat(m_tot, n_det) #(N*n_det,)
+				x = np.subtract(t_grid[None,:], tau.reshape(-1,1))/m_rows[:,None]
+				if len(times) < D and np.all(np.diff(t_grid) >= 0):
+					ids = batch_interpolator.locate_nodes(t_grid, np.multiply.outer(m_rows, times[1:-1]) + tau.reshape(-1,1))
+				else:
+					ids = None
+				interpolator = batch_interpolator(times, x, ids)
+				if interpolator.extrapolates:
+					warnings.warn("Warning: time grid given is too long for the fitted model. Set 0 amplitude outside the fitting domain.")
+
+			amp = interpolator(np.repeat(amp, n_det, axis = 0).astype(generator.dtype), left = 0, right = 0) #(N*n_det,D)
+			ph = interpolator.interpolate_phase(np.repeat(ph, n_det, axis = 0), generator.dtype)
+
+				#the antenna patterns are included in the coefficients of the mode
+			buff = np.cos(ph)
+			buff *= amp
+			buff *= (F_p*c_plus[:,k,None]).reshape(-1,1).astype(generator.dtype)
+			strain_rows += buff
+			np.sin(ph, out = ph)
+			ph *= amp
+			ph *= (F_c*c_cross[:,k,None]).reshape(-1,1).astype(generator.dtype)
+			strain_rows += ph
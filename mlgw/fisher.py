@@ -0,0 +1,309 @@
+"""
+Module fisher.py
+================
+
+Batched forecasts of the optimal SNR and of the Fisher matrix, for many sources generated by a :class:`GW_generator.GW_generator`.
+
+- :class:`fisher_forecast` computes, for a whole catalogue of sources, the optimal SNR and the Fisher matrix of the WF projected onto a detector, with the noise weighted scalar product of a given PSD. The derivatives of the WF are computed analytically (see :func:`GW_generator.GW_generator.get_WF_grads`) or, if they are not available, by vectorized central differences.
+
+The Fisher matrix of a network of detectors is the sum of the Fisher matrices of each detector (the time delays do not affect the derivatives w.r.t. the parameters considered here).
+"""
+#################
+
+import warnings
+import numpy as np
+
+#################
+
+class fisher_forecast():
+	"""
+	Optimal SNR and Fisher matrix for a detector with a (stationary) PSD S(f). The scalar product is
+
+	.. math::
+
+		\\langle a | b \\rangle = 4 \\mathrm{Re} \\int_{f_{min}}^{f_{max}} \\frac{\\tilde{a}^*(f) \\tilde{b}(f)}{S(f)} df
+
+	and the Fisher matrix is F_ij = <d_i h|d_j h>, where h = F_+ h_+ + F_x h_x is the strain and the derivatives are taken w.r.t. the parameters
+
+		[M, q, s1, s2, D_L, inclination, phi_0, t_c]
+
+	(the first two mass variables depend on `grad_var`, see :func:`GW_generator.GW_generator.get_mode_grads`). The time shift t_c moves the WF as h(t - t_c).
+
+	The WFs are generated on a uniform time grid and transformed with a FFT. The sources are processed in chunks, so that the memory does not depend on the size of the catalogue. Only the derivatives w.r.t. the intrinsic parameters, inclination and phi_0 are transformed: the ones w.r.t. D_L and t_c are computed from the FFT of the WF (-h/D_L and -2 pi i f h).
+	"""
+	_max_buffer_size = 2**24 #maximum number of elements of the time domain WFs and derivatives held at once
+	_elements_per_source = {'snr': 3, 'analytic': 18, 'finite_differences': 39} #number of time domain arrays of length D held at once for each source: h_p, h_c and h for the SNR, h and its 8 gradients for both polarizations for the analytic derivatives, h_p, h_c and h of the 13 perturbed sources for the finite differences
+	_FD_steps = np.array([3e-5, 1e-3, 1e-3, 1e-3, 1e-2, 1e-2]) #steps for the finite differences of the mass variables (relative), spins, inclination and phi_0. The steps of the variables that change M are small, as the phase of long WFs is very sensitive to M; the others are limited by the single precision of the networks
+
+	def __init__(self, generator, t_grid, PSD = None, f_min = None, f_max = None, modes = (2,2), window = None):
+		"""
+		Initialises the frequency weights.
+
+		Input:
+			generator: :class:`GW_generator.GW_generator`
+				generator of the WFs (any object with the same get_WF interface, e.g. :class:`GW_generator.parallel_GW_generator`)
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - uniform time grid (s) to generate the WFs on
+			PSD: callable/tuple
+				noise power spectral density: callable S(f) or tuple (f, S(f)) to be interpolated. If None, the noise is white (S = 1)
+			f_min, f_max: float
+				frequency cuts (Hz): the frequencies outside [f_min, f_max] are not considered
+			modes: list
+				list of modes employed for building the WFs (if None, every mode available is employed)
+			window: :class:`~numpy:numpy.ndarray`
+				shape (D,) - window applied to the WFs (and to their derivatives) before the FFT, to reduce the spectral leakage of the start of the WF (if None, no window is applied)
+		"""
+		import scipy.fft
+		self.generator = generator
+		self.t_grid = np.asarray(t_grid, dtype = np.float64)
+		if self.t_grid.ndim != 1 or len(self.t_grid) < 2:
+			raise ValueError("The time grid must be a 1D array with at least two points")
+		self.dt = self.t_grid[1] - self.t_grid[0]
+		if self.dt <= 0 or not np.allclose(np.diff(self.t_grid), self.dt, rtol = 1e-6, atol = 0.):
+			raise ValueError("The time grid must be uniform and increasing")
+		self.modes = modes
+		self.D = len(self.t_grid)
+
+		if window is not None:
+			window = np.asarray(window, dtype = np.float64)
+			if window.shape != self.t_grid.shape:
+				raise ValueError("Wrong shape of the window: expected {}, given {}".format(self.t_grid.shape, window.shape))
+		self.window = window
+
+		self.n_fft = scipy.fft.next_fast_len(self.D)
+		self.freqs = scipy.fft.rfftfreq(self.n_fft, self.dt)
+
+			#weights 4 df dt^2/S(f), with the frequency cuts: the FFT is not normalized by dt
+		if PSD is None:
+			weights = np.ones(self.freqs.shape)
+		else:
+			if callable(PSD):
+				S = np.asarray(PSD(self.freqs), dtype = np.float64)
+			else:
+				S = np.interp(self.freqs, *PSD, left = np.inf, right = np.inf)
+			weights = np.divide(1., S, out = np.zeros(self.freqs.shape), where = S > 0)
+		if f_min is not None: weights[self.freqs < f_min] = 0.
+		if f_max is not None: weights[self.freqs > f_max] = 0.
+		if not np.any(weights > 0):
+			raise ValueError("No frequency is left after the frequency cuts: check f_min, f_max and the PSD")
+		self.sqrt_weights = np.sqrt(4.*self.dt/self.n_fft*weights) #df = 1/(n_fft*dt)
+
+		self.chunk_size = {method: max(1, self._max_buffer_size//(n*self.D)) for method, n in self._elements_per_source.items()} #number of sources processed at once, for each method
+
+	def __check_input(self, theta, F_p, F_c):
+		"""
+		Checks the shape of the source parameters and broadcasts the antenna patterns to shape (N,).
+		"""
+		theta = np.asarray(theta, dtype = np.float64)
+		squeeze = (theta.ndim == 1)
+		theta = np.atleast_2d(theta)
+		if theta.ndim != 2 or theta.shape[1] != 7:
+			raise ValueError("Wrong shape of the source parameters: expected (N,7) [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0], given {}".format(theta.shape))
+		F_p = np.broadcast_to(np.asarray(F_p, dtype = np.float64), (theta.shape[0],))
+		F_c = np.broadcast_to(np.asarray(F_c, dtype = np.float64), (theta.shape[0],))
+		return theta, F_p, F_c, squeeze
+
+	def __fft(self, h):
+		"""
+		Returns the FFT of the real signals h (...,D), along the last axis, multiplied by the square root of the weights.
+		"""
+		import scipy.fft
+		if self.window is not None:
+			h = h*self.window
+		H = scipy.fft.rfft(h, n = self.n_fft, axis = -1)
+		H *= self.sqrt_weights
+		return H
+
+	def snr(self, theta, F_p = 1., F_c = 0.):
+		"""
+		Computes the optimal SNR sqrt(<h|h>) of each source.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (7,)/(N,7) - source parameters [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0]
+			F_p, F_c: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - antenna patterns of the detector
+
+		Output:
+			snr: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - optimal SNR
+		"""
+		theta, F_p, F_c, squeeze = self.__check_input(theta, F_p, F_c)
+		snr = np.zeros(theta.shape[0])
+		for start in range(0, theta.shape[0], self.chunk_size['snr']):
+			stop = min(start+self.chunk_size['snr'], theta.shape[0])
+			h_p, h_c = self.generator.get_WF(theta[start:stop], self.t_grid, self.modes)
+			H = self.__fft(F_p[start:stop,None]*h_p + F_c[start:stop,None]*h_c)
+			snr[start:stop] = np.sqrt(np.sum(np.square(np.abs(H)), axis = 1))
+		if squeeze: return snr[0]
+		return snr
+
+	def fisher(self, theta, F_p = 1., F_c = 0., grad_var = 'M_q', method = 'auto', return_snr = False):
+		"""
+		Computes the Fisher matrix of each source, w.r.t. the parameters [M, q, s1, s2, D_L, inclination, phi_0, t_c] (the mass variables depend on grad_var).
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (7,)/(N,7) - source parameters [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0]
+			F_p, F_c: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - antenna patterns of the detector
+			grad_var: str
+				the mass variables which the derivatives are computed w.r.t. ('M_q', 'mchirp_eta' or 'm1_m2')
+			method: str
+				how to compute the derivatives of the WF: 'analytic' (with :func:`GW_generator.GW_generator.get_WF_grads`), 'finite_differences' (central differences) or 'auto' (analytic, if the generator provides them)
+			return_snr: bool
+				whether to return also the optimal SNR
+
+		Output:
+			fisher: :class:`~numpy:numpy.ndarray`
+				shape (8,8)/(N,8,8) - Fisher matrices
+			snr: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - optimal SNR (only if return_snr is True)
+		"""
+		if grad_var not in ["M_q", "mchirp_eta", "m1_m2"]:
+			raise ValueError("Wrong gradient variables chosen. Expected \"M_q\", \"mchirp_eta\", \"m1_m2\"; given \"{}\"".format(grad_var))
+		if method not in ['auto', 'analytic', 'finite_differences']:
+			raise ValueError("Wrong method: expected 'auto', 'analytic' or 'finite_differences', given '{}'".format(method))
+		if method == 'auto':
+			method = 'analytic' if hasattr(self.generator, 'get_WF_grads') else 'finite_differences'
+		theta, F_p, F_c, squeeze = self.__check_input(theta, F_p, F_c)
+
+		N = theta.shape[0]
+		fisher, snr = np.zeros((N,8,8)), np.zeros(N)
+		ids_grads = [0, 1, 2, 3, 5, 6] #derivatives that are transformed (D_L and t_c are computed from h)
+		start = 0
+		while start < N:
+			stop = min(start+self.chunk_size[method], N)
+			if method == 'analytic':
+				try:
+					h, grads = self.__get_grads_analytic(theta[start:stop], F_p[start:stop], F_c[start:stop], grad_var)
+				except NotImplementedError:
+					warnings.warn("Analytic gradients are not available for the given generator: falling back to finite differences")
+					method = 'finite_differences'
+					continue #the chunk is resized for the finite differences
+			if method == 'finite_differences':
+				h, grads = self.__get_grads_FD(theta[start:stop], F_p[start:stop], F_c[start:stop], grad_var)
+
+			H_grads = np.zeros((stop-start, 8, len(self.freqs)), dtype = np.complex128)
+			H_grads[:,ids_grads] = self.__fft(grads) #(n,6,F)
+			H = self.__fft(h) #(n,F)
+			H_grads[:,4] = -H/theta[start:stop,4,None]
+			H_grads[:,7] = (-2j*np.pi*self.freqs)*H
+
+			fisher[start:stop] = np.matmul(H_grads.conj(), np.transpose(H_grads, (0,2,1))).real
+			snr[start:stop] = np.sqrt(np.sum(np.square(np.abs(H)), axis = 1))
+			start = stop
+
+		if squeeze: fisher, snr = fisher[0], snr[0]
+		if return_snr: return fisher, snr
+		return fisher
+
+	def __get_grads_analytic(self, theta, F_p, F_c, grad_var):
+		"""
+		Returns the strain h (n,D) and its derivatives (n,6,D) w.r.t. the mass variables, spins, inclination and phi_0, computed with :func:`GW_generator.GW_generator.get_WF_grads`.
+		"""
+		h_p, h_c, grad_h_p, grad_h_c = self.generator.get_WF_grads(theta, self.t_grid, self.modes, grad_var = grad_var, return_WF = True)
+		h = F_p[:,None]*h_p + F_c[:,None]*h_c
+		grads = F_p[:,None,None]*grad_h_p[:,:,[0,1,2,3,5,6]] + F_c[:,None,None]*grad_h_c[:,:,[0,1,2,3,5,6]]
+		return h, np.transpose(grads, (0,2,1))
+
+	def __get_grads_FD(self, theta, F_p, F_c, grad_var):
+		"""
+		Returns the strain h (n,D) and its derivatives (n,6,D) w.r.t. the mass variables, spins, inclination and phi_0, computed with central differences.
+		All the perturbed sources are generated with a single call to the generator.
+		"""
+		n = theta.shape[0]
+		swap = theta[:,0] < theta[:,1]
+		x = np.column_stack([self.masses_to_vars(theta[:,0], theta[:,1], grad_var), theta[:,[2,3,5,6]]]) #(n,6)
+		steps = np.tile(self._FD_steps, (n,1)) #(n,6)
+		if grad_var == 'm1_m2':
+			steps[:,1] = steps[:,0] #both masses change M
+		steps[:,:2] *= np.abs(x[:,:2]) #relative steps for the mass variables
+		if grad_var == 'mchirp_eta':
+			steps[:,1] = np.minimum(steps[:,1], np.maximum(0.25 - x[:,1], 1e-8)) #eta must not exceed 1/4
+
+		theta_FD = np.tile(theta, (13,1,1)) #(13,n,7): the first is the unperturbed source
+		for j in range(6):
+			for k, sign in enumerate([1., -1.]):
+				x_pert = x.copy()
+				x_pert[:,j] += sign*steps[:,j]
+				m1, m2 = self.vars_to_masses(x_pert[:,0], x_pert[:,1], grad_var, swap)
+				theta_FD[1+2*j+k] = np.column_stack([m1, m2, x_pert[:,2], x_pert[:,3], theta[:,4], x_pert[:,4], x_pert[:,5]])
+
+		h_p, h_c = self.generator.get_WF(theta_FD.reshape(13*n,7), self.t_grid, self.modes)
+		h = (F_p[:,None]*h_p.reshape(13,n,-1) + F_c[:,None]*h_c.reshape(13,n,-1)) #(13,n,D)
+		grads = (h[1::2] - h[2::2])/(2*steps.T[:,:,None]) #(6,n,D)
+		return h[0], np.transpose(grads, (1,0,2))
+
+	@staticmethod
+	def masses_to_vars(m1, m2, grad_var):
+		"""
+		Converts the component masses into the mass variables given by grad_var ([M, q], [Mc, eta] or [m1, m2]). The mass ratio q is always greater than 1.
+
+		Input:
+			m1, m2: :class:`~numpy:numpy.ndarray`
+				shape (N,) - component masses
+			grad_var: str
+				mass variables ('M_q', 'mchirp_eta' or 'm1_m2')
+
+		Output:
+			vars: :class:`~numpy:numpy.ndarray`
+				shape (N,2) - mass variables
+		"""
+		m1, m2 = np.asarray(m1, dtype = np.float64), np.asarray(m2, dtype = np.float64)
+		if grad_var == 'M_q':
+			return np.column_stack([m1+m2, np.maximum(m1,m2)/np.minimum(m1,m2)])
+		if grad_var == 'mchirp_eta':
+			return np.column_stack([np.power(m1*m2, 3./5.)/np.power(m1+m2, 1./5.), m1*m2/np.square(m1+m2)])
+		return np.column_stack([m1, m2])
+
+	@staticmethod
+	def vars_to_masses(var1, var2, grad_var, swap = False):
+		"""
+		Converts the mass variables given by grad_var ([M, q], [Mc, eta] or [m1, m2]) into the component masses. Inverse of :func:`masses_to_vars`.
+
+		Input:
+			var1, var2: :class:`~numpy:numpy.ndarray`
+				shape (N,) - mass variables
+			grad_var: str
+				mass variables ('M_q', 'mchirp_eta' or 'm1_m2')
+			swap: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - whether m1 is the lightest mass (not used for grad_var = 'm1_m2')
+
+		Output:
+			m1, m2: :class:`~numpy:numpy.ndarray`
+				shape (N,) - component masses
+		"""
+		var1, var2 = np.asarray(var1, dtype = np.float64), np.asarray(var2, dtype = np.float64)
+		if grad_var == 'm1_m2':
+			return var1, var2
+		if grad_var == 'M_q':
+			m_big, m_small = var1*var2/(1+var2), var1/(1+var2)
+		else:
+			M = var1*np.power(var2, -3./5.)
+			sqrt_delta = np.sqrt(np.maximum(1.-4.*var2, 0.))
+			m_big, m_small = 0.5*M*(1+sqrt_delta), 0.5*M*(1-sqrt_delta)
+		return np.where(swap, m_small, m_big), np.where(swap, m_big, m_small)
+
+	@staticmethod
+	def get_errors(fisher, params = None):
+		"""
+		Computes the (1 sigma) errors on the parameters forecasted by the Fisher matrices, i.e. the square root of the diagonal of their inverse. The parameters not in params are kept fixed.
+
+		Input:
+			fisher: :class:`~numpy:numpy.ndarray`
+				shape (8,8)/(N,8,8) - Fisher matrices
+			params: list
+				indices of the parameters to consider (if None, every parameter is considered)
+
+		Output:
+			errors: :class:`~numpy:numpy.ndarray`
+				shape (P,)/(N,P) - errors on the parameters
+		"""
+		fisher = np.asarray(fisher, dtype = np.float64)
+		if params is not None:
+			fisher = fisher[...,params,:][...,:,params]
+			#the matrix is normalized by its diagonal, to reduce the condition number
+		norm = np.sqrt(np.diagonal(fisher, axis1 = -2, axis2 = -1)) #(N,P)
+		cov = np.linalg.inv(fisher/(norm[...,:,None]*norm[...,None,:]))
+		return np.sqrt(np.abs(np.diagonal(cov, axis1 = -2, axis2 = -1)))/norm
@@ -0,0 +1,246 @@
+"""
+Module likelihood.py
+====================
+
+Fast evaluation of the gaussian log-likelihood of time domain data, for templates generated by a :class:`GW_generator.GW_generator`.
+
+- :class:`relative_binning_likelihood` implements relative binning (heterodyning) in the time domain: the data are summarized once against the modes of a fiducial WF and the likelihood of each template is computed from the modes evaluated only at the edges of a few bins, without building the full WF.
+
+See `Zackay et al. (2018) <https://arxiv.org/abs/1806.08792>`_ for the method (in the frequency domain).
+"""
+#################
+
+import warnings
+import numpy as np
+from .GW_generator import batch_interpolator, call_cache, AMP_PREFACTOR
+
+#################
+
+class relative_binning_likelihood():
+	"""
+	Relative binning likelihood for aligned spin templates, with (diagonal) gaussian noise.
+	Each template is written as a combination of its modes:
+
+	.. math::
+
+		h(t) = \\mathrm{Re} \\sum_k Z_k H_k(t) \\quad Z_k = \\frac{e^{i m \\phi_0}}{D_L} (F_+ c^+_k - i F_\\times c^\\times_k)
+
+	where H_k = A_k e^{i ph_k} are the modes at D_L = 1 Mpc, c^+_k, c^\\times_k the coefficients of the spherical harmonics (see :func:`GW_generator.GW_generator.get_polarization_coefficients`) and F_+, F_\\times the antenna patterns.
+	The ratio r_k(t) = H_k(t)/H0_k(t) between the modes of the template and the ones of a fiducial WF is smooth and it is interpolated linearly between the edges of the bins. Hence, the inner products <d|h> and <h|h> are linear combinations of the values of r_k at the edges, with coefficients (summary data) computed once.
+	The modes of each template are generated on the grid of the model and they are interpolated only at the edges: the cost per template does not depend on the length of the data.
+	The approximation is accurate for templates close to the fiducial WF (i.e. within the posterior).
+	"""
+	_frequency_weight = 30. #weight beta of the log frequency in the spacing of the bins
+
+	def __init__(self, generator, data, t_grid, theta_0, weights = 1., modes = None, n_bins = 512, bin_edges = None):
+		"""
+		Computes the bins and the summary data.
+		The inner product is <a|b> = sum_t w(t) a(t) b(t), i.e. the data are affected by (possibly non stationary) white noise with variance 1/w(t).
+
+		Input:
+			generator: :class:`GW_generator.GW_generator`
+				generator of the templates
+			data: :class:`~numpy:numpy.ndarray`
+				shape (D,) - data
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D,) - increasing time grid (s) of the data
+			theta_0: :class:`~numpy:numpy.ndarray`
+				shape (4,) - intrinsic parameters [m1, m2, spin1_z, spin2_z] of the fiducial WF (further parameters are ignored)
+			weights: :class:`~numpy:numpy.ndarray`
+				shape ()/(D,) - noise weights w(t) (inverse variance of each sample)
+			modes: list
+				list of modes employed for building the templates (if None, every mode available is employed)
+			n_bins: int
+				number of bins: the edges are equally spaced in the quantity ph + beta*|log(omega/omega_start)|, where ph and omega are phase and frequency of the fiducial 22 mode (or of the first mode). The second term places more bins where the frequency changes quickly (i.e. close to merger)
+			bin_edges: :class:`~numpy:numpy.ndarray`
+				shape (B+1,) - indices of the grid points at the edges of the bins (if given, n_bins is ignored)
+		"""
+		self.generator = generator
+		self.t_grid = np.asarray(t_grid, dtype = np.float64)
+		data = np.asarray(data, dtype = np.float64)
+		weights = np.broadcast_to(np.asarray(weights, dtype = np.float64), data.shape)
+		if self.t_grid.ndim != 1 or data.shape != self.t_grid.shape:
+			raise ValueError("Data and time grid must be 1D arrays with the same shape: given {} and {}".format(data.shape, self.t_grid.shape))
+		if np.any(np.diff(self.t_grid) <= 0):
+			raise ValueError("The time grid must be increasing")
+		if modes is None:
+			modes = generator.list_modes()
+		elif isinstance(modes, tuple):
+			modes = [modes]
+		self.modes = [tuple(mode) for mode in modes if generator.get_mode_obj(mode) is not None]
+		if len(self.modes) < len(modes):
+			warnings.warn("Some of the modes {} are not available: they are skipped".format(modes))
+		self.m = np.array([m for l, m in self.modes]) #(K,)
+		self.dd = np.sum(weights*np.square(data))
+
+			#fiducial modes on the whole grid
+		theta_0 = np.asarray(theta_0, dtype = np.float64)[:4]
+		H0 = self.get_modes(theta_0[None,:], self.t_grid)[0] #(K,D)
+
+			#bins (indices of the edges)
+		if bin_edges is None:
+			ref_mode = self.modes.index((2,2)) if (2,2) in self.modes else 0
+			ph_0 = np.unwrap(np.angle(H0[ref_mode]))
+			ph_0 = np.abs(ph_0 - ph_0[0])
+			omega = np.abs(np.gradient(ph_0, self.t_grid))
+			omega = np.log(np.maximum(omega, 1e-3*omega.max()))
+			metric = np.maximum.accumulate(ph_0 + self._frequency_weight*np.abs(omega - omega[0]))
+			bin_edges = np.searchsorted(metric, np.linspace(0., metric[-1], n_bins+1))
+			bin_edges = np.unique(np.concatenate([[0], bin_edges, [len(self.t_grid)-1]]))
+		self.bin_edges = np.unique(np.clip(np.asarray(bin_edges, dtype = int), 0, len(self.t_grid)-1))
+		if self.bin_edges[0] != 0 or self.bin_edges[-1] != len(self.t_grid)-1:
+			raise ValueError("The bins must cover the whole time grid: the first edge must be 0 and the last edge D-1")
+		self.t_edges = self.t_grid[self.bin_edges] #(E,)
+		self.H0_edges = H0[:,self.bin_edges] #(K,E)
+
+			#summary data: sums weighted by the linear interpolation (hat) functions of each edge
+		u = self.__get_bin_coordinate()
+		wd = weights*data
+		self.S = np.stack([self.__sum_on_edges(wd*H0_k, u) for H0_k in H0]) #(K,E)
+		K = len(self.modes)
+		self.P = np.zeros((K, K, len(self.t_edges)), dtype = np.complex128) #sum of w H0_k H0_k'
+		self.Q = np.zeros((K, K, len(self.t_edges)), dtype = np.complex128) #sum of w H0_k conj(H0_k')
+		for k in range(K):
+			for k_ in range(k, K):
+				self.P[k,k_] = self.P[k_,k] = self.__sum_on_edges(weights*H0[k]*H0[k_], u)
+				self.Q[k,k_] = self.__sum_on_edges(weights*H0[k]*np.conj(H0[k_]), u)
+				self.Q[k_,k] = np.conj(self.Q[k,k_])
+
+	def __get_bin_coordinate(self):
+		"""
+		Returns, for each point of the grid, its relative position u in [0,1] inside the bin it belongs to.
+
+		Output:
+			u: :class:`~numpy:numpy.ndarray`
+				shape (D,) - position inside the bin (0 at the left edge, 1 at the right edge)
+		"""
+		ids = np.searchsorted(self.bin_edges, np.arange(len(self.t_grid)), side = 'right')-1
+		ids = np.clip(ids, 0, len(self.bin_edges)-2)
+		t_left, t_right = self.t_edges[ids], self.t_edges[ids+1]
+		return (self.t_grid - t_left)/(t_right - t_left)
+
+	def __sum_on_edges(self, f, u):
+		"""
+		Computes sum_t f(t) hat_e(t) for each edge e, where hat_e is the linear interpolation function, which is 1 at the edge e and 0 at the other edges.
+
+		Input:
+			f: :class:`~numpy:numpy.ndarray`
+				shape (D,) - function to sum
+			u: :class:`~numpy:numpy.ndarray`
+				shape (D,) - position of each point inside its bin
+
+		Output:
+			sums: :class:`~numpy:numpy.ndarray`
+				shape (E,) - sum for each edge
+		"""
+		starts = self.bin_edges[:-1]
+		right = np.add.reduceat(f*u, starts) #(E-1,) contribution of each bin to its right edge
+		left = np.add.reduceat(f, starts) - right #(E-1,) contribution of each bin to its left edge
+		sums = np.zeros(len(self.bin_edges), dtype = np.result_type(f, np.float64))
+		sums[:-1] += left
+		sums[1:] += right
+		return sums
+
+	@call_cache(call_cache.modes_quantities)
+	def get_modes(self, theta, t_grid, t_shift = 0.):
+		"""
+		Generates the complex modes H_k = A_k e^{i ph_k} (at D_L = 1 Mpc and phi_0 = 0) at the points t_grid - t_shift. The phase of each mode is set at the first point of the grid of the data (as in :func:`GW_generator.GW_generator.get_WF`).
+		The modes are generated on the grid of the model and only the given points are interpolated.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,4) - intrinsic parameters [m1, m2, spin1_z, spin2_z]
+			t_grid: :class:`~numpy:numpy.ndarray`
+				shape (D',) - points (s) to evaluate the modes at
+			t_shift: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - time shift (s) of each template
+
+		Output:
+			H: :class:`~numpy:numpy.ndarray`
+				shape (N,K,D') - complex modes
+		"""
+		t_shift = np.broadcast_to(np.asarray(t_shift, dtype = np.float64), (theta.shape[0],))
+		H = np.zeros((theta.shape[0], len(self.modes), len(t_grid)), dtype = np.complex128)
+		for k, mode in enumerate(self.modes):
+			mode_gen = self.generator.get_mode_obj(mode)
+			amp, ph, m_tot = mode_gen.get_scaled_raw_mode(theta, self.t_grid[0]) #(N,D'')
+			x = np.subtract(t_grid[None,:], t_shift[:,None])/m_tot[:,None]
+			interpolator = batch_interpolator(mode_gen.times, x)
+			amp = interpolator(amp, left = 0, right = 0)
+			amp *= (AMP_PREFACTOR*m_tot)[:,None]
+			H[:,k] = amp*np.exp(1j*interpolator(ph))
+		return H
+
+	def get_extrinsic_coefficients(self, theta, F_p = 1., F_c = 0.):
+		"""
+		Computes the coefficients Z_k which combine the modes into the template.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (N,7) - source parameters [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0]
+			F_p, F_c: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - antenna patterns (the default gives h = h_plus)
+
+		Output:
+			Z: :class:`~numpy:numpy.ndarray`
+				shape (N,K) - complex coefficients
+		"""
+		c_plus, c_cross = self.generator.get_polarization_coefficients(self.modes, theta[:,5]) #(N,K)
+		F_p, F_c = np.asarray(F_p, dtype = np.float64), np.asarray(F_c, dtype = np.float64)
+		Z = np.exp(1j*np.multiply.outer(theta[:,6], self.m))
+		Z *= (np.reshape(F_p, (-1,1))*c_plus - 1j*np.reshape(F_c, (-1,1))*c_cross)
+		Z /= theta[:,4,None]
+		return Z
+
+	def inner_products(self, theta, t_shift = 0., F_p = 1., F_c = 0.):
+		"""
+		Computes the inner products <d|h> and <h|h> for many templates, with relative binning.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (7,)/(N,7) - source parameters [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0]
+			t_shift: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - time shift (s) of each template: the template is h(t - t_shift)
+			F_p, F_c: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - antenna patterns (the default gives h = h_plus)
+
+		Output:
+			dh, hh: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - inner products <d|h> and <h|h>
+		"""
+		theta = np.asarray(theta, dtype = np.float64)
+		squeeze = (theta.ndim == 1)
+		theta = np.atleast_2d(theta)
+		if theta.shape[1] != 7:
+			raise ValueError("Wrong number of source parameters: expected 7 [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0], given {}".format(theta.shape[1]))
+
+			#ratio between the template and the fiducial modes at the edges (zero where the fiducial WF vanishes)
+		H = self.get_modes(theta[:,:4], self.t_edges, t_shift) #(N,K,E)
+		r = np.divide(H, self.H0_edges, out = np.zeros_like(H), where = self.H0_edges != 0)
+		Z = self.get_extrinsic_coefficients(theta, F_p, F_c) #(N,K)
+
+		dh = np.einsum('nk,nke,ke->n', Z, r, self.S).real
+		hh = 0.5*np.einsum('nk,nl,nke,nle,kle->n', Z, Z, r, r, self.P, optimize = True).real
+		hh += 0.5*np.einsum('nk,nl,nke,nle,kle->n', Z, np.conj(Z), r, np.conj(r), self.Q, optimize = True).real
+
+		if squeeze: return dh[0], hh[0]
+		return dh, hh
+
+	def loglikelihood(self, theta, t_shift = 0., F_p = 1., F_c = 0.):
+		"""
+		Computes the gaussian log-likelihood -<d-h|d-h>/2 of many templates, with relative binning.
+
+		Input:
+			theta: :class:`~numpy:numpy.ndarray`
+				shape (7,)/(N,7) - source parameters [m1, m2, spin1_z, spin2_z, D_L, inclination, phi_0]
+			t_shift: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - time shift (s) of each template: the template is h(t - t_shift)
+			F_p, F_c: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - antenna patterns (the default gives h = h_plus)
+
+		Output:
+			log_L: :class:`~numpy:numpy.ndarray`
+				shape ()/(N,) - log-likelihood
+		"""
+		dh, hh = self.inner_products(theta, t_shift, F_p, F_c)
+		return dh - 0.5*hh - 0.5*self.dd